@@ -0,0 +1,185 @@
+import sys
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from PIL import Image, ImageTk
+import disk_cache
+
+
+def _decode(image_path, resize_dims=None):
+    image = Image.open(image_path).convert("RGBA")
+    if resize_dims:
+        image = image.resize(resize_dims)
+    return image
+
+
+def decode_image(image_path, resize_dims=None, zero_copy=False):
+    """
+    Open an image file as RGBA, resized to `resize_dims` if given (via the disk cache when enabled).
+
+    `zero_copy` lets a disk cache hit stay a view of its mapped file (see DecodedImageCache._read).
+    """
+    if disk_cache.cache is not None:
+        return disk_cache.cache.load(image_path, resize_dims, _decode, zero_copy)
+    return _decode(image_path, resize_dims)
+
+
+def _decode_raw(image_path, resize_dims):
+    # Runs in a worker process: return plain pixels, which pickle cheaply
+    image = _decode(image_path, resize_dims)
+    return image.size, image.tobytes()
+
+
+def decode_images(image_files, resize_dims=None, workers=0, pool='thread'):
+    """
+    Decode a list of image files, spread over `workers` threads or processes.
+
+    PIL releases the GIL while decoding and resizing, so a thread pool scales with
+    cores; with pool='process' the workers send back raw RGBA buffers that are wrapped
+    here. Falls back to one-at-a-time decoding for workers <= 1 and in the frozen
+    (PyInstaller) build, where worker processes cannot be spawned reliably.
+    """
+    image_files = list(image_files)
+    if workers <= 1 or len(image_files) < 2 or getattr(sys, 'frozen', False):
+        return [decode_image(fp, resize_dims) for fp in image_files]
+
+    if pool != 'process':
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='decode') as executor:
+            return list(executor.map(decode_image, image_files, repeat(resize_dims)))
+
+    # Worker processes do not share the disk cache, so resolve hits here first
+    cache = disk_cache.cache
+    images = [cache.lookup(fp, resize_dims) if cache else None for fp in image_files]
+    missing = [index for index, image in enumerate(images) if image is None]
+    if missing:
+        chunksize = max(1, len(missing) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_decode_raw, [image_files[i] for i in missing],
+                                   repeat(resize_dims), chunksize=chunksize)
+            for index, (size, data) in zip(missing, results):
+                images[index] = Image.frombuffer("RGBA", size, data, 'raw', "RGBA", 0, 1)
+                if cache:
+                    cache.save(image_files[index], resize_dims, images[index])
+    return images
+
+
+class AssetLoader:
+    """
+    Lazily decoded images for one directory, bounded by a memory budget.
+
+    Only the file paths are indexed up front. Images are decoded (and wrapped as Tk
+    PhotoImages) the first time they are asked for and kept in an LRU cache; once the
+    decoded PIL and Tk copies exceed `max_bytes`, the least recently used images are
+    dropped and decoded again if they are needed later.
+    """
+
+    def __init__(self, image_files, resize_dims=None, max_bytes=512 * 1024 * 1024, make_photo=ImageTk.PhotoImage):
+        self.image_files = list(image_files)
+        self.make_photo = make_photo
+        self.resize_dims = tuple(resize_dims) if resize_dims else None
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()  # index -> [PIL image, PhotoImage or None]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.image_files)
+
+    @staticmethod
+    def image_bytes(image):
+        # Decoded RGBA images and Tk photo images both hold 4 bytes per pixel
+        return image.size[0] * image.size[1] * 4
+
+    def _entry(self, index):
+        entry = self._entries.get(index)
+        if entry is not None:
+            self._entries.move_to_end(index)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        # Entries are bounded by the LRU, so cache hits can stay mapped
+        image = decode_image(self.image_files[index], self.resize_dims, zero_copy=True)
+        entry = [image, None]
+        self._entries[index] = entry
+        self.current_bytes += self.image_bytes(image)
+        self._trim()
+        return entry
+
+    def is_cached(self, index):
+        return index in self._entries
+
+    def store(self, index, image):
+        """Add an image decoded elsewhere (e.g. by the prefetcher) without counting a lookup"""
+        if index in self._entries:
+            return
+        self._entries[index] = [image, None]
+        self.current_bytes += self.image_bytes(image)
+        self._trim()
+
+    def pil_image(self, index):
+        return self._entry(index)[0]
+
+    def photo(self, index):
+        entry = self._entry(index)
+        if entry[1] is None:
+            self._add_photo(entry)
+        return entry[1]
+
+    def ensure_photo(self, index):
+        """Build the PhotoImage of a cached image without counting a lookup (Tk thread only)"""
+        entry = self._entries.get(index)
+        if entry is not None and entry[1] is None:
+            self._add_photo(entry)
+
+    def _add_photo(self, entry):
+        entry[1] = self.make_photo(entry[0])
+        self.current_bytes += self.image_bytes(entry[0])
+        self._trim()
+
+    def _trim(self):
+        # Always keep the most recently used image, even if it alone exceeds the budget
+        while len(self._entries) > 1 and self.current_bytes > self.max_bytes:
+            _, (image, photo) = self._entries.popitem(last=False)
+            self.current_bytes -= self.image_bytes(image) * (2 if photo is not None else 1)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+        self.current_bytes = 0
+
+    def stats(self):
+        return {
+            'images': len(self.image_files),
+            'cached': len(self._entries),
+            'bytes': self.current_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class LazyImageList:
+    """Read-only list view of an AssetLoader, returning PIL images or PhotoImages by index"""
+
+    def __init__(self, loader, kind='photo'):
+        self.loader = loader
+        self._get = loader.photo if kind == 'photo' else loader.pil_image
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("image index out of range")
+        return self._get(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._get(index)
@@ -1,20 +1,78 @@
 import tkinter as tk
-from PIL import Image, ImageTk
+from PIL import Image, ImageDraw
 import os
 import json
+import timing
+import disk_cache
+from asset_loader import AssetLoader, LazyImageList, decode_images
+from canvas_layers import CanvasLayers
+from prefetch import Prefetcher
+from render_backend import get_backend
+from config_service import get_config
+from session_log import get_logger
+
+log = get_logger('modules')
 
 def load_config(config_path='config.json'):
-    try:
-        with open(config_path, 'r') as config_file:
-            return json.load(config_file)
-    except FileNotFoundError:
-        return {}
+    """Return a copy of the config; the file is only re-parsed when it changes on disk"""
+    return get_config(config_path).as_dict()
+
+# Rendered checkerboard borders keyed by (total size, border width, square size, colours)
+_checkerboard_images = {}
+
+def render_checkerboard(total_width, total_height, border_width, square_size=20, colors=("white", "black")):
+    """Return a cached PIL image of the checkerboard border; the content area is left black"""
+    key = (total_width, total_height, border_width, square_size, tuple(colors))
+    image = _checkerboard_images.get(key)
+    if image is not None:
+        return image
+
+    image = Image.new("RGB", (total_width, total_height), "black")
+    draw = ImageDraw.Draw(image)
+    for i in range(0, total_width, square_size):
+        for j in range(0, total_height, square_size):
+            # Only draw if in the border area (not in the content area)
+            if (i < border_width or i >= total_width - border_width or
+                j < border_width or j >= total_height - border_width):
+                # Alternate colors based on position
+                color = colors[0] if (i // square_size + j // square_size) % 2 == 0 else colors[1]
+                draw.rectangle((i, j, i + square_size - 1, j + square_size - 1), fill=color)
+
+    _checkerboard_images[key] = image
+    return image
+
+# Tk PhotoImages of the rendered borders, shared by every module of the same size
+_checkerboard_photos = {}
+
+# Decoded image sets keyed by (directory, resize dims), kept from practice to the main task
+# so that rebuilding the modules does not decode every image again; dropped with the session
+_image_sets = {}
+
+
+def _file_signatures(image_files):
+    """(path, mtime_ns, size) of each image file, so an image edited in place is decoded again"""
+    signatures = []
+    for path in image_files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signatures.append((path, None, None))
+            continue
+        signatures.append((path, stat.st_mtime_ns, stat.st_size))
+    return signatures
+
+
+def clear_image_sets():
+    """Release every decoded image set, e.g. when the session goes back to the config window"""
+    _image_sets.clear()
 
 class BaseModule:
     RGB_CONSTANT = (145, 145, 145, 0)
 
     def __init__(self, root, image_dir, canvas_width=640, canvas_height=800, resize_dims=None, with_border=True):
         self.root = root
+        # Tk canvas, or the offscreen compositor when running on a HeadlessRoot
+        self.backend = get_backend(root)
         self.image_dir = image_dir
         self.canvas_width = canvas_width
         self.canvas_height = canvas_height
@@ -23,10 +81,19 @@ class BaseModule:
         self.iti_delay = self.config.get('iti_message_delay', 500)  # Default to 500ms if not in config
         self.iti_message_text = self.config.get('iti_message_text', 'Press SPACE to continue')  # Default message
         self.canvas_bg_color = self.config.get('canvas_bg_color', '#808080')  # Default to standard grey if not in config
+        self.checkerboard_square_size = int(self.config.get('checkerboard_square_size', 20))  # Border square size in pixels
+        self.lazy_image_loading = bool(self.config.get('lazy_image_loading', False))  # Decode images on first use
+        self.image_cache_mb = int(self.config.get('image_cache_mb', 512))  # Decoded image budget for lazy loading
+        self.image_decode_workers = int(self.config.get('image_decode_workers', 0))  # 0: decode serially
+        self.image_decode_pool = self.config.get('image_decode_pool', 'thread')  # 'thread' or 'process'
+        self.asset_loader = None
         self.images = self.load_images()
+        # With lazy loading, upcoming images are decoded on a worker thread ahead of use
+        self.prefetch_depth = int(self.config.get('prefetch_depth', 3))
+        self.prefetcher = Prefetcher(self.root) if self.asset_loader and self.prefetch_depth > 0 else None
 
         # Create a frame to hold the canvas and border
-        self.frame = tk.Frame(self.root, bg='black')
+        self.frame = self.backend.create_frame(self.root, bg='black')
         self.frame.pack(fill='both', expand=True)
 
         # Create the canvas with the checkerboard border
@@ -37,24 +104,27 @@ class BaseModule:
             total_height = self.canvas_height + (border_width * 2)
 
             # Create a canvas that includes both content area and border
-            self.canvas = tk.Canvas(self.frame, width=total_width, height=total_height, bg='black', highlightthickness=0)
+            self.canvas = self.backend.create_canvas(self.frame, total_width, total_height, bg='black', highlightthickness=0)
             # Center the canvas in the frame
             self.canvas.pack(side='top', anchor='center', expand=True, padx=50, pady=50)
+            self.layers = CanvasLayers(self.canvas)
 
             # Draw the checkerboard border
             self.draw_checkerboard_border(border_width)
 
             # Create a content area in the center
-            self.content_area = self.canvas.create_rectangle(
-                border_width, border_width,
-                border_width + self.canvas_width, border_width + self.canvas_height,
+            self.content_area = self.layers.create(
+                'content_area', 'rectangle',
+                (border_width, border_width,
+                 border_width + self.canvas_width, border_width + self.canvas_height),
                 fill=self.canvas_bg_color, outline=''
             )
         else:
             # Create a simple canvas without border
-            self.canvas = tk.Canvas(self.frame, width=self.canvas_width, height=self.canvas_height, bg=self.canvas_bg_color)
+            self.canvas = self.backend.create_canvas(self.frame, self.canvas_width, self.canvas_height, bg=self.canvas_bg_color)
             # Center the canvas in the frame
             self.canvas.pack(side='top', anchor='center', expand=True, padx=50, pady=50)
+            self.layers = CanvasLayers(self.canvas)
 
         self.place_fixation_point()
 
@@ -67,36 +137,73 @@ class BaseModule:
             raise ValueError(f"No image files found in directory: {self.image_dir}")
 
         self.image_files = image_files
-        if self.resize_dims:
-            self.pil_images = [Image.open(fp).convert("RGBA").resize(self.resize_dims) for fp in image_files]
-            return [ImageTk.PhotoImage(img) for img in self.pil_images]
-        else:
-            self.pil_images = [Image.open(fp).convert("RGBA") for fp in image_files]
-            return [ImageTk.PhotoImage(img) for img in self.pil_images]
+        # Reuse the set if no file was added, removed or changed and the PhotoImages belong to this Tk
+        key = (os.path.abspath(self.image_dir), self.resize_dims, self.lazy_image_loading)
+        signatures = _file_signatures(image_files)
+        cached = _image_sets.get(key)
+        if cached is not None and cached[0] == signatures and cached[3] is self.root.tk:
+            self.pil_images = cached[1]
+            self.asset_loader = cached[4]
+            if self.asset_loader:
+                self.asset_loader.max_bytes = self.image_cache_mb * 1024 * 1024
+            return cached[2] if self.asset_loader else list(cached[2])
+
+        if self.lazy_image_loading:
+            # Index the paths only; images are decoded on first use within the memory budget
+            self.asset_loader = AssetLoader(image_files, self.resize_dims, self.image_cache_mb * 1024 * 1024,
+                                            make_photo=self.backend.make_photo)
+            self.pil_images = LazyImageList(self.asset_loader, 'pil')
+            photos = LazyImageList(self.asset_loader, 'photo')
+            _image_sets[key] = (signatures, self.pil_images, photos, self.root.tk, self.asset_loader)
+            return photos
+
+        self.asset_loader = None
+        self.pil_images = decode_images(image_files, self.resize_dims,
+                                        self.image_decode_workers, self.image_decode_pool)
+        disk_cache.flush()
+        photos = [self.backend.make_photo(img) for img in self.pil_images]
+        _image_sets[key] = (signatures, self.pil_images, photos, self.root.tk, None)
+        return list(photos)
+
+    def prefetch(self, start_index, make_photo=False, on_ready=None, indices=None):
+        """
+        Decode the next `prefetch_depth` images from `start_index` in the background (lazy
+        loading only); `indices` lists the upcoming images instead when they are not consecutive.
+        """
+        if not self.prefetcher or not self.asset_loader:
+            return
+        count = len(self.images)
+        if indices is None:
+            indices = [(start_index + offset) % count for offset in range(min(self.prefetch_depth, count))]
+        self.prefetcher.request(self.asset_loader, indices, make_photo=make_photo, on_ready=on_ready)
+
+    def draw_checkerboard_border(self, border_width, square_size=None, colors=("white", "black")):
+        """Show the checkerboard border as a single pre-rendered image item"""
+        if square_size is None:
+            square_size = self.checkerboard_square_size
 
-    def draw_checkerboard_border(self, border_width, square_size=20):
-        """Draw a checkerboard pattern in the border area of the canvas"""
         # Use the total canvas dimensions including border
         total_width = self.canvas_width + (border_width * 2)
         total_height = self.canvas_height + (border_width * 2)
 
-        # Clear any existing checkerboard
-        self.canvas.delete("checkerboard")
-
-        # Draw checkerboard pattern in the border area
-        for i in range(0, total_width, square_size):
-            for j in range(0, total_height, square_size):
-                # Only draw if in the border area (not in the content area)
-                if (i < border_width or i >= border_width + self.canvas_width or
-                    j < border_width or j >= border_width + self.canvas_height):
-                    # Alternate colors based on position
-                    color = "white" if (i // square_size + j // square_size) % 2 == 0 else "black"
-                    self.canvas.create_rectangle(
-                        i, j, i + square_size, j + square_size,
-                        fill=color, outline="", tags="checkerboard"
-                    )
+        # Render once per size/square size/colours; PhotoImages are shared the same way
+        key = (self.backend.name, total_width, total_height, border_width, square_size, tuple(colors))
+        photo = _checkerboard_photos.get(key)
+        if photo is None:
+            image = render_checkerboard(total_width, total_height, border_width, square_size, colors)
+            photo = self.backend.make_photo(image)
+            _checkerboard_photos[key] = photo
+
+        self.border_photo = photo
+        self.layers.create('border', 'image', (0, 0), anchor='nw', image=photo)
 
     def place_fixation_point(self):
+        """Show the fixation cross above any images, creating its layer on first use"""
+        if self.layers.has('fixation'):
+            self.layers.show('fixation')
+            self.layers.raise_above('fixation')
+            return
+
         # If we have a border, adjust the center position
         if hasattr(self, 'content_area'):
             border_width = 60
@@ -106,14 +213,9 @@ class BaseModule:
             center_x = self.canvas_width / 2
             center_y = self.canvas_height / 2
 
-        self.canvas.create_text(center_x, center_y, text='+', font=('Arial', 20), fill='white')
+        self.layers.create('fixation', 'text', (center_x, center_y), text='+', font=('Arial', 20), fill='white')
 
     def show_iti_message(self):
-        # Record the time when ITI message is shown (for reaction time calculation)
-        import time
-        if hasattr(self, 'root') and hasattr(self.root, 'iti_start_time'):
-            self.root.iti_start_time[0] = time.time()
-        
         # If we have a border, adjust the center position
         if hasattr(self, 'content_area'):
             border_width = 60
@@ -123,8 +225,21 @@ class BaseModule:
             center_x = self.canvas_width / 2
             center_y = self.canvas_height / 2 + 50  # Place below fixation point
 
-        self.canvas.create_text(center_x, center_y, text=self.iti_message_text,
-                              font=('Arial', 16), fill='white', tags='iti_message')
+        self.layers.create('iti_message', 'text', (center_x, center_y), text=self.iti_message_text,
+                           font=('Arial', 16), fill='white')
+        self.layers.raise_above('iti_message')
+        # Stamp ITI onset (for reaction time calculation) once the message has been drawn;
+        # idle callbacks queued after a canvas change run after Tk's redraw
+        self.root.after_idle(timing.mark, 'iti_onset')
+
+    def hide_iti_message(self):
+        self.layers.hide('iti_message')
+
+    def clear_trial_layers(self):
+        """Hide everything shown during a trial, leaving the content area and fixation cross"""
+        self.layers.hide('mask', 'stimulus', 'iti_message')
+        self.layers.show('content_area')
+        self.place_fixation_point()
 
     def schedule_iti_message(self):
         """Schedule the ITI message to appear after the configured delay"""
@@ -137,6 +252,14 @@ class BaseModule:
         # Schedule new ITI message and store the ID
         self.iti_after_id = self.root.after(self.iti_delay, self.show_iti_message)
     
+    def shutdown(self):
+        """Cancel pending callbacks before the module's widgets are destroyed"""
+        self.cancel_iti_message()
+        if self.prefetcher:
+            self.prefetcher.shutdown()
+        if self.asset_loader:
+            log.info("Image cache for %s: %s", self.image_dir, self.asset_loader.stats())
+
     def cancel_iti_message(self):
         """Cancel any pending ITI message"""
         if hasattr(self, 'iti_after_id') and self.iti_after_id:
@@ -0,0 +1,5 @@
+"""
+Benchmarks for the presentation hot paths.
+
+Run from the project directory with `python -m benchmarks`; see `python -m benchmarks --help`.
+"""
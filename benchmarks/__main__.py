@@ -0,0 +1,65 @@
+import argparse
+import os
+import sys
+
+# The application modules live in the project directory, next to this package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cases import GROUPS, Workspace
+from benchmarks.harness import compare, environment, format_comparison, load_results, measure, save_results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Time the presentation hot paths and compare against a baseline.')
+    parser.add_argument('--quick', action='store_true', help='fewer and smaller cases, for a fast check')
+    parser.add_argument('--only', action='append', default=[], metavar='TEXT',
+                        help='run only cases whose name contains TEXT (may be repeated)')
+    parser.add_argument('--tk', action='store_true', help='draw into a real Tk window instead of offscreen')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the results JSON')
+    parser.add_argument('--baseline', help='results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative change counted as a regression (default: 0.10)')
+    parser.add_argument('--fail-on-regression', action='store_true',
+                        help='exit with status 1 if any case regressed against the baseline')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    output = os.path.abspath(args.output)
+    baseline = load_results(args.baseline) if args.baseline else None
+
+    results = {'environment': environment(), 'headless': not args.tk, 'quick': args.quick, 'cases': {}}
+    workspace = Workspace(headless=not args.tk)
+    try:
+        for group in GROUPS:
+            for case in group(workspace, args.quick):
+                if args.only and not any(text in case.name for text in args.only):
+                    continue
+                result = measure(case)
+                results['cases'][case.name] = result
+                print(f"{case.name:<50} {result['wall_ms']['median']:>10.3f} ms  "
+                      f"{result['per_op_us']:>10.3f} us/op  {result['alloc_peak_kb']:>10.1f} KB peak")
+    finally:
+        workspace.close()
+
+    save_results(results, output)
+    print(f"Results written to {output}")
+
+    if baseline is not None:
+        if args.only:
+            # Cases left out of this run are not missing from it
+            baseline['cases'] = {name: result for name, result in baseline['cases'].items()
+                                 if any(text in name for text in args.only)}
+        rows = compare(results, baseline, args.threshold)
+        print(f"\nCompared with {args.baseline} (threshold {args.threshold:.0%}):")
+        print(format_comparison(rows))
+        regressions = [row for row in rows if row['status'] == 'regression']
+        print(f"{len(regressions)} regression(s)")
+        if regressions and args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
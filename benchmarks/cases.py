@@ -0,0 +1,236 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import numpy as np
+from PIL import Image
+from benchmarks.harness import Case
+
+# Config the benchmark modules are built with, independent of the experimenter's config.json
+BENCHMARK_CONFIG = {
+    'participant_id': 'benchmark',
+    'blend_duration': 10000,
+    'mask_cycle_time': 100,
+    'iti_message_delay': 500,
+    'frame_cache_mb': 256,
+    'blend_engine': 'pil',
+    'lazy_image_loading': False,
+    'image_disk_cache': False,
+    'image_decode_workers': 0,
+    'mask_source': 'directory',
+    'record_frame_timing': False,
+    'session_store': False,
+}
+
+
+class Workspace:
+    """
+    Temporary working directory holding a benchmark config.json and generated images.
+
+    The modules read config.json and write trial_data.csv relative to the working
+    directory, so the suite runs from here and never touches the real session files.
+    """
+
+    def __init__(self, headless=True):
+        self.path = tempfile.mkdtemp(prefix='flash_suppression_bench_')
+        self.previous_cwd = os.getcwd()
+        os.chdir(self.path)
+        with open('config.json', 'w') as config_file:
+            json.dump(BENCHMARK_CONFIG, config_file)
+        self.headless = headless
+        self.root = None
+        self.image_dirs = {}
+
+    def get_root(self):
+        if self.root is None:
+            if self.headless:
+                from render_backend import HeadlessRoot
+                self.root = HeadlessRoot()
+            else:
+                import tkinter as tk
+                self.root = tk.Tk()
+        return self.root
+
+    def image_dir(self, name, count, size, extension='.jpg'):
+        """Directory of `count` synthetic photo-like images of `size`, generated once"""
+        key = (name, count, size, extension)
+        path = self.image_dirs.get(key)
+        if path is not None:
+            return path
+        path = os.path.join(self.path, f'{name}_{count}_{size[0]}x{size[1]}')
+        os.makedirs(path)
+        rng = np.random.default_rng(count)
+        width, height = size
+        # Smooth gradients plus grain: compresses and decodes like a photograph, unlike flat colour
+        gradient = np.add.outer(np.linspace(0, 100, height), np.linspace(0, 60, width))
+        for index in range(count):
+            grain = rng.integers(0, 64, (height, width, 3), dtype=np.uint8)
+            pixels = (gradient[..., None] + grain + (index * 7) % 32).astype(np.uint8)
+            Image.fromarray(pixels, 'RGB').save(os.path.join(path, f'{name}_{index:04d}{extension}'), quality=90)
+        self.image_dirs[key] = path
+        return path
+
+    def close(self):
+        if self.root is not None:
+            self.root.destroy()
+            self.root = None
+        os.chdir(self.previous_cwd)
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def synthetic_trials(count, trial_type='Practice', seed=0):
+    """
+    Trial rows shaped like the ones the task records.
+
+    Suppressor positions alternate in blocks of five, as in the practice sequence; reaction
+    times are log-normal around 1.5 s (slower on the left) with 10% inaccurate responses.
+    """
+    rng = random.Random(seed)
+    rows = []
+    for index in range(count):
+        side = 'left' if (index // 5) % 2 == 0 else 'right'
+        y_position = rng.choice([50, 450])
+        rows.append({
+            'Trial Number': index + 1,
+            'Trial Type': trial_type,
+            'Y Position': y_position,
+            'Stimulus Position': 'top' if y_position == 50 else 'below',
+            'Image Path': f'stim_dir/stim_{index % 40:04d}.png',
+            'Reaction Time': round(rng.lognormvariate(0.4 if side == 'left' else 0.3, 0.3), 4),
+            'Response': rng.choice(['a', 'z']),
+            'Suppressor Position': side,
+            'Accuracy': 1 if rng.random() < 0.9 else 0,
+        })
+    return rows
+
+
+def load_images_cases(workspace, quick):
+    """BaseModule.load_images: serial, thread pool and process pool decode"""
+    from base_module import BaseModule, _image_sets
+    counts = (10,) if quick else (20, 60)
+    sizes = ((640, 800),) if quick else ((640, 800), (1920, 2400))
+    modes = (('serial', 0, 'thread'), ('thread', 4, 'thread'), ('process', 4, 'process'))
+    for count in counts:
+        for size in sizes:
+            image_dir = workspace.image_dir('load', count, size)
+            _image_sets.clear()
+            module = BaseModule(workspace.get_root(), image_dir, resize_dims=(640, 800), with_border=False)
+            for mode, workers, pool in modes:
+                def setup(workers=workers, pool=pool):
+                    # Drop the decoded set so every run decodes from the files again
+                    _image_sets.clear()
+                    module.image_decode_workers = workers
+                    module.image_decode_pool = pool
+
+                yield Case(f'load_images[{mode},{count}x{size[0]}x{size[1]}]', module.load_images,
+                           setup=setup, teardown=_image_sets.clear, ops=count, repeat=3,
+                           params={'mode': mode, 'workers': workers, 'count': count, 'size': list(size)})
+            module.shutdown()
+            del module
+
+
+def blend_image_cases(workspace, quick):
+    """Stimulus.blend_image per tick: pre-rendered ramp frames and live blending per engine"""
+    from blend_engine import create_blend_engine
+    from stim_file import Stimulus
+    stim_dir = workspace.image_dir('stim', 4, (400, 600), extension='.png')
+    stimulus = Stimulus(stim_dir, root=workspace.get_root())
+
+    def run():
+        for frame_index in range(len(stimulus.alphas)):
+            stimulus.blend_image(frame_index)
+
+    def setup_prerendered():
+        stimulus.blend_engine = create_blend_engine('pil', stimulus.RGB_CONSTANT)
+        stimulus.start_blend()
+        if stimulus.ramp is not None:
+            stimulus.ramp.render_next(len(stimulus.alphas))
+
+    yield Case('blend_image[prerendered]', run, setup=setup_prerendered,
+               ops=len(stimulus.alphas), repeat=5, params={'ramp': True})
+
+    for engine in ('pil', 'numpy'):
+        def setup_live(engine=engine):
+            stimulus.blend_engine = create_blend_engine(engine, stimulus.RGB_CONSTANT)
+            stimulus.start_blend()
+            stimulus.ramp = None  # Blend every tick, as when a ramp exceeds the frame cache budget
+
+        yield Case(f'blend_image[live,{engine}]', run, setup=setup_live,
+                   ops=len(stimulus.alphas), repeat=3 if quick else 5, params={'ramp': False, 'engine': engine})
+    stimulus.shutdown()
+
+
+def update_canvas_cases(workspace, quick):
+    """ImageCycler.update_canvas: the bare mask flip, and the flip including the redraw"""
+    from mask_file import ImageCycler
+    mask_dir = workspace.image_dir('mask', 20, (640, 800))
+    cycler = ImageCycler(workspace.get_root(), mask_dir, 100)
+    canvas = cycler.canvas
+    redraw = canvas.render if workspace.headless else canvas.update_idletasks
+    flips = 200 if quick else 2000
+
+    def setup():
+        cycler.image_cycle_running = True
+        cycler.layers.show('mask')
+
+    def run_flips():
+        for frame_index in range(flips):
+            cycler.update_canvas(frame_index)
+
+    def run_flips_redrawn():
+        for frame_index in range(flips // 10):
+            cycler.update_canvas(frame_index)
+            redraw()
+
+    backend = cycler.backend.name
+    yield Case(f'update_canvas[{backend}]', run_flips, setup=setup, ops=flips,
+               params={'backend': backend, 'redraw': False})
+    yield Case(f'update_canvas[{backend},redraw]', run_flips_redrawn, setup=setup, ops=flips // 10,
+               params={'backend': backend, 'redraw': True})
+
+    # The checkerboard border is drawn on the same module
+    import base_module
+
+    def setup_cold():
+        base_module._checkerboard_images.clear()
+        base_module._checkerboard_photos.clear()
+
+    yield Case('draw_checkerboard_border[cold]', lambda: cycler.draw_checkerboard_border(60),
+               setup=setup_cold, repeat=10, params={'cached': False})
+    yield Case('draw_checkerboard_border[warm]', lambda: cycler.draw_checkerboard_border(60),
+               repeat=10, params={'cached': True})
+    cycler.image_cycle_running = False
+    cycler.shutdown()
+
+
+def trial_data_cases(workspace, quick):
+    """write_trial_data_to_csv and the dominance analysis over growing sessions and studies"""
+    from display_file import calculate_dominance_from_practice_data, write_trial_data_to_csv
+    row_counts = (10, 1000) if quick else (10, 1000, 100000)
+    for rows in row_counts:
+        trials = synthetic_trials(rows, trial_type='Main')
+        yield Case(f'write_trial_data_to_csv[{rows}]', lambda trials=trials: write_trial_data_to_csv(trials),
+                   ops=rows, repeat=3 if rows >= 100000 else 5, params={'rows': rows})
+
+    for rows in (20,) + row_counts[1:]:
+        trials = synthetic_trials(rows)
+
+        # Its report goes to the session log, which the suite does not configure
+        yield Case(f'calculate_dominance_from_practice_data[{rows}]',
+                   lambda trials=trials: calculate_dominance_from_practice_data(trials),
+                   ops=rows, repeat=3 if rows >= 100000 else 5, params={'rows': rows})
+
+    # The whole-study analysis: many participants' practice sessions in one table
+    import dominance
+    for participants in ((100,) if quick else (100, 5000)):
+        records = [(f'p{participant:05d}', participant, row['Trial Type'], row['Suppressor Position'],
+                    row['Reaction Time'], row['Accuracy'])
+                   for participant in range(participants) for row in synthetic_trials(20, seed=participant)]
+        table = dominance.TrialTable.from_records(records)
+        yield Case(f'dominance.analyze[{participants}x20]', lambda table=table: dominance.analyze(table),
+                   ops=participants, repeat=5, params={'participants': participants, 'rows': len(records)})
+
+
+# Case groups in the order they run
+GROUPS = (load_images_cases, blend_image_cases, update_canvas_cases, trial_data_cases)
@@ -0,0 +1,204 @@
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+
+class Case:
+    """
+    One benchmark: `run` is timed `repeat` times, each after a fresh `setup`.
+
+    `ops` is the number of operations one run performs (ticks, flips, rows), so the
+    per-operation cost can be compared across cases of the same group. `teardown`
+    runs once after the last run.
+    """
+
+    def __init__(self, name, run, setup=None, teardown=None, ops=1, repeat=5, params=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+        self.ops = ops
+        self.repeat = repeat
+        self.params = params or {}
+
+    @property
+    def group(self):
+        return self.name.split('[', 1)[0]
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, or None if the platform gives no way to read it"""
+    try:
+        import resource
+    except ImportError:
+        return _peak_rss_windows()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes everywhere else
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _peak_rss_windows():
+    try:
+        import ctypes
+        from ctypes import wintypes
+    except ImportError:
+        return None
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD),
+                    ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t),
+                    ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t),
+                    ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    try:
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return counters.PeakWorkingSetSize
+    except (AttributeError, OSError):
+        return None
+
+
+def measure(case):
+    """Time a case and trace one extra run of it for allocations"""
+    rss_before = peak_rss_bytes()
+    times_ns = []
+    for _ in range(case.repeat):
+        if case.setup:
+            case.setup()
+        start_ns = time.perf_counter_ns()
+        case.run()
+        times_ns.append(time.perf_counter_ns() - start_ns)
+
+    # Allocations are traced on a separate run; tracing slows the code down too much to time it
+    if case.setup:
+        case.setup()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    case.run()
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    if case.teardown:
+        case.teardown()
+    retained = after.compare_to(before, 'filename')
+    rss_after = peak_rss_bytes()
+
+    median_ns = statistics.median(times_ns)
+    return {
+        'group': case.group,
+        'params': case.params,
+        'repeat': case.repeat,
+        'ops': case.ops,
+        'wall_ms': {
+            'min': round(min(times_ns) / 1e6, 4),
+            'median': round(median_ns / 1e6, 4),
+            'mean': round(statistics.fmean(times_ns) / 1e6, 4),
+        },
+        'per_op_us': round(median_ns / case.ops / 1e3, 3),
+        'alloc_peak_kb': round(peak / 1024, 1),
+        'alloc_retained_kb': round(sum(stat.size_diff for stat in retained) / 1024, 1),
+        'alloc_blocks': sum(stat.count_diff for stat in retained),
+        'rss_peak_mb': round(rss_after / 2**20, 1) if rss_after is not None else None,
+        'rss_growth_mb': (round((rss_after - rss_before) / 2**20, 1)
+                          if rss_after is not None and rss_before is not None else None),
+    }
+
+
+def environment():
+    """What the numbers were measured on; comparisons across machines are only indicative"""
+    import PIL
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'pillow': PIL.__version__,
+        'numpy': numpy_version,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save_results(results, path):
+    with open(path, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+
+
+def load_results(path):
+    with open(path, 'r') as results_file:
+        return json.load(results_file)
+
+
+# Metrics compared against the baseline (larger is worse for all of them), with the
+# floor below which differences are noise: sub-10us timings, allocations under 64 KB
+COMPARED_METRICS = (
+    ('wall_ms', lambda result: result['wall_ms']['median'], 0.01),
+    ('alloc_peak_kb', lambda result: result['alloc_peak_kb'], 64.0),
+)
+
+
+def compare(results, baseline, threshold=0.10):
+    """
+    Diff results against a baseline run.
+
+    Returns one row per (case, metric) present in both runs, with the relative change
+    and a status: 'regression' if the metric grew by more than `threshold`,
+    'improvement' if it shrank by more than that, otherwise 'ok'. Cases only in one
+    of the runs are reported as 'new' or 'missing'.
+    """
+    rows = []
+    current_cases = results['cases']
+    baseline_cases = baseline['cases']
+    for name, result in current_cases.items():
+        base = baseline_cases.get(name)
+        if base is None:
+            rows.append({'case': name, 'metric': None, 'status': 'new'})
+            continue
+        for metric, value, floor in COMPARED_METRICS:
+            old, new = value(base), value(result)
+            change = (max(new, floor) - max(old, floor)) / max(old, floor)
+            if change > threshold:
+                status = 'regression'
+            elif change < -threshold:
+                status = 'improvement'
+            else:
+                status = 'ok'
+            rows.append({'case': name, 'metric': metric, 'baseline': old, 'current': new,
+                         'change': change, 'status': status})
+    for name in baseline_cases:
+        if name not in current_cases:
+            rows.append({'case': name, 'metric': None, 'status': 'missing'})
+    return rows
+
+
+def format_comparison(rows):
+    """Render compare() rows as a diff-style table: '+' regressions, '-' improvements"""
+    marks = {'regression': '+', 'improvement': '-', 'ok': ' ', 'new': '>', 'missing': '<'}
+    width = max([len(row['case']) for row in rows] + [4])
+    lines = [f"  {'case':<{width}}  {'metric':<13} {'baseline':>12} {'current':>12} {'change':>8}"]
+    for row in rows:
+        mark = marks[row['status']]
+        if row['metric'] is None:
+            lines.append(f"{mark} {row['case']:<{width}}  ({row['status']})")
+            continue
+        lines.append(f"{mark} {row['case']:<{width}}  {row['metric']:<13} {row['baseline']:>12.3f} "
+                     f"{row['current']:>12.3f} {row['change']:>+8.1%}")
+    return '\n'.join(lines)
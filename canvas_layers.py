@@ -0,0 +1,75 @@
+class CanvasLayers:
+    """
+    Registry of persistent canvas items, one item per named layer.
+
+    Layers are created once and then shown, hidden or updated in place, so clearing
+    or redrawing the display touches a fixed number of items no matter how long the
+    session has been running. Items are kept in the stacking order given by ORDER.
+    """
+    ORDER = ('border', 'content_area', 'mask', 'stimulus', 'fixation', 'iti_message')
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.items = {}  # layer name -> canvas item id
+
+    def create(self, name, kind, coords, hidden=False, **options):
+        """Create the item for a layer, or update it in place if it already exists"""
+        if name in self.items:
+            self.update(name, coords=coords, **options)
+            if hidden:
+                self.hide(name)
+            else:
+                self.show(name)
+            return self.items[name]
+
+        factory = getattr(self.canvas, f'create_{kind}')
+        item = factory(*coords, state='hidden' if hidden else 'normal', tags=f'layer_{name}', **options)
+        self.items[name] = item
+        self.restack()
+        return item
+
+    def get(self, name):
+        return self.items.get(name)
+
+    def has(self, name):
+        return name in self.items
+
+    def show(self, *names):
+        for name in names:
+            item = self.items.get(name)
+            if item is not None:
+                self.canvas.itemconfig(item, state='normal')
+
+    def hide(self, *names):
+        for name in names:
+            item = self.items.get(name)
+            if item is not None:
+                self.canvas.itemconfig(item, state='hidden')
+
+    def update(self, name, coords=None, **options):
+        """Move and/or reconfigure a layer's item without recreating it"""
+        item = self.items.get(name)
+        if item is None:
+            return
+        if coords is not None:
+            self.canvas.coords(item, *coords)
+        if options:
+            self.canvas.itemconfig(item, **options)
+
+    def restack(self):
+        """Raise layer items into ORDER; anything drawn outside the registry stays underneath"""
+        for name in self.ORDER:
+            item = self.items.get(name)
+            if item is not None:
+                self.canvas.tag_raise(item)
+
+    def raise_above(self, name):
+        """Put `name` and every layer stacked after it back on top of newer items"""
+        for layer in self.ORDER[self.ORDER.index(name):]:
+            item = self.items.get(layer)
+            if item is not None:
+                self.canvas.tag_raise(item)
+
+    def forget(self):
+        """Drop all registered ids, e.g. after the canvas has been cleared with delete('all')"""
+        self.items.clear()
@@ -6,10 +6,18 @@ import random
 import sys
 import subprocess
 from base_module import load_config
+from config_service import ConfigService, get_config
+
+# Settings that have no widget in this window; they are edited directly in config.json
+# and carried over whenever the window rewrites the file
+ADVANCED_SETTINGS = tuple(setting.key for setting in ConfigService.settings() if setting.advanced)
 
 class ConfigWindow:
-    def __init__(self, master):
+    def __init__(self, master, on_start=None, on_exit=None):
         self.master = master
+        # Session callbacks; without them the window ends the application itself
+        self.on_start = on_start
+        self.on_exit = on_exit
         self.master.title("b-CFS Configuration Settings")
         self.master.geometry("600x550")  # Increased window size for practice directory option
 
@@ -211,6 +219,12 @@ class ConfigWindow:
         """Handle window close ('X' button) - exit application completely"""
         if messagebox.askyesno("Exit", "Are you sure you want to exit the application?"):
             self.master.destroy()
+            self.finish_exit()
+
+    def finish_exit(self):
+        if self.on_exit:
+            self.on_exit()
+        else:
             sys.exit(0)
 
     def toggle_practice_mode(self):
@@ -333,6 +347,12 @@ class ConfigWindow:
             'run_practice_first': self.practice_var.get()
         }
 
+        # Keep advanced settings from the existing config file
+        existing_config = load_config()
+        for key in ADVANCED_SETTINGS:
+            if key in existing_config:
+                config[key] = existing_config[key]
+
         # Add practice mode settings if applicable
         if is_practice:
             config['is_practice'] = True
@@ -385,8 +405,7 @@ class ConfigWindow:
             practice_config['main_task_trials'] = trials_total
             
             # Save practice config
-            with open('config.json', 'w') as config_file:
-                json.dump(practice_config, config_file)
+            get_config().replace(practice_config)
         else:
             # Just run main task
             config = self.create_config_dict(
@@ -396,14 +415,15 @@ class ConfigWindow:
             )
             config['auto_progress_to_main'] = False
             
-            with open('config.json', 'w') as config_file:
-                json.dump(config, config_file)
+            get_config().replace(config)
         
         # Save persistent settings before closing
         self.save_persistent_settings()
         
         # Close window and start task
         self.master.destroy()
+        if self.on_start:
+            self.on_start()
 
     def clear_data(self):
         """Clear all data files and reset configuration"""
@@ -412,6 +432,10 @@ class ConfigWindow:
             # List of files to remove
             files_to_remove = [
                 'trial_data.csv',  # Single unified data file
+                'frame_timing_summary.csv',
+                'frame_timing_stalls.csv',
+                'trial_schedule_practice.npz',
+                'trial_schedule_main.npz',
                 'temp_main_config.json',
                 'config.json',
                 # Note: config_ui_settings.json is NOT cleared to preserve UI preferences
@@ -438,7 +462,7 @@ class ConfigWindow:
             # Close the window
             self.master.destroy()
             # Exit the application completely
-            sys.exit(0)
+            self.finish_exit()
 
     def save_config(self):
         """Save the regular configuration and start the experiment"""
@@ -466,13 +490,14 @@ class ConfigWindow:
             config['switch_trial'] = 0
             print("Switch suppressor disabled")
 
-        with open('config.json', 'w') as config_file:
-            json.dump(config, config_file)
+        get_config().replace(config)
         
         # Save persistent settings before closing
         self.save_persistent_settings()
         
         self.master.destroy()
+        if self.on_start:
+            self.on_start()
 
     def load_persistent_settings(self):
         """Load persistent UI settings from file"""
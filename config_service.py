@@ -0,0 +1,168 @@
+import json
+import os
+
+
+class Setting:
+    """
+    Typed, read-only view of one config.json key on a ConfigService.
+
+    Advanced settings have no widget in the configuration window; they are edited in
+    config.json directly (see config_file.ADVANCED_SETTINGS).
+    """
+
+    def __init__(self, key, cast, default, advanced=False):
+        self.key = key
+        self.cast = cast
+        self.default = default
+        self.advanced = advanced
+
+    def __get__(self, service, owner=None):
+        if service is None:
+            return self
+        value = service.get(self.key)
+        if value is None:
+            return self.default
+        try:
+            return self.cast(value)
+        except (ValueError, TypeError):
+            return self.default
+
+
+class ConfigService:
+    """
+    Process-wide view of config.json.
+
+    The file is parsed once and re-parsed only when its modification time or size
+    changes, so reading settings inside key handlers costs a single stat() call.
+    Writes go through update()/replace(), which persist the file and refresh the
+    cached copy in one step.
+    """
+    participant_id = Setting('participant_id', str, '1111')
+    trials_total = Setting('trials_total', int, 20)
+    main_task_trials = Setting('main_task_trials', int, 20)
+    mask_dir = Setting('mask_dir', str, 'mask_dir')
+    stim_dir = Setting('stim_dir', str, 'stim_dir')
+    practice_dir = Setting('practice_dir', str, None)
+    mask_position = Setting('mask_position', str, 'left')
+    blend_duration = Setting('blend_duration', int, 10000)
+    mask_cycle_time = Setting('mask_cycle_time', int, 100)
+    iti_message_delay = Setting('iti_message_delay', int, 500)
+    iti_message_text = Setting('iti_message_text', str, 'Press SPACE to continue')
+    canvas_bg_color = Setting('canvas_bg_color', str, '#808080')
+    alpha_reverse = Setting('alpha_reverse', bool, False)
+    is_practice = Setting('is_practice', bool, False)
+    auto_progress_to_main = Setting('auto_progress_to_main', bool, False)
+    practice_sequence = Setting('practice_sequence', list, [])
+    switch_suppressor = Setting('switch_suppressor', bool, False)
+    switch_trial = Setting('switch_trial', int, 0)
+    frame_cache_mb = Setting('frame_cache_mb', int, 256, advanced=True)
+    blend_engine = Setting('blend_engine', str, 'pil', advanced=True)
+    checkerboard_square_size = Setting('checkerboard_square_size', int, 20, advanced=True)
+    record_frame_timing = Setting('record_frame_timing', bool, False, advanced=True)
+    frame_timing_capacity = Setting('frame_timing_capacity', int, 65536, advanced=True)
+    trial_log_flush_interval_ms = Setting('trial_log_flush_interval_ms', int, 1000, advanced=True)
+    trial_log_flush_rows = Setting('trial_log_flush_rows', int, 10, advanced=True)
+    session_store = Setting('session_store', bool, True, advanced=True)
+    session_db = Setting('session_db', str, 'session_data.db', advanced=True)
+    lazy_image_loading = Setting('lazy_image_loading', bool, False, advanced=True)
+    image_cache_mb = Setting('image_cache_mb', int, 512, advanced=True)
+    prefetch_depth = Setting('prefetch_depth', int, 3, advanced=True)
+    image_disk_cache = Setting('image_disk_cache', bool, False, advanced=True)
+    image_disk_cache_dir = Setting('image_disk_cache_dir', str, 'image_cache', advanced=True)
+    image_decode_workers = Setting('image_decode_workers', int, 0, advanced=True)
+    image_decode_pool = Setting('image_decode_pool', str, 'thread', advanced=True)
+    mask_source = Setting('mask_source', str, 'directory', advanced=True)
+    mondrian_frames = Setting('mondrian_frames', int, 60, advanced=True)
+    mondrian_rect_count = Setting('mondrian_rect_count', int, 250, advanced=True)
+    mondrian_min_size = Setting('mondrian_min_size', int, 20, advanced=True)
+    mondrian_max_size = Setting('mondrian_max_size', int, 200, advanced=True)
+    mondrian_size_distribution = Setting('mondrian_size_distribution', str, 'uniform', advanced=True)
+    mondrian_palette = Setting('mondrian_palette', list, [], advanced=True)
+    mondrian_seed = Setting('mondrian_seed', int, 0, advanced=True)
+    schedule_seed = Setting('schedule_seed', int, None, advanced=True)
+    schedule_stimulus_order = Setting('schedule_stimulus_order', str, 'sequential', advanced=True)
+    schedule_max_position_run = Setting('schedule_max_position_run', int, 0, advanced=True)
+    schedule_replay_dir = Setting('schedule_replay_dir', str, None, advanced=True)
+    log_file = Setting('log_file', str, 'session.log', advanced=True)
+    log_level = Setting('log_level', str, 'INFO', advanced=True)
+    log_console = Setting('log_console', bool, True, advanced=True)
+    log_max_kb = Setting('log_max_kb', int, 1024, advanced=True)
+    log_backups = Setting('log_backups', int, 3, advanced=True)
+    stall_watchdog = Setting('stall_watchdog', bool, False, advanced=True)
+    stall_threshold_ms = Setting('stall_threshold_ms', int, 50, advanced=True)
+    stall_heartbeat_ms = Setting('stall_heartbeat_ms', int, 10, advanced=True)
+    stall_stack_depth = Setting('stall_stack_depth', int, 12, advanced=True)
+
+    @classmethod
+    def settings(cls):
+        """Every Setting declared on the service, in declaration order"""
+        return [value for value in vars(cls).values() if isinstance(value, Setting)]
+
+    def __init__(self, config_path='config.json'):
+        self.config_path = config_path
+        self._data = {}
+        self._signature = None  # (mtime_ns, size) of the parsed file, or None if missing
+        self.reload_count = 0
+
+    def _current_signature(self):
+        try:
+            stat = os.stat(self.config_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        """Re-parse the file if it changed on disk since it was last read"""
+        signature = self._current_signature()
+        if self.reload_count and signature == self._signature:
+            return
+        if signature is None:
+            self._data = {}
+        else:
+            try:
+                with open(self.config_path, 'r') as config_file:
+                    self._data = json.load(config_file)
+            except FileNotFoundError:
+                self._data = {}
+                signature = None
+        self._signature = signature
+        self.reload_count += 1
+
+    def get(self, key, default=None):
+        self.refresh()
+        return self._data.get(key, default)
+
+    def as_dict(self):
+        """Return a copy of the whole config that callers may modify freely"""
+        self.refresh()
+        return dict(self._data)
+
+    def update(self, changes=None, remove=(), **kwargs):
+        """Apply changes to the current config and persist it"""
+        config = self.as_dict()
+        config.update(changes or {}, **kwargs)
+        for key in remove:
+            config.pop(key, None)
+        self.replace(config)
+        return config
+
+    def replace(self, config):
+        """Persist `config` as the whole config file"""
+        temp_path = self.config_path + '.tmp'
+        with open(temp_path, 'w') as config_file:
+            json.dump(config, config_file)
+        os.replace(temp_path, self.config_path)
+        self._data = dict(config)
+        self._signature = self._current_signature()
+
+
+_services = {}
+
+
+def get_config(config_path='config.json'):
+    """Return the shared ConfigService for `config_path`"""
+    service = _services.get(config_path)
+    if service is None:
+        service = ConfigService(config_path)
+        _services[config_path] = service
+    return service
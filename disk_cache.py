@@ -0,0 +1,177 @@
+import atexit
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+from PIL import Image
+from session_log import get_logger
+
+log = get_logger('disk_cache')
+
+HEADER = struct.Struct('<II')  # width, height of the raw RGBA pixels that follow
+
+
+class DecodedImageCache:
+    """
+    Directory of preprocessed (decoded, RGBA, resized) images stored as raw pixels.
+
+    Entries are keyed by the source file's content hash, the resize dimensions and the
+    mode, and are read back through mmap, so a warm start costs a page-cache read per
+    image instead of a decode. An entry that cannot be read for any reason is a miss. index.json remembers each source file's hash together with
+    its modification time and size; the hash is only recomputed when those change, and
+    entries for content that no longer exists are deleted.
+    """
+    MODE = 'RGBA'
+
+    def __init__(self, cache_dir='image_cache'):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.index_path = os.path.join(cache_dir, 'index.json')
+        self.lock = threading.Lock()  # The prefetcher decodes on a worker thread
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+        try:
+            with open(self.index_path, 'r') as index_file:
+                self.index = json.load(index_file)
+        except (FileNotFoundError, ValueError):
+            self.index = {}
+
+    def digest(self, image_path):
+        """Content hash of the source file, reusing the stored one while mtime and size match"""
+        path = os.path.abspath(image_path)
+        stat = os.stat(path)
+        with self.lock:
+            entry = self.index.get(path)
+            if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                return entry['digest']
+
+        hasher = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as source:
+            for chunk in iter(lambda: source.read(1 << 20), b''):
+                hasher.update(chunk)
+        digest = hasher.hexdigest()
+
+        with self.lock:
+            old = self.index.get(path)
+            self.index[path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'digest': digest}
+            self.dirty = True
+            if old and old['digest'] != digest:
+                self._remove_unreferenced(old['digest'])
+        return digest
+
+    def _remove_unreferenced(self, digest):
+        if any(entry['digest'] == digest for entry in self.index.values()):
+            return
+        for stale in glob.glob(os.path.join(self.cache_dir, f'{digest}_*.raw')):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+    def entry_path(self, digest, resize_dims):
+        size = f'{resize_dims[0]}x{resize_dims[1]}' if resize_dims else 'orig'
+        return os.path.join(self.cache_dir, f'{digest}_{size}_{self.MODE}.raw')
+
+    def load(self, image_path, resize_dims, decode, zero_copy=False):
+        """Return the preprocessed image, calling `decode(path, resize_dims)` only on a miss"""
+        image = self.lookup(image_path, resize_dims, zero_copy)
+        if image is None:
+            image = decode(image_path, resize_dims)
+            self.save(image_path, resize_dims, image)
+        return image
+
+    def lookup(self, image_path, resize_dims, zero_copy=False):
+        """Return the cached image, or None (counted as a miss) if it has to be decoded"""
+        image = self._read(self.entry_path(self.digest(image_path), resize_dims), zero_copy)
+        if image is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return image
+
+    def save(self, image_path, resize_dims, image):
+        self._write(self.entry_path(self.digest(image_path), resize_dims), image)
+
+    def _read(self, entry_path, zero_copy=False):
+        """
+        The image stored at `entry_path`, or None if it is missing, unreadable or truncated.
+
+        With `zero_copy` the image is a view of the mapped file and keeps the mapping, and
+        with it a file descriptor, open for as long as it lives; only the bounded LRU of
+        lazy loading uses that. Otherwise the pixels are copied out and the mapping closed,
+        so an eager load of thousands of images does not hold a descriptor per image.
+        """
+        try:
+            with open(entry_path, 'rb') as raw:
+                mapped = mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None  # Missing, unreadable, or empty (mmap refuses 0-byte files)
+        image = None
+        try:
+            if len(mapped) >= HEADER.size:
+                width, height = HEADER.unpack_from(mapped, 0)
+                if len(mapped) == HEADER.size + width * height * 4:
+                    if zero_copy:
+                        # The image holds the only reference to the mapping
+                        return Image.frombuffer(self.MODE, (width, height), memoryview(mapped)[HEADER.size:],
+                                                'raw', self.MODE, 0, 1)
+                    with memoryview(mapped) as pixels:
+                        image = Image.frombytes(self.MODE, (width, height), pixels[HEADER.size:])
+        except (ValueError, struct.error):
+            image = None
+        mapped.close()
+        return image
+
+    def _write(self, entry_path, image):
+        temp_path = f'{entry_path}.{threading.get_ident()}.tmp'
+        try:
+            with open(temp_path, 'wb') as raw:
+                raw.write(HEADER.pack(*image.size))
+                raw.write(image.tobytes())
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            log.warning("Could not write image cache entry %s: %s", entry_path, e)
+
+    def flush(self):
+        """Persist the hash index if it changed"""
+        with self.lock:
+            if not self.dirty:
+                return
+            index = dict(self.index)
+            self.dirty = False
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, self.index_path)
+
+
+# Process-wide cache; None unless image_disk_cache is enabled in config
+cache = None
+
+
+def configure(config):
+    """Enable or disable the on-disk decoded image cache from config"""
+    global cache
+    if config.get('image_disk_cache', False):
+        cache_dir = config.get('image_disk_cache_dir', 'image_cache')
+        if cache is None or cache.cache_dir != cache_dir:
+            if cache is not None:
+                cache.flush()
+            cache = DecodedImageCache(cache_dir)
+    else:
+        if cache is not None:
+            cache.flush()
+        cache = None
+    return cache
+
+
+def flush():
+    if cache is not None:
+        cache.flush()
+
+
+atexit.register(flush)
@@ -6,15 +6,29 @@ import os
 import sys
 import subprocess
 import time
+import timing
+import frame_timing
+import disk_cache
+import dominance
+import trial_schedule
+import session_log
+import stall_watchdog
 from functools import partial
 from mask_file import ImageCycler
 from stim_file import Stimulus
 from config_file import ConfigWindow
+from session_controller import SessionController
 from base_module import load_config
+from render_backend import get_backend
+from config_service import get_config
+from trial_log import TRIAL_FIELDNAMES, TrialLogWriter
+from session_store import SessionStore
+
+log = session_log.get_logger('display')
 
 def create_module(root, module_class, image_dir, canvas_side, cycle_time=None):
     # Create a frame to hold the module with padding for centering
-    frame = tk.Frame(root, bg="black")
+    frame = get_backend(root).create_frame(root, bg="black")
     # Pack with equal weight to ensure symmetric positioning
     frame.pack(side=canvas_side, fill="both", expand=True)
 
@@ -35,20 +49,38 @@ def create_module(root, module_class, image_dir, canvas_side, cycle_time=None):
     # Store the module type for easier identification
     module.type = 'mask' if module_class == ImageCycler else 'stim'
 
-    print(f"Created {module.type} module with side: {canvas_side}")
+    log.info("Created %s module with side: %s", module.type, canvas_side)
 
     return module
 
-trial_data = []
-iti_start_time = [None]  # Track when ITI message was shown
+trial_data = []  # Practice rows kept in memory for the dominance calculation
+trial_log = [None]  # Streaming TrialLogWriter for the current session
+session_store = [None]  # SQLite SessionStore shared across sessions (if enabled)
 last_response_time = [0]  # Track last response time for debouncing
 RESPONSE_DEBOUNCE_MS = 200  # Minimum time between responses in milliseconds (increased from 100)
+TASK_KEYS = ('<space>', 'a', 'z', 'q')
+
+def return_to_config(main_root):
+    """Hand the session back to the configuration window"""
+    controller = getattr(main_root, 'session_controller', None)
+    if controller:
+        controller.show_config()
+        return
+    # Not running under a SessionController: relaunch the config window instead
+    if main_root:
+        main_root.destroy()
+    subprocess.Popen([sys.executable, 'display_file.py', '--show-config'])
+
+def handle_key_press(event, modules, trial_count, trials_total, main_root=None):
+    # Ignore keys while the session is moving from practice to the main task
+    controller = getattr(main_root, 'session_controller', None)
+    if controller and controller.in_transition:
+        return
 
-def handle_key_press(event, modules, trial_count, trials_total, switch_trial=None, main_root=None):
     # Debounce: ignore responses that come too quickly
-    current_time = time.time() * 1000  # Convert to milliseconds
+    current_time = timing.ns_to_ms(timing.event_time_ns(event))  # Monotonic response stamp in milliseconds
     if current_time - last_response_time[0] < RESPONSE_DEBOUNCE_MS:
-        print(f"Response ignored (debounce): {event.keysym}")
+        log.debug("Response ignored (debounce): %s", event.keysym)
         return
     
     last_response_time[0] = current_time
@@ -61,69 +93,61 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
 
     # Check if 'q' was pressed to terminate the task and return to config
     if response == 'q':
-        print("Task terminated by user. Returning to configuration window.")
+        log.info("Task terminated by user. Returning to configuration window.")
         # Save any pending data
         for module in modules:
             if hasattr(module, 'save_trial_data'):
                 module.save_trial_data()
 
-        # Determine if practice mode
-        config = load_config()
-        is_practice = config.get('is_practice', False)
-        
         # Save data appropriately
-        write_trial_data_to_csv(trial_data, is_practice)
-        
-        # Close current window
-        if main_root:
-            main_root.destroy()
+        finalize_session_data()
         
         # Always return to config (never exit app)
-        subprocess.Popen([sys.executable, 'display_file.py', '--show-config'])
+        return_to_config(main_root)
         return
     
     if trial_count[0] >= trials_total:
-        print(f"Current phase completed ({trial_count[0]} trials).")
+        log.info("Current phase completed (%s trials).", trial_count[0])
         # Check if we're in practice mode
-        config = load_config()
-        is_practice = config.get('is_practice', False)
-        auto_progress = config.get('auto_progress_to_main', False)
+        settings = get_config()
+        is_practice = settings.is_practice
+        auto_progress = settings.auto_progress_to_main
         
-        # Write trial data (append mode for continuous session)
-        write_trial_data_to_csv(trial_data, is_practice, append_mode=False)
+        # Make sure every row of this phase is on disk (the log stays open for the main task)
+        if trial_log[0]:
+            trial_log[0].flush()
+        if session_store[0]:
+            session_store[0].flush()
 
         # Check if we should auto-progress to main task
         if is_practice and auto_progress:
-            print("Practice completed. Transitioning to main task...")
+            log.info("Practice completed. Transitioning to main task...")
             
             # Calculate suppressor position from practice data
             calculated_position = calculate_dominance_from_practice_data(trial_data)
             
             if calculated_position:
-                print(f"Calculated suppressor position: {calculated_position.upper()}")
+                log.info("Calculated suppressor position: %s", calculated_position.upper())
             else:
-                print("Warning: Could not calculate dominance. Using config default.")
-                calculated_position = config.get('mask_position', 'left')
+                log.warning("Could not calculate dominance. Using config default.")
+                calculated_position = settings.mask_position
             
-            # Update config for main task
-            main_task_trials = config.get('main_task_trials', 20)
-            config['is_practice'] = False
-            config['auto_progress_to_main'] = False
-            config['trials_total'] = main_task_trials
-            config['mask_position'] = calculated_position
-            config.pop('practice_sequence', None)  # Remove practice sequence
-            
-            # Save updated config
-            with open('config.json', 'w') as file:
-                json.dump(config, file)
+            # Update and save config for main task, removing the practice sequence
+            main_task_trials = settings.main_task_trials
+            config = settings.update({
+                'is_practice': False,
+                'auto_progress_to_main': False,
+                'trials_total': main_task_trials,
+                'mask_position': calculated_position,
+            }, remove=('practice_sequence',))
             
             # STEP 1: Stop all module activity and reset state IMMEDIATELY
-            print("=== STOPPING ALL MODULE ACTIVITY ===")
+            log.info("=== STOPPING ALL MODULE ACTIVITY ===")
             for module in modules:
                 # Cancel any pending ITI messages FIRST (critical!)
                 if hasattr(module, 'cancel_iti_message'):
                     module.cancel_iti_message()
-                    print(f"Cancelled pending ITI messages for {module.__class__.__name__}")
+                    log.debug("Cancelled pending ITI messages for %s", module.__class__.__name__)
                 
                 # Stop any ongoing processes
                 if hasattr(module, 'blending'):
@@ -134,24 +158,24 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
                     module.current_alpha = 0.0
                 if hasattr(module, 'trial_start_time'):
                     module.trial_start_time = None
-                if hasattr(module, 'first_space_press_time'):
-                    module.first_space_press_time = None
-                print(f"Stopped activity in {module.__class__.__name__}")
+                if hasattr(module, 'onset_ns'):
+                    module.onset_ns = None
+                log.debug("Stopped activity in %s", module.__class__.__name__)
             
-            # STEP 2: Clear ALL canvas content
-            print("=== CLEARING ALL CANVASES ===")
+            # STEP 2: Clear all trial content from the canvases
+            log.info("=== CLEARING ALL CANVASES ===")
             for module in modules:
-                if hasattr(module, 'canvas'):
-                    # Clear absolutely everything
-                    module.canvas.delete('all')
-                    print(f"Cleared canvas for {module.__class__.__name__}")
+                if hasattr(module, 'clear_trial_layers'):
+                    # Hide mask/stimulus/ITI layers
+                    module.clear_trial_layers()
+                    log.debug("Cleared canvas for %s", module.__class__.__name__)
             
             # Force GUI update to apply clearing
             main_root.update_idletasks()
             main_root.update()
 
             # STEP 2.5: Switch stimulus directory if practice used a separate directory
-            print("=== CHECKING STIMULUS DIRECTORY ===")
+            log.info("=== CHECKING STIMULUS DIRECTORY ===")
             practice_dir = config.get('practice_dir', None)
             main_stim_dir = config.get('stim_dir', 'stim_dir')
 
@@ -160,7 +184,7 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
 
             if practice_dir and stim_module:
                 # Practice used a separate directory, need to reload images from main stim_dir
-                print(f"Switching stimulus directory from practice_dir to stim_dir: {main_stim_dir}")
+                log.info("Switching stimulus directory from practice_dir to stim_dir: %s", main_stim_dir)
                 try:
                     # Update the image directory
                     stim_module.image_dir = main_stim_dir
@@ -168,14 +192,16 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
                     stim_module.images = stim_module.load_images()
                     # Reset the current image index
                     stim_module.current_image_index = 0
-                    print(f"Successfully loaded {len(stim_module.images)} images from main stim_dir")
+                    # Pre-render the first main-task stimulus from the new directory
+                    stim_module.prerender_next_stimulus()
+                    log.info("Successfully loaded %s images from main stim_dir", len(stim_module.images))
                 except Exception as e:
-                    print(f"Error loading images from main stim_dir: {e}")
+                    log.error("Error loading images from main stim_dir: %s", e)
             else:
-                print("No directory switch needed - practice used same stim_dir as main task")
+                log.info("No directory switch needed - practice used same stim_dir as main task")
 
             # STEP 3: Reposition modules for main task
-            print("=== REPOSITIONING MODULES ===")
+            log.info("=== REPOSITIONING MODULES ===")
             mask_module = next((m for m in modules if hasattr(m, 'type') and m.type == 'mask'), None)
             if not stim_module:  # Get it again if we didn't get it above
                 stim_module = next((m for m in modules if hasattr(m, 'type') and m.type == 'stim'), None)
@@ -199,98 +225,86 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
                 stim_module.side = opposite_position
                 
                 container.update()
-                print(f"Suppressor repositioned - Mask: {calculated_position}, Stim: {'right' if calculated_position == 'left' else 'left'}")
+                log.info("Suppressor repositioned - Mask: %s, Stim: %s", calculated_position,
+                         'right' if calculated_position == 'left' else 'left')
             
+            # STEP 3.5: Plan the main task now that its suppressor side is known
+            if mask_module and stim_module:
+                log.info("=== SCHEDULING MAIN TASK ===")
+                main_task_trials = start_schedule(config, main_task_trials, mask_module, stim_module)
+
             # STEP 4: Redraw borders and fixation crosses
-            print("=== REDRAWING VISUAL ELEMENTS ===")
+            log.info("=== REDRAWING VISUAL ELEMENTS ===")
             for module in modules:
                 # Redraw checkerboard border if it exists
                 if hasattr(module, 'draw_checkerboard_border'):
                     try:
                         module.draw_checkerboard_border(60)
-                        print(f"Redrew border for {module.__class__.__name__}")
+                        log.debug("Redrew border for %s", module.__class__.__name__)
                     except Exception as e:
-                        print(f"Could not redraw border: {e}")
+                        log.warning("Could not redraw border: %s", e)
                 
-                # Redraw content area if it exists
-                if hasattr(module, 'content_area'):
+                # Make sure the fixation cross is showing
+                if hasattr(module, 'place_fixation_point'):
                     try:
-                        border_width = 60
-                        module.content_area = module.canvas.create_rectangle(
-                            border_width, border_width,
-                            border_width + module.canvas_width, border_width + module.canvas_height,
-                            fill=module.canvas_bg_color, outline='', tags='content_area'
-                        )
-                        print(f"Redrew content area for {module.__class__.__name__}")
+                        module.place_fixation_point()
+                        log.debug("Redrew fixation for %s", module.__class__.__name__)
                     except Exception as e:
-                        print(f"Could not redraw content area: {e}")
-                
-                # Redraw fixation cross
-                if hasattr(module, 'show_fixation'):
-                    try:
-                        module.show_fixation()
-                        print(f"Redrew fixation for {module.__class__.__name__}")
-                    except Exception as e:
-                        print(f"Could not redraw fixation: {e}")
+                        log.warning("Could not redraw fixation: %s", e)
             
             # Force another GUI update
             main_root.update_idletasks()
-            main_root.update()
-            
-            # STEP 5: Show standby window with longer delay
-            print("=== SHOWING STANDBY WINDOW ===")
-            iti_delay = config.get('iti_message_delay', 2000)
-            # Use at least 2 seconds for transition
-            transition_delay = max(iti_delay, 2000)
-            show_standby_window(transition_delay)
-            
-            # STEP 6: Reset trial counter and data
-            print("=== RESETTING TRIAL DATA ===")
-            trial_count[0] = 0
-            trial_data.clear()  # Clear practice data from memory (already saved to CSV)
-            
-            # Reset debounce timer to allow immediate responses in main task
-            last_response_time[0] = 0
-            
-            # STEP 7: Rebind keys with updated trial counter and trials_total
-            print("=== REBINDING KEYS ===")
-            main_root.unbind_all('<space>')
-            main_root.unbind_all('a')
-            main_root.unbind_all('z')
-            main_root.unbind_all('q')
-            
-            handler = partial(handle_key_press, modules=modules, trial_count=trial_count,
-                            trials_total=main_task_trials, switch_trial=config.get('switch_trial'),
-                            main_root=main_root)
-            
-            for key in ('<space>', 'a', 'z', 'q'):
-                main_root.bind(key, handler)
-            
-            print("=== STARTING MAIN TASK ===")
-            print(f"Main task: {main_task_trials} trials")
-            
-            # STEP 8: Additional delay and force GUI update
-            main_root.update_idletasks()
-            main_root.update()
-            time.sleep(0.3)  # 300ms additional delay for stability
 
-            # STEP 9: Show ITI message to prompt user to start first trial
-            print("=== SHOWING ITI MESSAGE FOR FIRST TRIAL ===")
-            # Schedule ITI message on both modules to ensure it appears
-            for module in modules:
-                if hasattr(module, 'schedule_iti_message'):
-                    module.schedule_iti_message()
-                    print(f"Scheduled ITI message for {module.__class__.__name__}")
+            # STEP 5: Hold the transition state for the ITI delay while the standby window shows;
+            # key presses are ignored until the main task is ready
+            controller = getattr(main_root, 'session_controller', None)
+            if controller:
+                controller.begin_transition()
+
+            def finish_transition():
+                if controller:
+                    controller.end_transition()
+
+                # STEP 6: Reset trial counter and data
+                log.info("=== RESETTING TRIAL DATA ===")
+                trial_count[0] = 0
+                trial_data.clear()  # Clear practice data from memory (already saved to CSV)
+
+                # Reset debounce timer to allow immediate responses in main task
+                last_response_time[0] = 0
+
+                # STEP 7: Rebind keys with updated trial counter and trials_total
+                log.info("=== REBINDING KEYS ===")
+                for key in TASK_KEYS:
+                    main_root.unbind(key)
+
+                handler = partial(handle_key_press, modules=modules, trial_count=trial_count,
+                                trials_total=main_task_trials, main_root=main_root)
+
+                for key in TASK_KEYS:
+                    main_root.bind(key, handler)
+
+                log.info("=== STARTING MAIN TASK ===")
+                log.info("Main task: %s trials", main_task_trials)
+
+                # STEP 8: Show ITI message to prompt user to start first trial
+                log.info("=== SHOWING ITI MESSAGE FOR FIRST TRIAL ===")
+                # The standby window already covered the ITI delay, so show it on both modules now
+                for module in modules:
+                    if hasattr(module, 'show_iti_message'):
+                        module.show_iti_message()
+                        log.debug("Showed ITI message for %s", module.__class__.__name__)
+
+                log.info("=== TRANSITION COMPLETE - Waiting for user to press SPACE ===")
 
-            print("=== TRANSITION COMPLETE - Waiting for user to press SPACE ===")
+            log.info("=== SHOWING STANDBY WINDOW ===")
+            show_standby_window(config.get('iti_message_delay', 500), parent=main_root,
+                                on_done=finish_transition)
             return
         else:
-            # Not auto-progressing, close window and return to config
-            if main_root:
-                main_root.destroy()
-            
-            time.sleep(1)
-            subprocess.Popen([sys.executable, 'display_file.py', '--show-config'])
+            # Not auto-progressing, return to config
+            finalize_session_data()
+            return_to_config(main_root)
             return
 
     # Get the current mask module and its side
@@ -305,90 +319,31 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
         else:
             # Fall back to getting it from the frame's pack info
             current_mask_side = 'left'  # Default to left if we can't determine
-        print(f"Current mask side: {current_mask_side}")
+        log.debug("Current mask side: %s", current_mask_side)
     except Exception as e:
         # Default if we can't determine
-        print(f"Error determining mask side: {e}, defaulting to 'left'")
+        log.warning("Error determining mask side: %s, defaulting to 'left'", e)
         current_mask_side = 'left'
 
-    # Check if we need to switch positions (if we've reached or passed the switch trial)
-    if switch_trial and trial_count[0] >= switch_trial and not hasattr(main_root, 'switch_done'):
-        print(f"Switching suppressor positions for remaining trials (starting at trial {trial_count[0]})")
-        # Get the current positions of modules
-        mask_module = next((m for m in modules if hasattr(m, 'type') and m.type == 'mask'), None)
-        stim_module = next((m for m in modules if hasattr(m, 'type') and m.type == 'stim'), None)
-
-        if not mask_module or not stim_module:
-            print("Could not identify mask and stim modules")
-            return
-
-        # Get the container (parent of the frames)
-        container = mask_module.frame.master
-
-        # Get current positions
-        mask_frame = mask_module.frame
-        stim_frame = stim_module.frame
-
-        # Get current sides from the module attributes
-        mask_side = mask_module.side
-        stim_side = stim_module.side
-
-        # Print current positions for debugging
-        print(f"Current positions - Mask: {mask_side}, Stim: {stim_side}")
-
-        # Unpack both frames
-        mask_frame.pack_forget()
-        stim_frame.pack_forget()
-
-        # Swap sides
-        new_mask_side = tk.RIGHT if mask_side == tk.LEFT else tk.LEFT
-        new_stim_side = tk.LEFT if new_mask_side == tk.RIGHT else tk.RIGHT
-
-        print(f"New positions - Mask: {'right' if new_mask_side == tk.RIGHT else 'left'}, Stim: {'right' if new_stim_side == tk.RIGHT else 'left'}")
-
-        # Repack with swapped sides
-        mask_frame.pack(side=new_mask_side, fill="both", expand=True)
-        stim_frame.pack(side=new_stim_side, fill="both", expand=True)
-
-        # Update the module's side attribute
-        mask_module.side = new_mask_side
-        stim_module.side = new_stim_side
-
-        # Force update
-        container.update()
-        main_root.update()
-
-        # Mark that we've done the switch so we don't do it again
-        main_root.switch_done = True
-        print("Switch completed successfully")
-
     # Find the stimulus and mask modules
     stim_module = next((module for module in modules if isinstance(module, Stimulus)), None)
     mask_module = next((module for module in modules if isinstance(module, ImageCycler)), None)
 
-    # Check if we're in an inter-trial interval (both modules inactive)
-    is_inter_trial = ((not stim_module.blending) and (not mask_module.image_cycle_running))
+    # The mask cycles for exactly as long as a trial runs, so it alone decides whether one is on;
+    # every module then makes the same transition, whatever state it is in itself
+    is_inter_trial = not mask_module.image_cycle_running
 
     # Only process trial data if we're not in an inter-trial interval
     if not is_inter_trial:
         trial_data_point = {}
 
-        # Process module responses
+        # End the trial in every module
         for module in modules:
-            if hasattr(module, 'image_cycle_running') and module.image_cycle_running:
-                image_y_position, image_path, reaction_time = module.handle_space_press(event)
-                if image_y_position is not None:
-                    trial_data_point['Y Position'] = image_y_position
-                    trial_data_point['Image Path'] = image_path
-                    trial_data_point['Reaction Time'] = reaction_time * 1000
-            elif hasattr(module, 'blending') and module.blending:
-                image_y_position, image_path, reaction_time = module.handle_space_press(event)
-                if image_y_position is not None:
-                    trial_data_point['Y Position'] = image_y_position
-                    trial_data_point['Image Path'] = image_path
-                    trial_data_point['Reaction Time'] = reaction_time * 1000
-            else:
-                module.handle_space_press(event)
+            image_y_position, image_path, reaction_time = module.end_trial(event)
+            if image_y_position is not None:
+                trial_data_point['Y Position'] = image_y_position
+                trial_data_point['Image Path'] = image_path
+                trial_data_point['Reaction Time'] = reaction_time * 1000 if reaction_time is not None else 'N/A'
 
         # Get the current Y position from the stimulus module if available
         if stim_module and stim_module.y_position and 'Y Position' not in trial_data_point:
@@ -401,9 +356,7 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
             trial_data_point['Suppressor Position'] = current_mask_side
             
             # Determine trial type based on config
-            config = load_config()
-            is_practice = config.get('is_practice', False)
-            trial_data_point['Trial Type'] = 'Practice' if is_practice else 'Main'
+            trial_data_point['Trial Type'] = 'Practice' if get_config().is_practice else 'Main'
 
             # Set Stimulus Position based on Y Position
             if 'Y Position' in trial_data_point:
@@ -420,19 +373,19 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
                 # Default values if no position data
                 trial_data_point['Stimulus Position'] = 'unknown'
                 trial_data_point['Accuracy'] = 0
-            trial_data.append(trial_data_point)
-            print(f"Trial {trial_count[0]} completed.")
+            record_trial_row(trial_data_point)
+            # Summarise this trial's frame timing while the ITI starts
+            frame_timing.end_trial()
+            stall_watchdog.end_trial()
+            log.debug("Trial %s completed.", trial_count[0])
             trial_count[0] += 1
     else:
         # We're in an inter-trial interval - record ITI response
         # Calculate ITI reaction time
-        iti_reaction_time = None
-        if iti_start_time[0] is not None:
-            iti_reaction_time = (time.time() - iti_start_time[0]) * 1000  # Convert to ms
+        iti_reaction_time = timing.elapsed_ms(timing.get_mark('iti_onset'), timing.event_time_ns(event))
         
         # Get ITI message text from config
-        config = load_config()
-        iti_message = config.get('iti_message_text', 'Press SPACE to continue')
+        iti_message = get_config().iti_message_text
         
         # Create ITI data point
         iti_data_point = {
@@ -447,19 +400,82 @@ def handle_key_press(event, modules, trial_count, trials_total, switch_trial=Non
             'Trial Type': 'ITI'
         }
         
-        trial_data.append(iti_data_point)
-        print(f"ITI response recorded: {response}, RT: {iti_reaction_time:.0f}ms" if iti_reaction_time else f"ITI response recorded: {response}")
+        record_trial_row(iti_data_point)
+        if iti_reaction_time:
+            log.debug("ITI response recorded: %s, RT: %.0fms", response, iti_reaction_time)
+        else:
+            log.debug("ITI response recorded: %s", response)
         
-        # Reset ITI start time for next interval
-        iti_start_time[0] = None
+        # Reset ITI onset for next interval
+        timing.clear_mark('iti_onset')
         
-        # Handle the space press in modules to advance to next trial
+        # Start trial trial_count[0] as planned: suppressor side first, then each module reads its row
+        if stim_module.schedule is not None and trial_count[0] < len(stim_module.schedule):
+            place_suppressor(mask_module, stim_module, stim_module.schedule.suppressor(trial_count[0]))
+            for module in modules:
+                module.next_trial = trial_count[0]
+
+        # Start the next trial in every module
+        frame_timing.begin_trial(trial_count[0])
+        stall_watchdog.begin_trial(trial_count[0])
         for module in modules:
-            module.handle_space_press(event)
+            module.start_trial()
+
+def start_trial_log(root=None):
+    """Open the session's streaming trial log (trial_data.csv); `root` runs its interval flush"""
+    if trial_log[0]:
+        trial_log[0].finalize()
+    settings = get_config()
+    trial_log[0] = TrialLogWriter('trial_data.csv', settings.participant_id,
+                                  flush_interval_ms=settings.trial_log_flush_interval_ms,
+                                  flush_rows=settings.trial_log_flush_rows, widget=root)
+
+    # Record the session in the SQLite store as well
+    if session_store[0]:
+        session_store[0].close()
+        session_store[0] = None
+    if settings.session_store:
+        try:
+            session_store[0] = SessionStore(settings.session_db)
+            session_store[0].begin_session(settings.participant_id, settings.as_dict())
+        except Exception as e:
+            log.warning("Could not open session store %s: %s", settings.session_db, e)
+            session_store[0] = None
+
+def record_trial_row(row):
+    """Stream a trial or ITI row to the session log; practice trials also stay in memory"""
+    if trial_log[0]:
+        trial_log[0].write_row(row)
+    if session_store[0]:
+        try:
+            session_store[0].add_row(row)
+        except Exception as e:
+            log.error("Could not store trial row: %s", e)
+    if row.get('Trial Type') == 'Practice':
+        trial_data.append(row)
+
+def finalize_session_data():
+    """Sync and close the session's trial log and write the frame timing summary and stalls"""
+    if trial_log[0]:
+        trial_log[0].finalize()
+        trial_log[0] = None
+    if session_store[0]:
+        try:
+            session_store[0].close()
+        except Exception as e:
+            log.warning("Could not close session store: %s", e)
+        session_store[0] = None
+    # Per-trial frame jitter summary next to the trial data (if recording is enabled)
+    frame_timing.export_summary('frame_timing_summary.csv', get_config().participant_id)
+    # Event-loop stalls and where the main thread was (if the watchdog is enabled); the session
+    # is over, so its heartbeat stops here too
+    stall_watchdog.export('frame_timing_stalls.csv', get_config().participant_id)
+    stall_watchdog.stop()
 
 def write_trial_data_to_csv(trial_data, is_practice=False, append_mode=False):
     """
-    Write trial data to CSV file.
+    Write a complete list of trial data to CSV file in one go.
+    The running task streams rows through TrialLogWriter instead.
     
     Args:
         trial_data: List of trial data dictionaries
@@ -470,29 +486,17 @@ def write_trial_data_to_csv(trial_data, is_practice=False, append_mode=False):
     filename = 'trial_data.csv'
 
     # Get participant ID from config
-    config = load_config()
-    participant_id = config.get('participant_id', '1111')  # Default to 1111 if not found
+    participant_id = get_config().participant_id  # Default to 1111 if not found
 
     # Define fieldnames with Trial Type
-    fieldnames = [
-        'Participant ID',
-        'Trial Number',
-        'Trial Type',  # 'Practice', 'Main', or 'ITI'
-        'Y Position',
-        'Stimulus Position',
-        'Image Path',
-        'Reaction Time',
-        'Response',
-        'Suppressor Position',
-        'Accuracy'
-    ]
+    fieldnames = TRIAL_FIELDNAMES
 
     # Determine write mode
     mode = 'a' if append_mode else 'w'
     write_header = not append_mode or not os.path.exists(filename)
 
     with open(filename, mode=mode, newline='') as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames)
+        writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction='ignore')
         
         # Write header if needed
         if write_header:
@@ -504,6 +508,22 @@ def write_trial_data_to_csv(trial_data, is_practice=False, append_mode=False):
             data_with_id['Participant ID'] = participant_id
             writer.writerow(data_with_id)
 
+def report_dominance(result):
+    """Print a single session's dominance analysis and return its suppressor position"""
+    if not len(result):
+        log.info("Found 0 left trials and 0 right trials")
+        log.info("Not enough trials to calculate dominance")
+        return None
+    summary = result.summary(0)
+    log.info("Found %s left trials and %s right trials", summary['left_trials'], summary['right_trials'])
+    if summary['suppressor'] is None:
+        log.info("Not enough trials to calculate dominance")
+        return None
+    log.info("Using %s accurate left trials and %s accurate right trials", summary['left_used'], summary['right_used'])
+    log.info("Left avg: %.0f, Right avg: %.0f", summary['left_mean'] or 0, summary['right_mean'] or 0)
+    # Higher reaction time = more suppression = non-dominant eye; the dominant eye is suppressed
+    return summary['suppressor']
+
 def calculate_dominance_from_practice_data(trial_data):
     """
     Calculate non-dominant eye from practice trial data in memory.
@@ -516,108 +536,38 @@ def calculate_dominance_from_practice_data(trial_data):
         'left' or 'right' for suppressor position, or None if calculation fails
     """
     try:
-        left_rts = []
-        right_rts = []
-        
-        # Filter for practice trials only (not ITI responses)
-        practice_trials = [row for row in trial_data if row.get('Trial Type') == 'Practice']
-        
-        # Separate by suppressor position
-        left_trials = [row for row in practice_trials if row['Suppressor Position'] == 'left']
-        right_trials = [row for row in practice_trials if row['Suppressor Position'] == 'right']
-        
-        print(f"Found {len(left_trials)} left trials and {len(right_trials)} right trials")
-        
-        if len(left_trials) >= 2 and len(right_trials) >= 2:
-            # Skip the first trial for each side and only include accurate responses
-            left_rts = [float(row['Reaction Time']) for row in left_trials[1:]
-                       if row.get('Reaction Time') not in ['N/A', None, '']
-                       and row.get('Accuracy') == 1]
-            right_rts = [float(row['Reaction Time']) for row in right_trials[1:]
-                        if row.get('Reaction Time') not in ['N/A', None, '']
-                        and row.get('Accuracy') == 1]
-            
-            print(f"Using {len(left_rts)} accurate left trials and {len(right_rts)} accurate right trials")
-            print(f"Left RTs: {left_rts}")
-            print(f"Right RTs: {right_rts}")
-            
-            # Calculate averages (only if there are accurate responses)
-            left_avg = sum(left_rts) / len(left_rts) if left_rts else 0
-            right_avg = sum(right_rts) / len(right_rts) if right_rts else 0
-            
-            print(f"Left avg: {left_avg:.0f}, Right avg: {right_avg:.0f}")
-            
-            # Higher reaction time = more suppression = non-dominant eye
-            # We want to suppress the DOMINANT eye (opposite of non-dominant)
-            # If left suppressor causes higher RT, left eye is non-dominant, so use RIGHT suppressor for main task
-            # If right suppressor causes higher RT, right eye is non-dominant, so use LEFT suppressor for main task
-            if left_avg > right_avg:
-                return 'right'  # Left eye non-dom, suppress right (dominant) eye
-            else:
-                return 'left'   # Right eye non-dom, suppress left (dominant) eye
-        else:
-            print("Not enough trials to calculate dominance")
-            return None
-            
+        # Practice trials only (not ITI responses); first trial per side skipped, accurate RTs only
+        table = dominance.TrialTable.from_rows(trial_data, participant_id=get_config().participant_id)
+        return report_dominance(dominance.analyze(table, trial_type='Practice'))
     except Exception as e:
-        print(f"Error calculating dominance from practice data: {e}")
+        log.error("Error calculating dominance from practice data: %s", e)
         return None
 
 def calculate_dominance_from_practice():
     """Calculate non-dominant eye from practice data and return the appropriate suppressor position"""
     try:
-        import csv
-        left_rts = []
-        right_rts = []
-
         with open('practice_trial_data.csv', mode='r', newline='') as file:
-            reader = csv.DictReader(file)
-            rows = list(reader)
-
-            # Get trials for each side
-            left_trials = [row for row in rows if row['Suppressor Position'] == 'left']
-            right_trials = [row for row in rows if row['Suppressor Position'] == 'right']
-
-            print(f"Found {len(left_trials)} left trials and {len(right_trials)} right trials")
-
-            if len(left_trials) >= 2 and len(right_trials) >= 2:
-                # Skip the first trial for each side and only include accurate responses
-                left_rts = [float(row['Reaction Time']) for row in left_trials[1:]
-                           if 'Reaction Time' in row and row['Reaction Time']
-                           and 'Accuracy' in row and row['Accuracy'] == '1']
-                right_rts = [float(row['Reaction Time']) for row in right_trials[1:]
-                            if 'Reaction Time' in row and row['Reaction Time']
-                            and 'Accuracy' in row and row['Accuracy'] == '1']
-
-                print(f"Using {len(left_rts)} accurate left trials and {len(right_rts)} accurate right trials")
-                print(f"Left RTs: {left_rts}")
-                print(f"Right RTs: {right_rts}")
-
-                # Calculate averages (only if there are accurate responses)
-                left_avg = sum(left_rts) / len(left_rts) if left_rts else 0
-                right_avg = sum(right_rts) / len(right_rts) if right_rts else 0
-
-                print(f"Left avg: {left_avg:.0f}, Right avg: {right_avg:.0f}")
-
-                # Higher reaction time = more suppression = non-dominant eye
-                # We want to suppress the DOMINANT eye (opposite of non-dominant)
-                # If left suppressor causes higher RT, left eye is non-dominant, so use RIGHT suppressor for main task
-                # If right suppressor causes higher RT, right eye is non-dominant, so use LEFT suppressor for main task
-                if left_avg > right_avg:
-                    return 'right'  # Left eye non-dom, suppress right (dominant) eye
-                else:
-                    return 'left'   # Right eye non-dom, suppress left (dominant) eye
-            else:
-                print("Not enough trials to calculate dominance")
-                return None
-
+            rows = list(csv.DictReader(file))
+        # Every row of the file counts, as it always has: older practice files may not have a
+        # Trial Type column, and an ITI row can be the first (skipped) row on a side
+        table = dominance.TrialTable.from_rows(rows, participant_id=get_config().participant_id)
+        return report_dominance(dominance.analyze(table, trial_type=None, include_iti=True))
     except Exception as e:
-        print(f"Error calculating dominance from practice data: {e}")
+        log.error("Error calculating dominance from practice data: %s", e)
         return None
 
-def show_standby_window(iti_delay):
-    """Show a brief 'standby' window before starting main task"""
-    standby_root = tk.Tk()
+def show_standby_window(iti_delay, parent=None, on_done=None):
+    """
+    Show a brief 'standby' window before starting main task.
+
+    With a parent window the standby is a Toplevel that closes itself after `iti_delay`
+    and then calls `on_done`, without blocking the Tk event loop. Offscreen there is
+    nothing to show; `on_done` just runs after the delay.
+    """
+    if parent and get_backend(parent).headless:
+        return parent.after(iti_delay, on_done) if on_done else None
+
+    standby_root = tk.Toplevel(parent) if parent else tk.Tk()
     standby_root.title("Standby")
     
     # Center the window
@@ -636,6 +586,17 @@ def show_standby_window(iti_delay):
     
     # Disable window close button
     standby_root.protocol("WM_DELETE_WINDOW", lambda: None)
+
+    if parent:
+        standby_root.transient(parent)
+
+        def finish():
+            standby_root.destroy()
+            if on_done:
+                on_done()
+
+        standby_root.after(iti_delay, finish)
+        return standby_root
     
     # Show window
     standby_root.update()
@@ -645,6 +606,8 @@ def show_standby_window(iti_delay):
     
     # Close window
     standby_root.destroy()
+    if on_done:
+        on_done()
 
 def start_main_task_after_practice(main_task_config):
     """Start the main task using the saved configuration from practice"""
@@ -654,80 +617,81 @@ def start_main_task_after_practice(main_task_config):
         
         if calculated_position:
             main_task_config['mask_position'] = calculated_position
-            print(f"Setting mask position to {calculated_position.upper()} based on practice results")
+            log.info("Setting mask position to %s based on practice results", calculated_position.upper())
         else:
-            print("Warning: Could not calculate dominance. Using config default.")
+            log.warning("Could not calculate dominance. Using config default.")
         
         # Save the main task configuration
-        with open('config.json', 'w') as file:
-            json.dump(main_task_config, file)
+        get_config().replace(main_task_config)
         
         # Show standby window
         iti_delay = main_task_config.get('iti_message_delay', 2000)
         show_standby_window(iti_delay)
         
         # Start the main task
-        print("Starting main task after practice...")
+        log.info("Starting main task after practice...")
         subprocess.Popen([sys.executable, 'display_file.py'])
         
     except Exception as e:
-        print(f"Error starting main task after practice: {e}")
-
-def handle_practice_mode(config, mask_module, stim_module, trials_total):
-    """Handle practice mode with alternating suppressor positions"""
-    # Get the practice sequence from config
-    practice_sequence = config.get('practice_sequence', [])
-    if not practice_sequence or len(practice_sequence) != trials_total:
-        print("Invalid practice sequence. Using default configuration.")
-        # Create a default 5L5R5L5R sequence
-        practice_sequence = ['left'] * 5 + ['right'] * 5 + ['left'] * 5 + ['right'] * 5
-        if len(practice_sequence) > trials_total:
-            practice_sequence = practice_sequence[:trials_total]
-
-    # For 5L5R5L5R pattern, switch points are at trials 5, 10, and 15
-    # These are the indices where we need to switch positions
-    switch_points = [5, 10, 15]
-    if len(practice_sequence) < 20:
-        # Adjust switch points if we have fewer trials
-        switch_points = [p for p in switch_points if p < len(practice_sequence)]
-
-    print(f"Practice sequence: {practice_sequence[:5]}...{practice_sequence[-5:]}")
-    print(f"Switch points: {switch_points}")
-
-    # Set initial position based on the first item in the sequence
-    initial_position = tk.LEFT if practice_sequence[0] == 'left' else tk.RIGHT
-    opposite_position = tk.RIGHT if initial_position == tk.LEFT else tk.LEFT
-
-    print(f"Setting initial mask position to {practice_sequence[0]}")
-
-    # Get the frames
-    mask_frame = mask_module.frame
-    stim_frame = stim_module.frame
-
-    # Get the container
-    container = mask_frame.master
-
-    # Set initial module positions
-    mask_frame.pack_forget()
-    stim_frame.pack_forget()
-
-    # Pack with the correct sides
-    mask_frame.pack(side=initial_position, fill="both", expand=True)
-    stim_frame.pack(side=opposite_position, fill="both", expand=True)
+        log.error("Error starting main task after practice: %s", e)
 
-    # Update the module's side attribute
-    mask_module.side = initial_position
-    stim_module.side = opposite_position
+def place_suppressor(mask_module, stim_module, side):
+    """Put the mask (suppressor) on `side` ('left' or 'right') and the stimulus opposite it"""
+    mask_side = tk.LEFT if side == 'left' else tk.RIGHT
+    if mask_module.side == mask_side:
+        return
+    stim_side = tk.RIGHT if mask_side == tk.LEFT else tk.LEFT
+    log.info("Switching suppressor to %s", side)
 
-    print(f"Initial positions set - Mask: {'left' if initial_position == tk.LEFT else 'right'}, Stim: {'left' if opposite_position == tk.LEFT else 'right'}")
+    # Repack both frames with the new sides
+    mask_module.frame.pack_forget()
+    stim_module.frame.pack_forget()
+    mask_module.frame.pack(side=mask_side, fill="both", expand=True)
+    stim_module.frame.pack(side=stim_side, fill="both", expand=True)
+
+    # Update the module's side attribute
+    mask_module.side = mask_side
+    stim_module.side = stim_side
 
     # Force update to ensure positions are applied
-    container.update()
-    container.master.update()
-    print("Initial position setup completed successfully")
+    mask_module.frame.master.update()
 
-    # Return the switch points for practice mode
-    return switch_points
+def start_schedule(config, trials_total, mask_module, stim_module):
+    """
+    Plan every trial of the phase `config` describes before the first one starts.
+
+    The plan is saved next to the trial data (trial_schedule_practice.npz or
+    trial_schedule_main.npz) so the phase can be replayed with schedule_replay_dir. The
+    modules read their stimulus, height, ramp direction and mask start from it, and the
+    suppressor is placed for the first trial. Returns the number of trials to run, which
+    a replayed plan can cap. A replay that cannot be used (no saved plan for the phase, or
+    stimuli missing from the directory) is logged and replaced by a newly planned schedule,
+    so the phase still starts, even halfway through the practice-to-main transition.
+    """
+    try:
+        schedule = trial_schedule.schedule_from_config(config, trials_total, stim_module.image_files,
+                                                       len(mask_module.images))
+        schedule.resolve(stim_module.image_files)
+    except Exception as e:
+        if not config.get('schedule_replay_dir'):
+            raise
+        log.error("Cannot replay the trial schedule from %s (%s); planning a new one",
+                  config.get('schedule_replay_dir'), e)
+        schedule = trial_schedule.schedule_from_config(dict(config, schedule_replay_dir=None), trials_total,
+                                                       stim_module.image_files, len(mask_module.images))
+    try:
+        schedule.save(trial_schedule.schedule_path(schedule.phase))
+    except OSError as e:
+        log.warning("Could not save trial schedule: %s", e)
+    if len(schedule) < trials_total:
+        log.warning("Schedule has only %s trials; running %s of %s", len(schedule), len(schedule), trials_total)
+        trials_total = len(schedule)
+
+    mask_module.use_schedule(schedule)
+    stim_module.use_schedule(schedule)
+    if len(schedule):
+        place_suppressor(mask_module, stim_module, schedule.suppressor(0))
+    return trials_total
 
 def show_config_window():
     """Show the configuration window and return the loaded config"""
@@ -737,53 +701,35 @@ def show_config_window():
 
     # Only proceed if a button was actually pressed (not just window closed)
     if not config_window.action_taken:
-        print("Config window closed without action. Exiting.")
+        log.info("Config window closed without action. Exiting.")
         sys.exit(0)
 
     return load_config()
 
-def main():
-    # Check if we're being called with special flags
-    if len(sys.argv) > 1:
-        # If we're called with --show-config, just show the config window
-        if sys.argv[1] == '--show-config':
-            show_config_window()
-            return
-        # If we're called with --start-main-task, skip the config window and start the main task directly
-        elif sys.argv[1] == '--start-main-task':
-            # We'll continue with the main function, but we'll set a flag to indicate
-            # that we should use the existing config.json file
-            print("Starting main task directly from practice results")
-            # No need to return here, we'll continue with the main function
-
-    global trial_data
-    trial_data = []  # Reset trial data at start of each run
+def run_task(controller, config):
+    """
+    Build the task for `config` on the session controller's root window.
+
+    Returns a callable that stops the modules and removes the task widgets, which the
+    controller calls when the session goes back to the configuration window.
+    """
+    main_root = controller.root
+    trial_data.clear()  # Reset trial data at start of each run
+    last_response_time[0] = 0
+    timing.clear_mark('iti_onset')
     from packaging_helper import get_resource_path
 
     # Use resource path resolution for directories
     default_mask_dir = get_resource_path('mask_dir')
     default_stim_dir = get_resource_path('stim_dir')
 
-    # Check if we're starting the main task directly
-    start_main_task_directly = len(sys.argv) > 1 and sys.argv[1] == '--start-main-task'
-
-    if start_main_task_directly:
-        # Load the config directly from the file
-        config = load_config()
-        # Set the after_practice flag
-        config['after_practice'] = True
-        print("Loaded configuration directly from file for main task")
-    else:
-        # Show configuration window and get config
-        config = show_config_window()
-
     # Check if this is a main task after practice
     after_practice = config.get('after_practice', False)
 
     # If this is the main task after practice, load the practice data
-    print(f"After practice flag: {after_practice}")
+    log.debug("After practice flag: %s", after_practice)
     if after_practice and os.path.exists('practice_trial_data.csv'):
-        print("Loading practice data for main task...")
+        log.info("Loading practice data for main task...")
         try:
             import csv
             with open('practice_trial_data.csv', mode='r', newline='') as file:
@@ -801,11 +747,25 @@ def main():
                     # Add a flag to indicate this is from practice
                     row['From Practice'] = 'Yes'
 
-                # Add practice data to trial_data
+                # Add practice data to trial_data (the session log is opened below)
                 trial_data.extend(practice_data)
-                print(f"Loaded {len(practice_data)} practice trials")
+                log.info("Loaded %s practice trials", len(practice_data))
         except Exception as e:
-            print(f"Error loading practice data: {e}")
+            log.error("Error loading practice data: %s", e)
+
+    # Log to the rotating session log (and the console, if enabled) from a background thread
+    session_log.configure(config)
+    # Enable per-frame timing instrumentation if requested
+    frame_timing.configure(config)
+    # Watch the Tk event loop for stalls if requested
+    stall_watchdog.configure(main_root, config)
+    # Read preprocessed images from the on-disk cache if enabled
+    disk_cache.configure(config)
+
+    # Open the streaming trial log for this session; carried-over practice rows go first
+    start_trial_log(main_root)
+    for row in trial_data:
+        trial_log[0].write_row(row)
 
     # Get configuration values with defaults to prevent KeyError
     try:
@@ -813,27 +773,27 @@ def main():
     except (KeyError, ValueError, TypeError):
         # Default to 20 trials if there's any issue
         trials_total = 20
-        print("Warning: Using default value of 20 for trials_total")
+        log.warning("Using default value of 20 for trials_total")
 
     try:
         cycle_time = int(config.get('mask_cycle_time', 100))
     except (ValueError, TypeError):
         # Default to 100ms if there's any issue
         cycle_time = 100
-        print("Warning: Using default value of 100ms for mask_cycle_time")
+        log.warning("Using default value of 100ms for mask_cycle_time")
 
     # Use the directories from config if provided, otherwise use defaults
     try:
         mask_dir = config.get('mask_dir', default_mask_dir) or default_mask_dir
     except (KeyError, TypeError):
         mask_dir = default_mask_dir
-        print(f"Warning: Using default mask directory: {default_mask_dir}")
+        log.warning("Using default mask directory: %s", default_mask_dir)
 
     try:
         stim_dir = config.get('stim_dir', default_stim_dir) or default_stim_dir
     except (KeyError, TypeError):
         stim_dir = default_stim_dir
-        print(f"Warning: Using default stimulus directory: {default_stim_dir}")
+        log.warning("Using default stimulus directory: %s", default_stim_dir)
 
     # Check if we're in practice mode and if a separate practice directory is specified
     is_practice = config.get('is_practice', False)
@@ -843,29 +803,15 @@ def main():
     if is_practice and practice_dir:
         # Use practice directory for practice trials
         actual_stim_dir = practice_dir
-        print(f"Using practice stimulus directory: {practice_dir}")
+        log.info("Using practice stimulus directory: %s", practice_dir)
     else:
         # Use regular stim_dir (for main task or practice without separate dir)
         actual_stim_dir = stim_dir
         if is_practice:
-            print(f"No separate practice directory specified - using stim_dir for practice: {stim_dir}")
-
-    main_root = tk.Tk()
-    main_root.title("Image Display Modules")
-    main_root.geometry("1280x800")
-    # Make the window maximized to ensure proper display
-    main_root.state('zoomed')
-    
-    # Attach iti_start_time tracker to main_root so modules can access it
-    main_root.iti_start_time = iti_start_time
-
-    # Configure the main window to ensure symmetric layout
-    main_root.grid_columnconfigure(0, weight=1)
-    main_root.grid_columnconfigure(1, weight=1)
-    main_root.grid_rowconfigure(0, weight=1)
+            log.info("No separate practice directory specified - using stim_dir for practice: %s", stim_dir)
 
     # Set up a container frame to ensure symmetric layout
-    container = tk.Frame(main_root, bg="black")
+    container = get_backend(main_root).create_frame(main_root, bg="black")
     container.pack(fill="both", expand=True)
 
     # Configure the container for equal distribution
@@ -873,9 +819,6 @@ def main():
     container.grid_columnconfigure(1, weight=1)
     container.grid_rowconfigure(0, weight=1)
 
-    # Make the window maximized to ensure proper display
-    main_root.state('zoomed')
-
     # Note: is_practice was already determined above when setting actual_stim_dir
 
     # Set initial mask position with error handling
@@ -884,7 +827,7 @@ def main():
     except (KeyError, TypeError):
         # Default to left if there's any issue
         mask_position = tk.LEFT
-        print("Warning: Using default left position for mask")
+        log.warning("Using default left position for mask")
 
     stim_position = tk.RIGHT if mask_position == tk.LEFT else tk.LEFT
 
@@ -892,146 +835,73 @@ def main():
     stim_module = create_module(container, Stimulus, actual_stim_dir, stim_position)
 
     trial_count = [0]
+    controller.modules = [mask_module, stim_module]
 
-    # Handle switch trial logic
+    # Plan the whole phase up front: practice blocks or the main task's side and switch trial
+    trials_total = start_schedule(config, trials_total, mask_module, stim_module)
     if is_practice:
-        # For practice mode, we'll use the practice sequence
-        switch_points = handle_practice_mode(config, mask_module, stim_module, trials_total)
-        print(f"Practice mode enabled with {trials_total} trials and switch points at {switch_points}")
-
-        # Create a custom handler for practice mode that checks for switch points
-        def practice_handler(event):
-            # Get the response key
-            response = event.keysym
-
-            # Check if 'q' was pressed to terminate the practice
-            if response == 'q':
-                print("Practice terminated by user. Returning to configuration window.")
-                # Save any pending data
-                if hasattr(stim_module, 'save_trial_data'):
-                    stim_module.save_trial_data()
-
-                # Save practice data
-                write_trial_data_to_csv(trial_data, is_practice=True)
-                
-                # Close current window
-                main_root.destroy()
-                
-                # Return to config window
-                subprocess.Popen([sys.executable, 'display_file.py', '--show-config'])
-                return
-
-            # Check if we're in an inter-trial interval (both modules inactive)
-            is_inter_trial = ((not stim_module.blending) and (not mask_module.image_cycle_running))
-
-            # Only process switching if it's a space press during inter-trial interval
-            if response == 'space' and is_inter_trial:
-                # Check if the NEXT trial count is in switch points
-                # This ensures we switch BEFORE starting the next trial
-                if switch_points and (trial_count[0] + 1) in switch_points:
-                    print(f"Switching sides at trial {trial_count[0] + 1} (from {switch_points})")
-                    # Get the target position directly from the practice sequence
-                    sequence_index = trial_count[0] + 1
-
-                    # Get the target position directly from the practice sequence
-                    practice_sequence = config.get('practice_sequence', [])
-                    if practice_sequence and sequence_index < len(practice_sequence):
-                        target_position = practice_sequence[sequence_index]
-                    else:
-                        # Fallback to the 5L5R5L5R pattern if no sequence is available
-                        if sequence_index < 5:
-                            target_position = 'left'
-                        elif sequence_index < 10:
-                            target_position = 'right'
-                        elif sequence_index < 15:
-                            target_position = 'left'
-                        else:
-                            target_position = 'right'
-
-                    print(f"Switching to {target_position} at trial {sequence_index}")
-
-                    # Get the container (parent of the frames)
-                    container = mask_module.frame.master
-
-                    # Get current positions
-                    mask_frame = mask_module.frame
-                    stim_frame = stim_module.frame
-
-                    # Get current sides from the module attributes
-                    mask_side = mask_module.side
-                    stim_side = stim_module.side
-
-                    # Print current positions for debugging
-                    print(f"Current positions - Mask: {mask_side}, Stim: {stim_side}")
-                    print(f"Target position for mask: {target_position}")
-
-                    # Unpack both frames
-                    mask_frame.pack_forget()
-                    stim_frame.pack_forget()
-
-                    # Set positions based on target position
-                    if target_position == 'left':
-                        new_mask_side = tk.LEFT
-                        new_stim_side = tk.RIGHT
-                        print("Setting mask to LEFT, stim to RIGHT")
-                    else:  # right
-                        new_mask_side = tk.RIGHT
-                        new_stim_side = tk.LEFT
-                        print("Setting mask to RIGHT, stim to LEFT")
-
-                    # Repack with new sides
-                    mask_frame.pack(side=new_mask_side, fill="both", expand=True)
-                    stim_frame.pack(side=new_stim_side, fill="both", expand=True)
-
-                    # Update the module's side attribute
-                    mask_module.side = new_mask_side
-                    stim_module.side = new_stim_side
-
-                    # Force update
-                    container.update()
-                    main_root.update()
-                    print("Practice switch completed successfully")
-
-            # Call the regular key press handler
-            return handle_key_press(event, [mask_module, stim_module], trial_count, trials_total,
-                                  None, main_root)
-
-        # Bind the practice handler to space, a, z, and q keys
-        for key in ('<space>', 'a', 'z', 'q'):
-            main_root.bind(key, practice_handler)
-    else:
-        # Regular mode - use the switch_trial from config if enabled
-        switch_trial = None
-        if config.get('switch_suppressor', False):
-            switch_trial = int(config.get('switch_trial', 0))
-            print(f"Switch suppressor enabled, will switch after trial {switch_trial}")
-            # Reset the switch_done flag to ensure it can switch
-            if hasattr(main_root, 'switch_done'):
-                delattr(main_root, 'switch_done')
-                print("Reset switch_done flag")
-
-        for key in ('<space>', 'a', 'z', 'q'):
-            main_root.bind(key, partial(handle_key_press,
-                                      modules=[mask_module, stim_module],
-                                      trial_count=trial_count,
-                                      trials_total=trials_total,
-                                      switch_trial=switch_trial,
-                                      main_root=main_root))
+        log.info("Practice mode enabled with %s trials", trials_total)
+    elif config.get('switch_suppressor', False):
+        log.info("Switch suppressor enabled, will switch after trial %s", config.get('switch_trial', 0))
+
+    for key in TASK_KEYS:
+        main_root.bind(key, partial(handle_key_press,
+                                  modules=[mask_module, stim_module],
+                                  trial_count=trial_count,
+                                  trials_total=trials_total,
+                                  main_root=main_root))
+
+    def teardown():
+        stall_watchdog.stop()
+        for key in TASK_KEYS:
+            main_root.unbind(key)
+        for module in (mask_module, stim_module):
+            module.shutdown()
+        container.destroy()
+
+    return teardown
+
+def main():
+    main_root = tk.Tk()
+    main_root.title("Image Display Modules")
+    main_root.geometry("1280x800")
+    # Make the window maximized to ensure proper display
+    main_root.state('zoomed')
+
+    # Configure the main window to ensure symmetric layout
+    main_root.grid_columnconfigure(0, weight=1)
+    main_root.grid_columnconfigure(1, weight=1)
+    main_root.grid_rowconfigure(0, weight=1)
+
+    # Log from the start; run_task picks up any change to the log settings for each session
+    session_log.configure(load_config())
+
+    # Config, practice, transition and main task all run on this one root
+    controller = SessionController(main_root, run_task)
 
     def on_close():
-        config = load_config()
-        is_practice = config.get('is_practice', False)
-        
         # Save any pending data
-        write_trial_data_to_csv(trial_data, is_practice)
+        finalize_session_data()
         
         # Close window
-        main_root.destroy()
+        controller.quit()
         
         # Exit application completely (no restart)
         sys.exit(0)
 
     main_root.protocol("WM_DELETE_WINDOW", on_close)
+
+    # --start-main-task skips the config window and runs the task saved in config.json
+    if len(sys.argv) > 1 and sys.argv[1] == '--start-main-task':
+        config = load_config()
+        # Set the after_practice flag
+        config['after_practice'] = True
+        log.info("Starting main task directly from practice results")
+        controller.start_task(config)
+    else:
+        # Start at the configuration window (also what --show-config asks for)
+        controller.show_config()
+
     main_root.mainloop()
 
 if __name__ == "__main__":
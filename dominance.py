@@ -0,0 +1,269 @@
+import argparse
+import csv
+import numpy as np
+
+SIDES = ('left', 'right')
+TRIAL_TYPES = ('Practice', 'Main', 'ITI')
+EXCLUDE_FIRST = (None, 'side', 'block')
+STATISTICS = ('mean', 'median', 'trimmed_mean')
+
+
+def _number(value):
+    """Float value of a CSV or in-memory field; 'N/A', blanks and anything unparsable are NaN"""
+    if value.__class__ in (int, float):
+        return value
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return np.nan
+
+
+def _numbers(values):
+    """Float array of a column via _number, converting in one call when every value parses"""
+    try:
+        return np.array(values, dtype=np.float64)
+    except (ValueError, TypeError):
+        return np.array([_number(value) for value in values], dtype=np.float64)
+
+
+class TrialTable:
+    """
+    Trial rows held as columns, one NumPy array per field, in presentation order.
+
+    Participants and sessions are integer codes (participant IDs are listed in
+    `participants`), trial types index TRIAL_TYPES (-1 for anything else), sides index
+    SIDES (-1 if unknown), and a missing reaction time or accuracy is NaN.
+    """
+
+    def __init__(self, participants, participant, session, trial_type, side, reaction_time, accuracy):
+        self.participants = list(participants)
+        self.participant = np.asarray(participant, dtype=np.int32)
+        self.session = np.asarray(session, dtype=np.int32)
+        self.trial_type = np.asarray(trial_type, dtype=np.int8)
+        self.side = np.asarray(side, dtype=np.int8)
+        self.reaction_time = np.asarray(reaction_time, dtype=np.float64)
+        self.accuracy = np.asarray(accuracy, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.participant)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build from (participant ID, session key, trial type, side, RT, accuracy) tuples"""
+        participant_codes, session_codes = {}, {}
+        # Build plain lists and convert once; setting NumPy elements one by one is far slower
+        participant = [participant_codes.setdefault(str(record[0]), len(participant_codes)) for record in records]
+        session = [session_codes.setdefault(record[1], len(session_codes)) for record in records]
+        return cls(participant_codes, participant, session,
+                   *cls._code_columns([record[2] for record in records], [record[3] for record in records],
+                                      [record[4] for record in records], [record[5] for record in records]))
+
+    @classmethod
+    def from_rows(cls, rows, participant_id=None):
+        """
+        One session of trial_data rows (dicts, as recorded or read back with csv.DictReader).
+
+        Rows belong to `participant_id` if it is given, otherwise to their Participant ID.
+        """
+        columns = cls._code_columns([row.get('Trial Type') for row in rows],
+                                    [row.get('Suppressor Position') for row in rows],
+                                    [row.get('Reaction Time') for row in rows],
+                                    [row.get('Accuracy') for row in rows])
+        if participant_id is None:
+            participant_codes = {}
+            participant = [participant_codes.setdefault(str(row.get('Participant ID')), len(participant_codes))
+                           for row in rows]
+        else:
+            # The common single-participant case skips coding IDs row by row
+            participant_codes = [str(participant_id)] if rows else []
+            participant = np.zeros(len(rows), dtype=np.int32)
+        return cls(participant_codes, participant, np.zeros(len(rows), dtype=np.int32), *columns)
+
+    @staticmethod
+    def _code_columns(trial_types, sides, reaction_times, accuracies):
+        type_codes = {name: code for code, name in enumerate(TRIAL_TYPES)}
+        side_codes = {name: code for code, name in enumerate(SIDES)}
+        return ([type_codes.get(value, -1) for value in trial_types],
+                [side_codes.get(value, -1) for value in sides],
+                _numbers(reaction_times), _numbers(accuracies))
+
+    @classmethod
+    def from_csv_files(cls, paths):
+        """Every trial_data CSV in `paths`, each file a separate session"""
+        records = []
+        for path in paths:
+            with open(path, newline='') as data_file:
+                reader = csv.reader(data_file)
+                header = next(reader, None)
+                if header is None:
+                    continue
+                columns = [header.index(name) if name in header else None
+                           for name in ('Participant ID', 'Trial Type', 'Suppressor Position',
+                                        'Reaction Time', 'Accuracy')]
+                for row in reader:
+                    values = [row[column] if column is not None and column < len(row) else None
+                              for column in columns]
+                    records.append((values[0], path, *values[1:]))
+        return cls.from_records(records)
+
+    @classmethod
+    def from_store(cls, store, participant_id=None, trial_type=None):
+        """Trial rows from a SessionStore, each stored session a separate session"""
+        return cls.from_records([(row['participant_id'], row['session_id'], row['trial_type'],
+                                  row['suppressor_position'], row['reaction_time'], row['accuracy'])
+                                 for row in store.trials(participant_id=participant_id, trial_type=trial_type)])
+
+
+class DominanceResult:
+    """
+    Per-participant, per-side statistics from analyze().
+
+    Arrays are indexed [participant, side] with sides in SIDES order. `trials` counts a
+    side's trials before exclusions and filters, `used` those the statistics were computed
+    from; a side without usable trials has NaN statistics. `suppressor[i]` is the
+    main-task suppressor position for participant i, or None if there were too few trials.
+    """
+
+    def __init__(self, participants, trials, used, mean, median, trimmed_mean, statistic, suppressor):
+        self.participants = participants
+        self.trials = trials
+        self.used = used
+        self.mean = mean
+        self.median = median
+        self.trimmed_mean = trimmed_mean
+        self.statistic = statistic
+        self.suppressor = suppressor
+
+    def __len__(self):
+        return len(self.participants)
+
+    def summary(self, index):
+        summary = {'participant_id': self.participants[index], 'suppressor': self.suppressor[index],
+                   'statistic': self.statistic}
+        for side_index, side in enumerate(SIDES):
+            summary[f'{side}_trials'] = int(self.trials[index, side_index])
+            summary[f'{side}_used'] = int(self.used[index, side_index])
+            for name in STATISTICS:
+                value = getattr(self, name)[index, side_index]
+                summary[f'{side}_{name}'] = None if np.isnan(value) else float(value)
+        return summary
+
+    def for_participant(self, participant_id):
+        return self.summary(self.participants.index(str(participant_id)))
+
+    def summaries(self):
+        return [self.summary(index) for index in range(len(self.participants))]
+
+
+def analyze(table, trial_type='Practice', exclude_first='side', accurate_only=True, trim=0.2,
+            min_trials=2, statistic='mean', include_iti=False):
+    """
+    Work out every participant's dominant eye from RTs with the suppressor on each side.
+
+    Only rows of `trial_type` count (None: every trial type, with ITI rows only if
+    `include_iti` is set; ITI rows have no accuracy, so they only ever affect the trial
+    counts and which trial is first on a side). `exclude_first`
+    drops the first trial with the suppressor on each side of each session ('side', as the
+    practice analysis has always done), the first trial of every run of same-side trials
+    ('block': each 5-trial practice block), or nothing (None). With `accurate_only`, only
+    trials with Accuracy 1 are used. `trim` is the proportion cut from each end for the
+    trimmed mean.
+
+    A participant needs `min_trials` trials on each side (before exclusions). Slower
+    responses with the suppressor on one side mean that eye is non-dominant, so the
+    main-task suppressor goes on the other side; `statistic` picks the measure compared,
+    with a side without usable trials counting as 0.
+    """
+    if exclude_first not in EXCLUDE_FIRST:
+        raise ValueError(f"Unknown exclude_first '{exclude_first}'; choose from {EXCLUDE_FIRST}")
+    if statistic not in STATISTICS:
+        raise ValueError(f"Unknown statistic '{statistic}'; choose from {STATISTICS}")
+
+    groups = 2 * len(table.participants)
+    if trial_type is None and include_iti:
+        rows = np.flatnonzero(table.side >= 0)
+    elif trial_type is None:
+        rows = np.flatnonzero((table.side >= 0) & (table.trial_type != TRIAL_TYPES.index('ITI')))
+    else:
+        rows = np.flatnonzero((table.side >= 0) & (table.trial_type == TRIAL_TYPES.index(trial_type)))
+    group = table.participant[rows] * 2 + table.side[rows]
+    trials = np.bincount(group, minlength=groups)
+
+    # First trial per (session, side), or first of each run of same-side trials within a session
+    session_side = table.session[rows].astype(np.int64) * 2 + table.side[rows]
+    keep = np.ones(len(rows), dtype=bool)
+    if exclude_first == 'side':
+        # np.unique's return_index is the first occurrence of each key
+        keep[np.unique(session_side, return_index=True)[1]] = False
+    elif exclude_first == 'block' and len(rows):
+        keep[0] = False
+        keep[1:] = session_side[1:] == session_side[:-1]
+
+    rt = table.reaction_time[rows]
+    keep &= ~np.isnan(rt)
+    if accurate_only:
+        keep &= table.accuracy[rows] == 1
+    group, rt = group[keep], rt[keep]
+
+    # Sort RTs within each group; groups are then contiguous slices of `values`
+    # Two stable argsorts: faster than np.lexsort on the one- and few-participant tables
+    order = np.argsort(rt, kind='stable')
+    order = order[np.argsort(group[order], kind='stable')]
+    values, sorted_group = rt[order], group[order]
+    used = np.bincount(group, minlength=groups)
+    starts = np.concatenate(([0], np.cumsum(used)[:-1]))
+    rank = np.arange(len(values)) - starts[sorted_group]  # Position within the group
+    has_trials = used > 0
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.bincount(group, weights=rt, minlength=groups) / used
+        low = np.where(has_trials, starts + (used - 1) // 2, 0)
+        high = np.where(has_trials, starts + used // 2, 0)
+        median = np.where(has_trials, (values[low] + values[high]) / 2 if len(values) else np.nan, np.nan)
+        cut = np.floor(trim * used).astype(np.int64)
+        trimmed = (rank >= cut[sorted_group]) & (rank < (used - cut)[sorted_group])
+        trimmed_mean = (np.bincount(sorted_group[trimmed], weights=values[trimmed], minlength=groups)
+                        / (used - 2 * cut))
+
+    shape = (len(table.participants), 2)
+    mean, median, trimmed_mean = (array.reshape(shape) for array in (mean, median, trimmed_mean))
+    compared = np.nan_to_num({'mean': mean, 'median': median, 'trimmed_mean': trimmed_mean}[statistic])
+    enough = (trials.reshape(shape) >= min_trials).all(axis=1)
+    # Left slower: left eye non-dominant, suppress the right (dominant) eye, and vice versa
+    choice = np.where(compared[:, 0] > compared[:, 1], 'right', 'left')
+    suppressor = [side if ok else None for side, ok in zip(choice.tolist(), enough.tolist())]
+    return DominanceResult(table.participants, trials.reshape(shape), used.reshape(shape),
+                           mean, median, trimmed_mean, statistic, suppressor)
+
+
+def analyze_files(paths, **options):
+    """analyze() over many trial_data CSV files in one call"""
+    return analyze(TrialTable.from_csv_files(paths), **options)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Eye dominance for every participant in trial_data CSV files.')
+    parser.add_argument('files', nargs='+', help='trial_data CSV files, one session each')
+    parser.add_argument('--trial-type', default='Practice', help="rows to use, or 'all' for every non-ITI row")
+    parser.add_argument('--exclude-first', choices=('none', 'side', 'block'), default='side')
+    parser.add_argument('--include-inaccurate', action='store_true')
+    parser.add_argument('--statistic', choices=STATISTICS, default='mean')
+    parser.add_argument('--trim', type=float, default=0.2)
+    parser.add_argument('--output', default='dominance_summary.csv')
+    args = parser.parse_args()
+
+    result = analyze_files(args.files, trial_type=None if args.trial_type == 'all' else args.trial_type,
+                           exclude_first=None if args.exclude_first == 'none' else args.exclude_first,
+                           accurate_only=not args.include_inaccurate, trim=args.trim, statistic=args.statistic)
+    summaries = result.summaries()
+    if summaries:
+        with open(args.output, 'w', newline='') as output_file:
+            writer = csv.DictWriter(output_file, fieldnames=list(summaries[0]))
+            writer.writeheader()
+            writer.writerows(summaries)
+    decided = sum(1 for side in result.suppressor if side)
+    print(f"{len(result)} participants, {decided} with a dominance decision; summary written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
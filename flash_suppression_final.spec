@@ -52,7 +52,6 @@ a = Analysis(
     excludes=[
         # Exclude unnecessary modules to reduce size
         'matplotlib',
-        'numpy',
         'scipy',
         'pandas',
         'pytest',
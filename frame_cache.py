@@ -0,0 +1,136 @@
+import math
+from collections import OrderedDict
+from PIL import ImageTk
+
+
+def alpha_at(elapsed_ms, duration, alpha_reverse=False):
+    """Alpha shown `elapsed_ms` into a blend; the ramp ends (0.99, or 0 in reverse) exactly at `duration`"""
+    progress = min(max(elapsed_ms / duration, 0.0), 1.0)
+    if alpha_reverse:
+        # Reverse: decrease from 0.99 to 0
+        return 0.99 * (1.0 - progress)
+    # Normal: increase from 0 to 0.99
+    return 0.99 * progress
+
+
+def alpha_ramp(duration, update_interval, alpha_reverse=False):
+    """Return the alpha for each frame deadline (0, interval, 2 * interval, ...) through the end of the blend"""
+    steps = math.ceil(duration / update_interval)
+    return [alpha_at(index * update_interval, duration, alpha_reverse) for index in range(steps + 1)]
+
+
+class AlphaRamp:
+    """The full sequence of blended frames for one stimulus, rendered ahead of the trial"""
+
+    def __init__(self, size, alphas, blend_frame, make_photo=ImageTk.PhotoImage):
+        self.alphas = alphas
+        self.blend_frame = blend_frame  # Callable: alpha -> blended PIL image
+        self.make_photo = make_photo  # Callable: PIL image -> image the canvas can show
+        self.frames = [None] * len(alphas)
+        self.rendered = 0  # Frames before this index are all built
+        self.nbytes = FrameCache.frame_bytes(size) * len(alphas)
+
+    def __len__(self):
+        return len(self.alphas)
+
+    @property
+    def complete(self):
+        return self.rendered >= len(self.alphas)
+
+    def render_frame(self, index):
+        """Blend and convert a single frame of the ramp"""
+        return self.make_photo(self.blend_frame(self.alphas[index]))
+
+    def render_next(self, count):
+        """Render up to `count` further frames; returns True once the ramp is complete"""
+        end = min(self.rendered + count, len(self.alphas))
+        for index in range(self.rendered, end):
+            if self.frames[index] is None:
+                self.frames[index] = self.render_frame(index)
+        self.rendered = end
+        return self.complete
+
+    def frame(self, index):
+        """Return the built frame, rendering it now if pre-rendering has not reached it yet"""
+        frame = self.frames[index]
+        if frame is None:
+            frame = self.render_frame(index)
+            self.frames[index] = frame
+        return frame
+
+
+class FrameCache:
+    """LRU cache of pre-rendered alpha ramps, bounded by an approximate memory budget"""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._ramps = OrderedDict()
+
+    @staticmethod
+    def frame_bytes(size):
+        # Tk photo images hold 4 bytes per pixel
+        return size[0] * size[1] * 4
+
+    @staticmethod
+    def make_key(image_path, resize_dims, rgb_constant, alpha_reverse, duration, update_interval, backend='tk'):
+        # The ramp's alphas follow from the duration and interval; its frame count alone does not identify them
+        return (image_path, tuple(resize_dims) if resize_dims else None,
+                tuple(rgb_constant), bool(alpha_reverse), duration, update_interval, backend)
+
+    def get(self, key):
+        """Return the cached ramp for `key` (marking it recently used), or None"""
+        ramp = self._ramps.get(key)
+        if ramp is not None:
+            self._ramps.move_to_end(key)
+        return ramp
+
+    def prepare(self, key, size, alphas, blend_frame, make_photo=ImageTk.PhotoImage):
+        """
+        Return the ramp for `key`, creating an empty one if needed.
+
+        Frames are rendered separately with AlphaRamp.render_next so the work can be
+        spread over idle time. Returns None if a single ramp would not fit in the budget.
+        """
+        ramp = self.get(key)
+        if ramp is not None:
+            return ramp
+
+        ramp = AlphaRamp(size, alphas, blend_frame, make_photo)
+        if ramp.nbytes > self.max_bytes:
+            return None
+
+        # Evict least recently used ramps until the new one fits
+        while self._ramps and self.current_bytes + ramp.nbytes > self.max_bytes:
+            self._evict_oldest()
+
+        self._ramps[key] = ramp
+        self.current_bytes += ramp.nbytes
+        return ramp
+
+    def _evict_oldest(self):
+        _, ramp = self._ramps.popitem(last=False)
+        self.current_bytes -= ramp.nbytes
+
+    def clear(self):
+        self._ramps.clear()
+        self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._ramps)
+
+
+# Process-wide cache, so ramps rendered for one phase of a session are reused by the next
+_shared_cache = None
+
+
+def shared_frame_cache(max_bytes):
+    """Return the process-wide FrameCache, resized to `max_bytes` if the budget changed"""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = FrameCache(max_bytes)
+    elif _shared_cache.max_bytes != max_bytes:
+        _shared_cache.max_bytes = max_bytes
+        while _shared_cache._ramps and _shared_cache.current_bytes > max_bytes:
+            _shared_cache._evict_oldest()
+    return _shared_cache
@@ -0,0 +1,87 @@
+import math
+import frame_timing
+import timing
+
+
+class FrameClock:
+    """
+    Drive a per-frame callback from absolute deadlines on a monotonic clock.
+
+    Frame n is due at start + n * interval. Each tick is scheduled against the next
+    deadline rather than chained with a fixed after() delay, so delays in the Tk loop
+    do not accumulate. If a tick runs late, the frames whose deadlines have already
+    passed are skipped (counted in dropped_frames) instead of being queued.
+
+    The callback receives (frame_index, elapsed_ms). If `source` is given, every frame's
+    deadline, actual callback time and callback duration go to the frame timing recorder.
+    """
+
+    def __init__(self, widget, interval_ms, callback, source=None):
+        self.widget = widget
+        self.source = source
+        self.interval_ns = int(interval_ms * 1_000_000)
+        self.callback = callback
+        self.running = False
+        self.after_id = None
+        self.start_ns = None
+        self.next_index = 0
+        self.dropped_frames = 0
+
+    @staticmethod
+    def now_ns():
+        return timing.now_ns()
+
+    def start(self):
+        """Start the clock and run frame 0 immediately"""
+        self.stop()
+        self.running = True
+        self.start_ns = self.now_ns()
+        self.next_index = 0
+        self.dropped_frames = 0
+        self._tick()
+
+    def stop(self):
+        self.running = False
+        if self.after_id:
+            try:
+                self.widget.after_cancel(self.after_id)
+            except:
+                pass
+            self.after_id = None
+
+    def elapsed_ms(self):
+        if self.start_ns is None:
+            return 0.0
+        return (self.now_ns() - self.start_ns) / 1_000_000
+
+    def deadline_ns(self, frame_index):
+        return self.start_ns + frame_index * self.interval_ns
+
+    def _tick(self):
+        self.after_id = None
+        if not self.running:
+            return
+
+        now = self.now_ns()
+        elapsed_ns = now - self.start_ns
+        frame_index = elapsed_ns // self.interval_ns
+
+        if frame_index < self.next_index:
+            # Woke up before the deadline (timer rounding); wait for the rest
+            self._schedule(self.next_index, now)
+            return
+
+        # Skip frames whose deadlines have already passed
+        self.dropped_frames += frame_index - self.next_index
+        self.next_index = frame_index + 1
+
+        self.callback(frame_index, elapsed_ns / 1_000_000)
+        if self.source:
+            frame_timing.record(self.source, frame_index, self.deadline_ns(frame_index), now, self.now_ns() - now)
+
+        if self.running:
+            self._schedule(self.next_index, self.now_ns())
+
+    def _schedule(self, frame_index, now):
+        delay_ms = max(0, math.ceil((self.deadline_ns(frame_index) - now) / 1_000_000))
+        self.after_id = self.widget.after(delay_ms, self._tick)
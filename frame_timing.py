@@ -0,0 +1,139 @@
+import csv
+import math
+from array import array
+
+SOURCES = ('mask', 'stim')
+
+SUMMARY_FIELDNAMES = [
+    'Participant ID',
+    'Trial Number',
+    'Source',  # 'mask' flips or 'stim' alpha steps
+    'Frames',
+    'Dropped Frames',
+    'Mean Jitter (ms)',
+    'P95 Jitter (ms)',
+    'Max Jitter (ms)',
+    'Mean Interval (ms)',
+    'Mean Render (ms)',
+    'Max Render (ms)',
+]
+
+
+class FrameTimingRecorder:
+    """
+    Per-frame timing samples stored in a preallocated ring buffer.
+
+    Each sample holds the intended deadline, the time the frame callback actually
+    ran and how long it took. Recording only writes into fixed-size arrays, so it does
+    not allocate on the frame path. Samples are summarised per trial when the trial
+    ends (during the ITI), so the buffer only has to hold one trial's frames.
+    """
+
+    def __init__(self, capacity=65536):
+        self.capacity = capacity
+        self.source = array('b', bytes(capacity))
+        self.frame_index = array('q', bytes(8 * capacity))
+        self.deadline_ns = array('q', bytes(8 * capacity))
+        self.actual_ns = array('q', bytes(8 * capacity))
+        self.render_ns = array('q', bytes(8 * capacity))
+        self.count = 0  # Total samples written since the recorder was created
+        self.trial = None
+        self.trial_start = 0
+        self.summaries = []
+
+    def record(self, source, frame_index, deadline_ns, actual_ns, render_ns):
+        if self.trial is None:
+            return
+        slot = self.count % self.capacity
+        self.source[slot] = SOURCES.index(source)
+        self.frame_index[slot] = frame_index
+        self.deadline_ns[slot] = deadline_ns
+        self.actual_ns[slot] = actual_ns
+        self.render_ns[slot] = render_ns
+        self.count += 1
+
+    def begin_trial(self, trial_number):
+        if self.trial is not None:
+            self.end_trial()
+        self.trial = trial_number
+        self.trial_start = self.count
+
+    def end_trial(self):
+        """Summarise the samples recorded since begin_trial"""
+        if self.trial is None:
+            return
+        # Only the most recent `capacity` samples are still in the buffer
+        start = max(self.trial_start, self.count - self.capacity)
+        for source_id, source in enumerate(SOURCES):
+            slots = [i % self.capacity for i in range(start, self.count)
+                     if self.source[i % self.capacity] == source_id]
+            if slots:
+                self.summaries.append(self._summarise(self.trial, source, slots))
+        self.trial = None
+
+    def _summarise(self, trial_number, source, slots):
+        jitter_ms = sorted((self.actual_ns[s] - self.deadline_ns[s]) / 1_000_000 for s in slots)
+        render_ms = [self.render_ns[s] / 1_000_000 for s in slots]
+        first_frame = self.frame_index[slots[0]]
+        last_frame = self.frame_index[slots[-1]]
+        intervals = [(self.actual_ns[b] - self.actual_ns[a]) / 1_000_000 for a, b in zip(slots, slots[1:])]
+
+        p95_index = max(0, math.ceil(0.95 * len(jitter_ms)) - 1)
+        return {
+            'Trial Number': trial_number,
+            'Source': source,
+            'Frames': len(slots),
+            'Dropped Frames': (last_frame - first_frame + 1) - len(slots),
+            'Mean Jitter (ms)': round(sum(jitter_ms) / len(jitter_ms), 3),
+            'P95 Jitter (ms)': round(jitter_ms[p95_index], 3),
+            'Max Jitter (ms)': round(jitter_ms[-1], 3),
+            'Mean Interval (ms)': round(sum(intervals) / len(intervals), 3) if intervals else 'N/A',
+            'Mean Render (ms)': round(sum(render_ms) / len(render_ms), 3),
+            'Max Render (ms)': round(max(render_ms), 3),
+        }
+
+    def export_summary(self, filename, participant_id):
+        """Write the per-trial jitter summary for the session so far"""
+        self.end_trial()
+        with open(filename, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDNAMES)
+            writer.writeheader()
+            for summary in self.summaries:
+                row = summary.copy()
+                row['Participant ID'] = participant_id
+                writer.writerow(row)
+
+
+# Session recorder; None unless record_frame_timing is enabled in config
+recorder = None
+
+
+def configure(config):
+    """Enable or disable frame timing recording for the session from config"""
+    global recorder
+    if config.get('record_frame_timing', False):
+        # A fresh recorder per session, so summaries do not carry over between sessions
+        recorder = FrameTimingRecorder(int(config.get('frame_timing_capacity', 65536)))
+    else:
+        recorder = None
+    return recorder
+
+
+def record(source, frame_index, deadline_ns, actual_ns, render_ns):
+    if recorder is not None:
+        recorder.record(source, frame_index, deadline_ns, actual_ns, render_ns)
+
+
+def begin_trial(trial_number):
+    if recorder is not None:
+        recorder.begin_trial(trial_number)
+
+
+def end_trial():
+    if recorder is not None:
+        recorder.end_trial()
+
+
+def export_summary(filename, participant_id):
+    if recorder is not None:
+        recorder.export_summary(filename, participant_id)
@@ -1,8 +1,14 @@
 import tkinter as tk
-from PIL import Image, ImageTk
+from PIL import Image
 import os
 import time
-from base_module import BaseModule
+from base_module import BaseModule, _image_sets
+from frame_clock import FrameClock
+from mask_ring import MaskRing
+from mondrian import generate_sequence, params_from_config
+from session_log import get_logger
+
+log = get_logger('mask')
 
 class ImageCycler(BaseModule):
     def __init__(self, root, image_dir, cycle_time):
@@ -10,17 +16,15 @@ class ImageCycler(BaseModule):
         self.cycle_time = cycle_time
         self.current_image_index = 0
         self.image_cycle_running = False
-        # Bind all key press events
-        for key in ('<space>', 'a', 'z'):
-            self.root.bind(key, self.handle_space_press)
-
-    def update_canvas(self):
-        if not self.image_cycle_running:
-            return
-        # Clear the canvas except for the checkerboard border and content area
-        self.canvas.delete("image", "iti_message")
+        # Mask flips are scheduled against absolute deadlines so Tk delays do not stretch the cadence
+        self.mask_clock = FrameClock(self.root, self.cycle_time, self.update_canvas, source='mask')
+        self.cycle_start_index = 0
+        # With a TrialSchedule each trial's cycle opens at its planned frame; without one the
+        # sequence continues where the previous trial left off
+        self.schedule = None
+        self.next_trial = 0
 
-        # Determine the center position based on whether we have a border
+        # One persistent, initially hidden image item; each flip only swaps its PhotoImage
         if hasattr(self, 'content_area'):
             border_width = 60
             center_x = border_width + (self.canvas_width / 2)
@@ -28,61 +32,112 @@ class ImageCycler(BaseModule):
         else:
             center_x = 320
             center_y = 400
+        mask_item = self.layers.create('mask', 'image', (center_x, center_y), hidden=True, anchor='center')
+        self.mask_ring = MaskRing(self.canvas, mask_item, self.images)
+        # Bind all key press events
+        for key in ('<space>', 'a', 'z'):
+            self.root.bind(key, self.handle_space_press)
+
+    def load_images(self):
+        """Masks from mask_dir, or a seeded procedural Mondrian sequence if mask_source is 'mondrian'"""
+        if self.config.get('mask_source', 'directory') != 'mondrian':
+            if self.lazy_image_loading:
+                # A flip must not wait on decode, so the mask ring is built before the first trial
+                log.info("lazy_image_loading applies to stimuli only; masks are decoded up front")
+                self.lazy_image_loading = False
+            return super().load_images()
+
+        frame_count = int(self.config.get('mondrian_frames', 60))
+        params = params_from_config(self.config, *self.resize_dims)
+        self.image_files = [f"mondrian:{params['seed']}:{index}" for index in range(frame_count)]
+        self.asset_loader = None
+        key = ('mondrian', self.backend.name, tuple(sorted(params.items())), frame_count)
+        cached = _image_sets.get(key)
+        if cached is not None and cached[3] is self.root.tk:
+            self.pil_images = cached[1]
+            return list(cached[2])
+
+        log.info("Generating %s Mondrian masks (seed %s)", frame_count, params['seed'])
+        self.pil_images = generate_sequence(frame_count, **params)
+        photos = [self.backend.make_photo(image) for image in self.pil_images]
+        _image_sets[key] = (self.image_files, self.pil_images, photos, self.root.tk, None)
+        return list(photos)
+
+    def use_schedule(self, schedule):
+        """Open each trial's mask cycle where `schedule` says, starting at its first trial"""
+        self.schedule = schedule
+        self.next_trial = 0
+        self._plan_next_cycle()
 
-        new_image = self.canvas.create_image(center_x, center_y, image=self.images[self.current_image_index], anchor='center', tags="image")
-        self.canvas.itemconfig(new_image, tags="image")
-        self.place_fixation_point()  # Ensure the fixation point is visible
-        self.current_image_index = (self.current_image_index + 1) % len(self.images)
-        self.root.after(self.cycle_time, self.update_canvas)
+    def _scheduled(self):
+        """Whether the next trial has a row in the plan"""
+        return self.schedule is not None and self.next_trial < len(self.schedule)
+
+    def _plan_next_cycle(self):
+        if self._scheduled():
+            self.cycle_start_index = int(self.schedule.trials['mask_start'][self.next_trial]) % len(self.images)
+
+    def update_canvas(self, frame_index=0, elapsed_ms=0.0):
+        """Show the mask due at the latest deadline reached (called by the mask FrameClock)"""
+        if not self.image_cycle_running:
+            self.mask_clock.stop()
+            return
+        # Late frames are skipped, so the sequence stays locked to elapsed time
+        self.current_image_index = (self.cycle_start_index + frame_index) % len(self.images)
+        self.mask_ring.flip(self.current_image_index)
 
     def handle_space_press(self, event):
+        if self.image_cycle_running:
+            return self.end_trial(event)
+        return self.start_trial()
+
+    def start_trial(self):
+        # Clear any existing or pending ITI message before starting new trial
+        self.cancel_iti_message()
+        self.hide_iti_message()
+        self.place_fixation_point()
+
+        self.image_cycle_running = True
+        self.start_blend()
+        return None, None, None
+
+    def end_trial(self, event):
         if self.image_cycle_running:
             self.image_cycle_running = False
+            self.mask_clock.stop()
+            # Continue the mask sequence where this trial left off, unless the plan says otherwise
+            self.cycle_start_index = (self.current_image_index + 1) % len(self.images)
+            self._plan_next_cycle()
+
+            # Hide the mask and any ITI message; content area and fixation persist
+            self.clear_trial_layers()
 
-            # AGGRESSIVE: Clear image, ITI messages, and any stray text
-            self.canvas.delete("image")
-            self.canvas.delete("iti_message")
-            self.canvas.delete("text")
-            
-            # Also clear by searching for all text items
-            all_items = self.canvas.find_all()
-            for item in all_items:
-                if self.canvas.type(item) == 'text':
-                    self.canvas.delete(item)
-
-            # If we have a border, redraw the content area
-            if hasattr(self, 'content_area'):
-                border_width = 60
-                self.content_area = self.canvas.create_rectangle(
-                    border_width, border_width,
-                    border_width + self.canvas_width, border_width + self.canvas_height,
-                    fill=self.canvas_bg_color, outline='', tags='content_area'
-                )
-
-            self.place_fixation_point()
             # Show ITI message after configured delay
             self.schedule_iti_message()
-            return None, None, None
-        else:
-            # AGGRESSIVE: Clear any existing ITI message and text before starting new trial
-            self.canvas.delete("iti_message")
-            self.canvas.delete("text")
-            
-            # Also clear by searching for all text items
-            all_items = self.canvas.find_all()
-            for item in all_items:
-                if self.canvas.type(item) == 'text':
-                    self.canvas.delete(item)
-            
-            # Redraw fixation before starting
-            if hasattr(self, 'place_fixation_point'):
-                self.place_fixation_point()
-            self.image_cycle_running = True
-            self.start_blend()
-            return None, None, None
+        return None, None, None
 
     def start_blend(self):
-        self.update_canvas()
+        # Past the end of the plan the sequence just continues
+        if self._scheduled():
+            self.cycle_start_index = int(self.schedule.trials['mask_start'][self.next_trial]) % len(self.images)
+            self.next_trial += 1
+        self.hide_iti_message()
+        self.layers.show('mask')
+        # Frame 0 is flipped before Tk redraws, so the previous trial's last mask never shows
+        self.mask_clock.start()
+
+    def benchmark_flips(self, count=1000, redraw=True):
+        """Measure mask flips per second on this module's canvas (run while no trial is active)"""
+        self.layers.show('mask')
+        try:
+            return self.mask_ring.benchmark(count, redraw)
+        finally:
+            self.layers.hide('mask')
+
+    def shutdown(self):
+        self.image_cycle_running = False
+        self.mask_clock.stop()
+        super().shutdown()
 
     def run(self):
         self.root.mainloop()
@@ -0,0 +1,102 @@
+import numpy as np
+from PIL import Image, ImageColor
+
+DEFAULT_PALETTE = ('#ff0000', '#00ff00', '#0000ff', '#ffff00', '#ff00ff', '#00ffff', '#ffffff', '#000000')
+SIZE_DISTRIBUTIONS = ('uniform', 'powerlaw')
+
+
+class MondrianGenerator:
+    """
+    Procedural Mondrian masks: overlapping axis-aligned rectangles in palette colours.
+
+    Frame `index` of a sequence depends only on the parameters, the seed and the index,
+    so a session can be reproduced exactly from its config. Rectangle sides are drawn
+    from `size_distribution`: 'uniform' between min_size and max_size, or 'powerlaw'
+    (many small and few large rectangles, as in dead-leaves masks).
+    """
+
+    def __init__(self, width=640, height=800, rect_count=250, min_size=20, max_size=200,
+                 size_distribution='uniform', palette=DEFAULT_PALETTE, seed=0):
+        if size_distribution not in SIZE_DISTRIBUTIONS:
+            raise ValueError(f"Unknown size distribution '{size_distribution}'; choose from {SIZE_DISTRIBUTIONS}")
+        self.width = width
+        self.height = height
+        self.rect_count = rect_count
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.size_distribution = size_distribution
+        self.palette = tuple(palette) or DEFAULT_PALETTE
+        self.colors = np.array([ImageColor.getrgb(color)[:3] + (255,) for color in self.palette], dtype=np.uint8)
+        self.packed_colors = self.colors.view(np.uint32).ravel()
+        self.seed = int(seed)
+
+    @property
+    def key(self):
+        return (self.width, self.height, self.rect_count, self.min_size, self.max_size,
+                self.size_distribution, self.palette, self.seed)
+
+    def _sizes(self, rng, count):
+        if self.size_distribution == 'powerlaw':
+            # Pareto tail with exponent 2, clipped to the size range
+            sizes = self.min_size * (1.0 - rng.random(count)) ** -0.5
+            return np.minimum(sizes, self.max_size).astype(np.int64)
+        return rng.integers(self.min_size, self.max_size + 1, count)
+
+    def frame_array(self, index):
+        """Return frame `index` as a (height, width, 4) uint8 RGBA array"""
+        rng = np.random.default_rng([self.seed, index])
+        count = self.rect_count
+        widths = self._sizes(rng, count)
+        heights = self._sizes(rng, count)
+        # Let rectangles start partly outside the frame so the edges are covered too
+        x0 = rng.integers(-self.max_size // 2, self.width, count)
+        y0 = rng.integers(-self.max_size // 2, self.height, count)
+        color_index = rng.integers(0, len(self.colors), count)
+
+        x1 = np.clip(x0 + widths, 0, self.width)
+        y1 = np.clip(y0 + heights, 0, self.height)
+        x0 = np.clip(x0, 0, self.width)
+        y0 = np.clip(y0, 0, self.height)
+
+        # Fill whole RGBA pixels at once through a 32-bit view of the frame
+        frame = np.empty((self.height, self.width), dtype=np.uint32)
+        frame[:] = self.packed_colors[rng.integers(0, len(self.colors))]  # Background
+        for left, top, right, bottom, color in zip(x0.tolist(), y0.tolist(), x1.tolist(), y1.tolist(),
+                                                   color_index.tolist()):
+            frame[top:bottom, left:right] = self.packed_colors[color]
+        return frame.view(np.uint8).reshape(self.height, self.width, 4)
+
+    def frame(self, index):
+        return Image.fromarray(self.frame_array(index), 'RGBA')
+
+    def sequence(self, frame_count):
+        return [self.frame(index) for index in range(frame_count)]
+
+
+# Generated sequences keyed by generator parameters (including the seed) and length
+_sequences = {}
+
+
+def generate_sequence(frame_count, **params):
+    """Return `frame_count` Mondrian frames for `params`, reusing a sequence generated earlier"""
+    generator = MondrianGenerator(**params)
+    key = (generator.key, frame_count)
+    frames = _sequences.get(key)
+    if frames is None:
+        frames = generator.sequence(frame_count)
+        _sequences[key] = frames
+    return frames
+
+
+def params_from_config(config, width=640, height=800):
+    """MondrianGenerator arguments from the mondrian_* config keys"""
+    return {
+        'width': width,
+        'height': height,
+        'rect_count': int(config.get('mondrian_rect_count', 250)),
+        'min_size': int(config.get('mondrian_min_size', 20)),
+        'max_size': int(config.get('mondrian_max_size', 200)),
+        'size_distribution': config.get('mondrian_size_distribution', 'uniform'),
+        'palette': tuple(config.get('mondrian_palette') or DEFAULT_PALETTE),
+        'seed': int(config.get('mondrian_seed', 0)),
+    }
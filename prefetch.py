@@ -0,0 +1,86 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from asset_loader import decode_image
+from session_log import get_logger
+
+log = get_logger('prefetch')
+
+
+class Prefetcher:
+    """
+    Decode upcoming images on a worker thread.
+
+    The worker only opens, converts and resizes files. Decoded images are handed back
+    to the Tk thread, which polls for them with after() and stores them in the
+    AssetLoader; PhotoImages (which must be created on the Tk thread) are built there
+    too when requested. `on_ready(index)` is called on the Tk thread once an image is
+    in the cache.
+    """
+
+    def __init__(self, widget, poll_ms=10):
+        self.widget = widget
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='prefetch')
+        self.results = queue.SimpleQueue()
+        self.pending = set()  # (id(loader), index) submitted but not yet stored
+        self.poll_after_id = None
+        self.closed = False
+
+    def request(self, loader, indices, make_photo=False, on_ready=None):
+        """Queue images that are not cached yet; cached ones get on_ready straight away"""
+        if self.closed:
+            return
+        for index in indices:
+            if loader.is_cached(index):
+                if make_photo:
+                    loader.ensure_photo(index)
+                if on_ready:
+                    on_ready(index)
+                continue
+            key = (id(loader), index)
+            if key in self.pending:
+                continue
+            self.pending.add(key)
+            self.executor.submit(self._decode, loader, index, make_photo, on_ready)
+        if self.pending and self.poll_after_id is None:
+            self.poll_after_id = self.widget.after(self.poll_ms, self._drain)
+
+    def _decode(self, loader, index, make_photo, on_ready):
+        # Worker thread: no Tk calls here
+        try:
+            image = decode_image(loader.image_files[index], loader.resize_dims, zero_copy=True)
+        except Exception as e:
+            log.warning("Could not prefetch %s: %s", loader.image_files[index], e)
+            image = None
+        self.results.put((loader, index, image, make_photo, on_ready))
+
+    def _drain(self):
+        self.poll_after_id = None
+        if self.closed:
+            return
+        while True:
+            try:
+                loader, index, image, make_photo, on_ready = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending.discard((id(loader), index))
+            if image is None:
+                continue
+            loader.store(index, image)
+            if make_photo:
+                loader.ensure_photo(index)
+            if on_ready:
+                on_ready(index)
+        if self.pending:
+            self.poll_after_id = self.widget.after(self.poll_ms, self._drain)
+
+    def shutdown(self):
+        self.closed = True
+        if self.poll_after_id:
+            try:
+                self.widget.after_cancel(self.poll_after_id)
+            except:
+                pass
+            self.poll_after_id = None
+        self.pending.clear()
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,396 @@
+import heapq
+import tkinter as tk
+from collections import deque
+from PIL import Image, ImageDraw, ImageFont, ImageTk
+import timing
+
+
+class TkBackend:
+    """Render into real Tk frames and canvases"""
+    name = 'tk'
+    headless = False
+
+    def create_frame(self, parent, **options):
+        return tk.Frame(parent, **options)
+
+    def create_canvas(self, parent, width, height, **options):
+        return tk.Canvas(parent, width=width, height=height, **options)
+
+    def make_photo(self, image):
+        return ImageTk.PhotoImage(image)
+
+
+class OffscreenBackend:
+    """
+    Render into OffscreenCanvas scenes that are composited with PIL on demand.
+
+    "Photos" are plain RGBA PIL images (copied, as Tk copies pixels into a PhotoImage),
+    so nothing here needs a display.
+    """
+    name = 'offscreen'
+    headless = True
+
+    def create_frame(self, parent, **options):
+        return OffscreenFrame(parent, **options)
+
+    def create_canvas(self, parent, width, height, **options):
+        return OffscreenCanvas(width, height, bg=options.get('bg', 'black'))
+
+    def make_photo(self, image):
+        return image.convert("RGBA") if image.mode != "RGBA" else image.copy()
+
+
+TK_BACKEND = TkBackend()
+OFFSCREEN_BACKEND = OffscreenBackend()
+
+
+def get_backend(root):
+    """The backend a module drawing into `root` should use"""
+    return getattr(root, 'render_backend', TK_BACKEND)
+
+
+class OffscreenFrame:
+    """
+    Stand-in for a tk.Frame in a headless widget tree.
+
+    Packing is only recorded (module.side is what the task logic reads), and scheduling
+    goes to the HeadlessRoot at the top of the tree. As on Tk, key bindings made on a
+    frame never fire: a frame does not take the keyboard focus, only the root's do.
+    """
+
+    def __init__(self, master, **options):
+        self.master = master
+        self.options = options
+        self.pack_options = None
+        self.bindings = {}
+        self.destroyed = False
+
+    @property
+    def tk(self):
+        return self.master.tk
+
+    @property
+    def render_backend(self):
+        # Modules built inside this frame draw offscreen too
+        return get_backend(self.master)
+
+    def pack(self, **options):
+        self.pack_options = options
+
+    def pack_forget(self):
+        self.pack_options = None
+
+    def grid_columnconfigure(self, *args, **kwargs):
+        pass
+
+    grid_rowconfigure = grid_columnconfigure
+
+    def configure(self, **options):
+        self.options.update(options)
+
+    def after(self, ms, func=None, *args):
+        return self.master.after(ms, func, *args)
+
+    def after_idle(self, func, *args):
+        return self.master.after_idle(func, *args)
+
+    def after_cancel(self, after_id):
+        self.master.after_cancel(after_id)
+
+    def update_idletasks(self):
+        self.master.update_idletasks()
+
+    update = update_idletasks
+
+    def bind(self, sequence, func=None, add=None):
+        self.bindings[sequence] = func
+
+    def unbind(self, sequence, funcid=None):
+        self.bindings.pop(sequence, None)
+
+    def destroy(self):
+        self.destroyed = True
+
+
+_fonts = {}
+
+
+def _font(font):
+    size = font[1] if isinstance(font, (tuple, list)) and len(font) > 1 else 12
+    cached = _fonts.get(size)
+    if cached is None:
+        try:
+            cached = ImageFont.load_default(size=size)
+        except TypeError:  # Pillow < 10.1 has a single fixed-size default font
+            cached = ImageFont.load_default()
+        _fonts[size] = cached
+    return cached
+
+
+class OffscreenCanvas:
+    """
+    The subset of tk.Canvas used by the display modules, kept as a retained scene.
+
+    Items (image, rectangle, text) keep their options and stacking order exactly as a
+    Tk canvas would; render() composites the visible items into a PIL image, so a
+    frame costs nothing until somebody looks at it. Images and fills match Tk pixel for
+    pixel; text uses Pillow's default font, and outlines wider than 1 px are drawn
+    inside the rectangle rather than centred on its edge.
+    """
+
+    def __init__(self, width, height, bg='black'):
+        self.width = int(width)
+        self.height = int(height)
+        self.bg = bg
+        self.items = {}  # item id -> {'kind', 'coords', 'tags', 'options'}
+        self.stack = []  # item ids, bottom to top
+        self.next_id = 1
+        self.image = None  # Modules keep a reference to the shown image here, as on tk.Canvas
+
+    # Geometry management is meaningless offscreen
+    def pack(self, *args, **kwargs):
+        pass
+
+    def _create(self, kind, coords, options):
+        item = self.next_id
+        self.next_id += 1
+        tags = options.pop('tags', ())
+        options.setdefault('state', 'normal')
+        self.items[item] = {'kind': kind, 'coords': list(coords),
+                            'tags': set(tags.split() if isinstance(tags, str) else tags),
+                            'options': options}
+        self.stack.append(item)
+        return item
+
+    def create_image(self, *coords, **options):
+        return self._create('image', coords, options)
+
+    def create_rectangle(self, *coords, **options):
+        return self._create('rectangle', coords, options)
+
+    def create_text(self, *coords, **options):
+        return self._create('text', coords, options)
+
+    def _find(self, tag_or_id):
+        if tag_or_id == 'all':
+            return list(self.stack)
+        if tag_or_id in self.items:
+            return [tag_or_id]
+        return [item for item in self.stack if tag_or_id in self.items[item]['tags']]
+
+    def itemconfigure(self, tag_or_id, **options):
+        for item in self._find(tag_or_id):
+            if 'tags' in options:
+                tags = options.pop('tags')
+                self.items[item]['tags'] = set(tags.split() if isinstance(tags, str) else tags)
+            self.items[item]['options'].update(options)
+
+    itemconfig = itemconfigure
+
+    def set_image(self, item, image):
+        self.items[item]['options']['image'] = image
+
+    def coords(self, tag_or_id, *coords):
+        items = self._find(tag_or_id)
+        if coords:
+            for item in items:
+                self.items[item]['coords'] = list(coords)
+        return self.items[items[0]]['coords'] if items else []
+
+    def tag_raise(self, tag_or_id):
+        for item in self._find(tag_or_id):
+            self.stack.remove(item)
+            self.stack.append(item)
+
+    def delete(self, tag_or_id):
+        for item in self._find(tag_or_id):
+            self.stack.remove(item)
+            del self.items[item]
+
+    def render(self):
+        """Composite the visible items, bottom to top, into an RGB image of the canvas"""
+        frame = Image.new("RGBA", (self.width, self.height), self.bg)
+        draw = ImageDraw.Draw(frame)
+        for item in self.stack:
+            entry = self.items[item]
+            options = entry['options']
+            if options.get('state') == 'hidden':
+                continue
+            kind = entry['kind']
+            if kind == 'image':
+                image = options.get('image')
+                if image is None:
+                    continue
+                x, y = self._anchor(entry['coords'], image.size, options.get('anchor', 'center'))
+                # Clip to the canvas; alpha_composite needs a non-negative destination
+                left, top = max(0, -x), max(0, -y)
+                right = min(image.width, self.width - x)
+                bottom = min(image.height, self.height - y)
+                if left >= right or top >= bottom:
+                    continue
+                if (left, top, right, bottom) != (0, 0, image.width, image.height):
+                    image = image.crop((left, top, right, bottom))
+                frame.alpha_composite(image, (x + left, y + top))
+            elif kind == 'rectangle':
+                fill = options.get('fill') or None
+                outline = options.get('outline', 'black')  # Tk outlines rectangles 1 px black by default
+                x0, y0, x1, y1 = (int(round(value)) for value in entry['coords'])
+                if outline:
+                    # The outline covers both edges, so an outlined rectangle is one pixel larger
+                    draw.rectangle((x0, y0, x1, y1), fill=fill, outline=outline,
+                                   width=max(1, int(options.get('width', 1))))
+                elif fill:
+                    draw.rectangle((x0, y0, x1 - 1, y1 - 1), fill=fill)
+            elif kind == 'text':
+                x, y = entry['coords'][:2]
+                draw.text((x, y), options.get('text', ''), fill=options.get('fill', 'black'),
+                          font=_font(options.get('font')), anchor='mm')
+        return frame.convert("RGB")
+
+    @staticmethod
+    def _anchor(coords, size, anchor):
+        """Top-left corner of an image placed at coords with a Tk anchor"""
+        x, y = coords[:2]
+        width, height = size
+        anchor = str(anchor)
+        if anchor == 'center':
+            return int(round(x - width / 2)), int(round(y - height / 2))
+        if 'w' in anchor:
+            left = x
+        elif 'e' in anchor:
+            left = x - width
+        else:
+            left = x - width / 2
+        if anchor.startswith('n'):
+            top = y
+        elif anchor.startswith('s'):
+            top = y - height
+        else:
+            top = y - height / 2
+        return int(round(left)), int(round(top))
+
+
+class HeadlessEvent:
+    """Key event delivered by HeadlessRoot, already stamped on the virtual clock"""
+
+    def __init__(self, keysym, timestamp_ns):
+        self.keysym = keysym
+        self.timestamp_ns = timestamp_ns
+        self.time = timestamp_ns // 1_000_000
+
+
+class HeadlessRoot:
+    """
+    Stand-in for the Tk root that runs the display modules without a display.
+
+    Modules built on a HeadlessRoot draw with the offscreen backend. after() callbacks
+    run on a virtual clock that only moves when run_for()/run_until() advance it, and
+    while the root is open timing.now_ns() reads that clock. A simulated session
+    therefore runs at CPU speed with exact, reproducible timestamps.
+    """
+    render_backend = OFFSCREEN_BACKEND
+    tk = None  # Image caches are keyed by Tk interpreter; offscreen images need none
+
+    def __init__(self, start_ns=0):
+        self.time_ns = start_ns
+        self._timers = []  # heap of (due_ns, sequence, after_id, func, args)
+        self._idle = deque()
+        self._cancelled = set()
+        self._sequence = 0
+        self.bindings = {}
+        self.open = True
+        self.quitting = False
+        timing.set_clock(self.now_ns)
+
+    def now_ns(self):
+        return self.time_ns
+
+    # Scheduling
+    def _next_id(self):
+        self._sequence += 1
+        return f'after#{self._sequence}'
+
+    def after(self, ms, func=None, *args):
+        after_id = self._next_id()
+        due_ns = self.time_ns + int(ms * 1_000_000)
+        heapq.heappush(self._timers, (due_ns, self._sequence, after_id, func, args))
+        return after_id
+
+    def after_idle(self, func, *args):
+        after_id = self._next_id()
+        self._idle.append((after_id, func, args))
+        return after_id
+
+    def after_cancel(self, after_id):
+        self._cancelled.add(after_id)
+
+    def update_idletasks(self):
+        # Callbacks queued while draining run in this pass too, as in Tk
+        while self._idle:
+            after_id, func, args = self._idle.popleft()
+            if after_id in self._cancelled:
+                self._cancelled.discard(after_id)
+                continue
+            func(*args)
+
+    update = update_idletasks
+
+    def run_until(self, deadline_ns):
+        """Run every timer due up to `deadline_ns`, advancing the virtual clock as they fire"""
+        self.update_idletasks()
+        while self._timers and self._timers[0][0] <= deadline_ns:
+            due_ns, _, after_id, func, args = heapq.heappop(self._timers)
+            if after_id in self._cancelled:
+                self._cancelled.discard(after_id)
+                continue
+            self.time_ns = max(self.time_ns, due_ns)
+            func(*args)
+            self.update_idletasks()
+        self.time_ns = max(self.time_ns, deadline_ns)
+
+    def run_for(self, ms):
+        self.run_until(self.time_ns + int(ms * 1_000_000))
+
+    # Input
+    def bind(self, sequence, func=None, add=None):
+        self.bindings[sequence] = func
+
+    def unbind(self, sequence, funcid=None):
+        self.bindings.pop(sequence, None)
+
+    def key_press(self, keysym):
+        """Deliver a key press now (virtual time) to the handler bound for it"""
+        handler = self.bindings.get('<space>' if keysym == 'space' else keysym)
+        if handler is None:
+            return None
+        result = handler(HeadlessEvent(keysym, self.time_ns))
+        self.update_idletasks()
+        return result
+
+    # Window management calls the modules and the session controller make; nothing to do offscreen
+    def configure(self, *args, **kwargs):
+        pass
+
+    def pack(self, *args, **kwargs):
+        pass
+
+    def withdraw(self):
+        pass
+
+    def deiconify(self):
+        pass
+
+    def mainloop(self):
+        """Run timers in order until none are left or quit() is called"""
+        self.quitting = False
+        while self.open and not self.quitting and (self._timers or self._idle):
+            self.run_until(self._timers[0][0] if self._timers else self.time_ns)
+
+    def quit(self):
+        self.quitting = True
+
+    def destroy(self):
+        self.open = False
+        self._timers.clear()
+        self._idle.clear()
+        timing.set_clock(None)
@@ -0,0 +1,92 @@
+import tkinter as tk
+from base_module import clear_image_sets, load_config
+from config_file import ConfigWindow
+from render_backend import get_backend
+from session_log import get_logger
+
+log = get_logger('session')
+
+
+class SessionController:
+    """
+    Runs a whole session (Config -> Practice -> Transition -> Main -> Config) on one Tk root.
+
+    Phases are states of this object rather than separate processes: the config window is
+    a Toplevel over the withdrawn root, and the task widgets are built into the root and
+    torn down again when the session returns to config. Tk and PIL stay loaded for the
+    lifetime of the process; decoded image sets are released with each task.
+
+    `run_task(controller, config)` builds the task into `controller.root` and returns a
+    callable that tears it down.
+    """
+    CONFIG = 'config'
+    PRACTICE = 'practice'
+    TRANSITION = 'transition'
+    MAIN = 'main'
+
+    TRANSITIONS = {
+        None: (CONFIG, PRACTICE, MAIN),
+        CONFIG: (PRACTICE, MAIN),
+        PRACTICE: (TRANSITION, CONFIG),
+        TRANSITION: (MAIN, CONFIG),
+        MAIN: (CONFIG,),
+    }
+
+    def __init__(self, root, run_task):
+        self.root = root
+        self.run_task = run_task
+        self.state = None
+        self.teardown = None
+        self.modules = []  # Display modules of the running task, set by run_task
+        self.config_window = None
+        # Key handlers reach the controller through the root they are bound on
+        root.session_controller = self
+
+    def enter(self, state):
+        if state not in self.TRANSITIONS[self.state]:
+            raise ValueError(f"Invalid session transition: {self.state} -> {state}")
+        log.info("Session state: %s -> %s", self.state, state)
+        self.state = state
+
+    def show_config(self):
+        """Tear down the running task (if any) and show the configuration window"""
+        self.end_task()
+        self.enter(self.CONFIG)
+        if get_backend(self.root).headless:
+            # No one to fill in a form offscreen; whoever drives the session starts the next task
+            return
+        self.root.withdraw()
+        window = tk.Toplevel(self.root)
+        self.config_window = ConfigWindow(window, on_start=self.start_task, on_exit=self.quit)
+
+    def start_task(self, config=None):
+        """Build the task for `config` (default: config.json) on the root window"""
+        if config is None:
+            config = load_config()
+        self.config_window = None
+        self.enter(self.PRACTICE if config.get('is_practice', False) else self.MAIN)
+        self.root.deiconify()
+        self.teardown = self.run_task(self, config)
+
+    def begin_transition(self):
+        """Practice finished; the main task starts once end_transition() is called"""
+        self.enter(self.TRANSITION)
+
+    def end_transition(self):
+        self.enter(self.MAIN)
+
+    @property
+    def in_transition(self):
+        return self.state == self.TRANSITION
+
+    def end_task(self):
+        if self.teardown:
+            teardown, self.teardown = self.teardown, None
+            teardown()
+        self.modules = []
+        # Nothing holds the images any more, and the next session may use other or edited files
+        clear_image_sets()
+
+    def quit(self):
+        self.end_task()
+        self.root.destroy()
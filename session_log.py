@@ -0,0 +1,103 @@
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import timing
+
+# Every task module logs under this logger, e.g. 'flash_suppression.display'
+ROOT_LOGGER = 'flash_suppression'
+FILE_FORMAT = '%(asctime)s %(monotonic_ms)14.3f %(levelname)-7s %(name)s: %(message)s'
+CONSOLE_FORMAT = '%(message)s'
+
+
+def get_logger(name):
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+class MonotonicStamp(logging.Filter):
+    """
+    Stamp each record with timing.now_ns() as it is logged.
+
+    Frame timing, onsets and responses use the same clock, so log lines can be matched
+    against them (on a HeadlessRoot this is the virtual clock).
+    """
+
+    def filter(self, record):
+        if not hasattr(record, 'monotonic_ms'):
+            record.monotonic_ms = timing.ns_to_ms(timing.now_ns())
+        return True
+
+
+class SessionLog:
+    """
+    Queue-based logging for the task.
+
+    Loggers only put records on an in-memory queue; a background listener thread
+    formats them and writes the rotating log file (and the console, if enabled), so
+    logging from a Tk callback never waits on file or console I/O.
+    """
+
+    def __init__(self, path='session.log', level='INFO', console=True, max_kb=1024, backups=3):
+        self.settings = (path, level, console, max_kb, backups)
+        self.level = getattr(logging, str(level).upper(), logging.INFO)
+        self.queue = queue.SimpleQueue()
+        self.queue_handler = logging.handlers.QueueHandler(self.queue)
+        self.queue_handler.addFilter(MonotonicStamp())
+
+        handlers = []
+        if path:
+            file_handler = logging.handlers.RotatingFileHandler(path, maxBytes=max(1, int(max_kb)) * 1024,
+                                                                backupCount=max(0, int(backups)),
+                                                                encoding='utf-8', delay=True)
+            file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+            handlers.append(file_handler)
+        # The windowed build has no console to write to
+        if console and sys.stdout is not None:
+            console_handler = logging.StreamHandler(sys.stdout)
+            console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+            handlers.append(console_handler)
+        self.handlers = handlers
+        self.listener = logging.handlers.QueueListener(self.queue, *handlers, respect_handler_level=True)
+
+    def start(self):
+        logger = logging.getLogger(ROOT_LOGGER)
+        logger.setLevel(self.level)
+        logger.addHandler(self.queue_handler)
+        # Records stop here instead of also reaching handlers on the root logger
+        logger.propagate = False
+        self.listener.start()
+
+    def stop(self):
+        """Write out every queued record and close the files"""
+        logging.getLogger(ROOT_LOGGER).removeHandler(self.queue_handler)
+        self.listener.stop()
+        for handler in self.handlers:
+            handler.close()
+
+
+_session_log = [None]
+
+
+def configure(config):
+    """Start (or restart, if the log_* settings changed) the session log described by `config`"""
+    settings = (config.get('log_file', 'session.log'), str(config.get('log_level', 'INFO')).upper(),
+                bool(config.get('log_console', True)), int(config.get('log_max_kb', 1024)),
+                int(config.get('log_backups', 3)))
+    current = _session_log[0]
+    if current is not None:
+        if current.settings == settings:
+            return current
+        current.stop()
+    _session_log[0] = SessionLog(*settings)
+    _session_log[0].start()
+    return _session_log[0]
+
+
+def shutdown():
+    if _session_log[0] is not None:
+        _session_log[0].stop()
+        _session_log[0] = None
+
+
+atexit.register(shutdown)
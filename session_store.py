@@ -0,0 +1,209 @@
+import csv
+import json
+import sqlite3
+from datetime import datetime
+from trial_log import TRIAL_FIELDNAMES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    participant_id TEXT NOT NULL,
+    started_at TEXT NOT NULL,
+    ended_at TEXT,
+    config_json TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(session_id),
+    row_order INTEGER NOT NULL,
+    participant_id TEXT NOT NULL,
+    trial_number INTEGER,
+    trial_type TEXT,
+    y_position INTEGER,
+    stimulus_position TEXT,
+    image_path TEXT,
+    reaction_time REAL,
+    response TEXT,
+    suppressor_position TEXT,
+    accuracy INTEGER
+);
+CREATE TABLE IF NOT EXISTS iti_responses (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL REFERENCES sessions(session_id),
+    row_order INTEGER NOT NULL,
+    participant_id TEXT NOT NULL,
+    trial_number INTEGER,
+    message TEXT,
+    reaction_time REAL,
+    response TEXT,
+    suppressor_position TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_participant ON sessions(participant_id);
+CREATE INDEX IF NOT EXISTS idx_trials_participant ON trials(participant_id, trial_type, suppressor_position);
+CREATE INDEX IF NOT EXISTS idx_trials_type ON trials(trial_type);
+CREATE INDEX IF NOT EXISTS idx_trials_suppressor ON trials(suppressor_position);
+CREATE INDEX IF NOT EXISTS idx_trials_session ON trials(session_id, row_order);
+CREATE INDEX IF NOT EXISTS idx_iti_participant ON iti_responses(participant_id);
+CREATE INDEX IF NOT EXISTS idx_iti_session ON iti_responses(session_id, row_order);
+"""
+
+TRIAL_COLUMNS = ('session_id', 'row_order', 'participant_id', 'trial_number', 'trial_type', 'y_position',
+                 'stimulus_position', 'image_path', 'reaction_time', 'response', 'suppressor_position',
+                 'accuracy')
+ITI_COLUMNS = ('session_id', 'row_order', 'participant_id', 'trial_number', 'message', 'reaction_time',
+               'response', 'suppressor_position')
+
+
+def _number(value, cast):
+    """Convert a CSV-style value to a number, mapping 'N/A' and blanks to NULL"""
+    if value in (None, '', 'N/A'):
+        return None
+    try:
+        return cast(value)
+    except (ValueError, TypeError):
+        return None
+
+
+class SessionStore:
+    """
+    Embedded SQLite store for sessions, trials and ITI responses across participants.
+
+    Rows are buffered and inserted in batched transactions. Trials are indexed on
+    participant ID, trial type and suppressor position so cross-participant queries
+    do not need to re-read any CSV files.
+    """
+
+    def __init__(self, path='session_data.db', batch_size=50):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+        self.session_id = None
+        self.participant_id = None
+        self.row_order = 0
+        self._pending_trials = []
+        self._pending_iti = []
+
+    def begin_session(self, participant_id, config=None):
+        """Start a new session and return its id"""
+        if self.session_id is not None:
+            self.end_session()
+        with self.connection:
+            cursor = self.connection.execute(
+                'INSERT INTO sessions (participant_id, started_at, config_json) VALUES (?, ?, ?)',
+                (str(participant_id), datetime.now().isoformat(timespec='seconds'),
+                 json.dumps(config) if config is not None else None))
+        self.session_id = cursor.lastrowid
+        self.participant_id = str(participant_id)
+        self.row_order = 0
+        return self.session_id
+
+    def add_row(self, row):
+        """Queue a trial_data row (as written to trial_data.csv); ITI rows go to iti_responses"""
+        if self.session_id is None:
+            raise ValueError("begin_session() must be called before adding rows")
+
+        if row.get('Trial Type') == 'ITI':
+            self._pending_iti.append((
+                self.session_id, self.row_order, self.participant_id,
+                _number(row.get('Trial Number'), int), row.get('Image Path'),
+                _number(row.get('Reaction Time'), float), row.get('Response'),
+                row.get('Suppressor Position')))
+        else:
+            self._pending_trials.append((
+                self.session_id, self.row_order, self.participant_id,
+                _number(row.get('Trial Number'), int), row.get('Trial Type'),
+                _number(row.get('Y Position'), int), row.get('Stimulus Position'),
+                row.get('Image Path'), _number(row.get('Reaction Time'), float),
+                row.get('Response'), row.get('Suppressor Position'),
+                _number(row.get('Accuracy'), int)))
+        self.row_order += 1
+
+        if len(self._pending_trials) + len(self._pending_iti) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Insert all queued rows in one transaction"""
+        if not self._pending_trials and not self._pending_iti:
+            return
+        with self.connection:
+            if self._pending_trials:
+                self.connection.executemany(
+                    f"INSERT INTO trials ({', '.join(TRIAL_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(TRIAL_COLUMNS))})", self._pending_trials)
+            if self._pending_iti:
+                self.connection.executemany(
+                    f"INSERT INTO iti_responses ({', '.join(ITI_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(ITI_COLUMNS))})", self._pending_iti)
+        self._pending_trials.clear()
+        self._pending_iti.clear()
+
+    def end_session(self):
+        self.flush()
+        if self.session_id is None:
+            return
+        with self.connection:
+            self.connection.execute('UPDATE sessions SET ended_at = ? WHERE session_id = ?',
+                                    (datetime.now().isoformat(timespec='seconds'), self.session_id))
+        self.session_id = None
+
+    def close(self):
+        self.end_session()
+        self.connection.close()
+
+    def trials(self, participant_id=None, trial_type=None, suppressor_position=None, session_id=None):
+        """Return matching trial rows (sqlite3.Row) in session and presentation order"""
+        self.flush()
+        clauses, params = [], []
+        for column, value in (('participant_id', participant_id), ('trial_type', trial_type),
+                              ('suppressor_position', suppressor_position), ('session_id', session_id)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(str(value) if column == 'participant_id' else value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.connection.execute(
+            f'SELECT * FROM trials {where} ORDER BY session_id, row_order', params).fetchall()
+
+    def export_csv(self, filename, session_id=None, participant_id=None):
+        """Write trials and ITI responses in the column layout of write_trial_data_to_csv"""
+        self.flush()
+        clauses, params = [], []
+        if session_id is not None:
+            clauses.append('session_id = ?')
+            params.append(session_id)
+        if participant_id is not None:
+            clauses.append('participant_id = ?')
+            params.append(str(participant_id))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+
+        query = f"""
+            SELECT session_id, row_order, participant_id, trial_number, trial_type, y_position,
+                   stimulus_position, image_path, reaction_time, response, suppressor_position, accuracy
+            FROM trials {where}
+            UNION ALL
+            SELECT session_id, row_order, participant_id, trial_number, 'ITI', NULL,
+                   NULL, message, reaction_time, response, suppressor_position, NULL
+            FROM iti_responses {where}
+            ORDER BY session_id, row_order
+        """
+        with open(filename, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(TRIAL_FIELDNAMES)
+            for row in self.connection.execute(query, params * 2):
+                is_iti = row['trial_type'] == 'ITI'
+                missing = 'N/A' if is_iti else ''
+                writer.writerow([
+                    row['participant_id'],
+                    row['trial_number'],
+                    row['trial_type'],
+                    missing if row['y_position'] is None else row['y_position'],
+                    missing if row['stimulus_position'] is None else row['stimulus_position'],
+                    row['image_path'],
+                    'N/A' if row['reaction_time'] is None else row['reaction_time'],
+                    row['response'],
+                    row['suppressor_position'],
+                    missing if row['accuracy'] is None else row['accuracy'],
+                ])
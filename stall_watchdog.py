@@ -0,0 +1,189 @@
+import csv
+import os
+import sys
+import threading
+import time
+import traceback
+import timing
+from render_backend import get_backend
+from session_log import get_logger
+
+log = get_logger('watchdog')
+
+STALL_FIELDNAMES = [
+    'Participant ID',
+    'Trial Number',  # Trial running when the stall began, or the last one started
+    'During',        # 'trial', 'iti', or 'setup' before the first trial
+    'Start (ms)',    # timing.now_ns() when the late heartbeat was due
+    'Duration (ms)',
+    'Location',      # Innermost task-code frame the main thread was in, if it was sampled
+    'Stack',         # Innermost frame first
+]
+
+# Frames from files in this directory are task code; the rest is the standard library and Tk
+_TASK_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _describe(frame, depth):
+    """(location, stack) strings for the innermost `depth` frames of a thread's stack"""
+    entries = traceback.extract_stack(frame)[-depth:][::-1]
+    names = [f"{os.path.basename(entry.filename)}:{entry.lineno} {entry.name}" for entry in entries]
+    location = next((name for name, entry in zip(names, entries)
+                     if os.path.dirname(os.path.abspath(entry.filename)) == _TASK_DIR), names[0] if names else '')
+    return location, ' < '.join(names)
+
+
+class StallWatchdog:
+    """
+    Detects stalls of the Tk event loop and records where the main thread was.
+
+    A heartbeat callback re-arms itself with after() every `heartbeat_ms`, so it runs on
+    time whenever the loop is free. A daemon thread polls the time of the last beat; once
+    the next one is more than `threshold_ms` late it samples the main thread's stack with
+    sys._current_frames(). The stall is recorded, with its full length, when the late beat
+    finally runs. Stalls that end before the thread gets to look (it needs the GIL too)
+    are still recorded, without a location.
+    """
+
+    def __init__(self, root, threshold_ms=50, heartbeat_ms=10, stack_depth=12):
+        self.root = root
+        self.threshold_ns = int(threshold_ms * 1_000_000)
+        self.heartbeat_ms = max(1, int(heartbeat_ms))
+        self.interval_ns = self.heartbeat_ms * 1_000_000
+        self.stack_depth = max(1, int(stack_depth))
+        self.trial = None
+        self.during = 'setup'
+        self.stalls = []
+        # (beat number, perf_counter_ns, timing.now_ns(), trial, during) of the last beat,
+        # replaced as a whole so the watchdog thread never sees half an update
+        self.last_beat = (0, 0, 0, None, 'setup')
+        self.sample = None  # (beat number, location, stack) taken by the watchdog thread
+        self.main_thread_id = None
+        self.after_id = None
+        self.thread = None
+        self.stopping = threading.Event()
+
+    def start(self):
+        # The heartbeat runs on the thread running the Tk loop, which is the one to sample
+        self.main_thread_id = threading.get_ident()
+        self.last_beat = (0, time.perf_counter_ns(), timing.now_ns(), self.trial, self.during)
+        self.after_id = self.root.after(self.heartbeat_ms, self._beat)
+        self.thread = threading.Thread(target=self._watch, name='stall-watchdog', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopping.set()
+        if self.after_id:
+            try:
+                self.root.after_cancel(self.after_id)
+            except:
+                pass
+            self.after_id = None
+        if self.thread is not None:
+            self.thread.join(timeout=1)
+            self.thread = None
+
+    def begin_trial(self, trial_number):
+        self.trial = trial_number
+        self.during = 'trial'
+
+    def end_trial(self):
+        self.during = 'iti'
+
+    def _beat(self):
+        now_real_ns = time.perf_counter_ns()
+        beat, beat_real_ns, beat_ns, trial, during = self.last_beat
+        late_ns = now_real_ns - beat_real_ns - self.interval_ns
+        if late_ns > self.threshold_ns:
+            sample = self.sample
+            location, stack = sample[1:] if sample is not None and sample[0] == beat else ('', '')
+            self._record(trial, during, beat_ns + self.interval_ns, late_ns, location, stack)
+        self.last_beat = (beat + 1, now_real_ns, timing.now_ns(), self.trial, self.during)
+        if not self.stopping.is_set():
+            self.after_id = self.root.after(self.heartbeat_ms, self._beat)
+
+    def _watch(self):
+        # Poll often enough to catch the main thread well inside any stall over the threshold
+        poll_s = min(max(self.threshold_ns / 2e9, 0.001), 0.05)
+        while not self.stopping.wait(poll_s):
+            beat, beat_real_ns = self.last_beat[:2]
+            if self.sample is not None and self.sample[0] == beat:
+                continue  # This stall has been sampled already
+            if time.perf_counter_ns() - beat_real_ns - self.interval_ns > self.threshold_ns:
+                frame = sys._current_frames().get(self.main_thread_id)
+                if frame is not None:
+                    self.sample = (beat, *_describe(frame, self.stack_depth))
+                del frame
+
+    def _record(self, trial, during, start_ns, duration_ns, location, stack):
+        stall = {
+            'Trial Number': 'N/A' if trial is None else trial,
+            'During': during,
+            'Start (ms)': round(timing.ns_to_ms(start_ns), 3),
+            'Duration (ms)': round(duration_ns / 1_000_000, 3),
+            'Location': location or 'not sampled',
+            'Stack': stack,
+        }
+        self.stalls.append(stall)
+        log.warning("Event loop stalled %.1f ms (trial %s, %s) at %s", stall['Duration (ms)'],
+                    stall['Trial Number'], during, stall['Location'])
+
+    def export(self, filename, participant_id):
+        """Write the stalls of the session so far"""
+        with open(filename, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=STALL_FIELDNAMES)
+            writer.writeheader()
+            for stall in self.stalls:
+                row = stall.copy()
+                row['Participant ID'] = participant_id
+                writer.writerow(row)
+        if self.stalls:
+            longest = max(stall['Duration (ms)'] for stall in self.stalls)
+            log.info("%s event-loop stalls over %s ms (longest %.1f ms) written to %s", len(self.stalls),
+                     self.threshold_ns // 1_000_000, longest, filename)
+
+
+# Session watchdog; None unless stall_watchdog is enabled in config
+watchdog = None
+
+
+def configure(root, config):
+    """
+    Stop the previous session's watchdog and start a new one on `root` if config enables it.
+
+    Offscreen there is no watchdog: a HeadlessRoot's virtual clock jumps from timer to timer,
+    so nothing can stall on screen, and a heartbeat that always has a timer pending would
+    keep its mainloop from ever running out of work.
+    """
+    global watchdog
+    stop()
+    if config.get('stall_watchdog', False) and get_backend(root).headless:
+        log.info("Stall watchdog not started: the offscreen backend has no real-time event loop")
+    elif config.get('stall_watchdog', False):
+        watchdog = StallWatchdog(root, threshold_ms=float(config.get('stall_threshold_ms', 50)),
+                                 heartbeat_ms=int(config.get('stall_heartbeat_ms', 10)),
+                                 stack_depth=int(config.get('stall_stack_depth', 12)))
+        watchdog.start()
+    return watchdog
+
+
+def stop():
+    global watchdog
+    if watchdog is not None:
+        watchdog.stop()
+        watchdog = None
+
+
+def begin_trial(trial_number):
+    if watchdog is not None:
+        watchdog.begin_trial(trial_number)
+
+
+def end_trial():
+    if watchdog is not None:
+        watchdog.end_trial()
+
+
+def export(filename, participant_id):
+    if watchdog is not None:
+        watchdog.export(filename, participant_id)
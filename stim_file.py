@@ -1,143 +1,266 @@
 import tkinter as tk
-from PIL import Image, ImageTk
+from PIL import Image
 import random
 import time
 import os
-from base_module import BaseModule, load_config
+import timing
+from functools import partial
+from base_module import BaseModule
+from config_service import get_config
+from blend_engine import create_blend_engine
+from frame_cache import alpha_ramp, shared_frame_cache
+from frame_clock import FrameClock
+from session_log import get_logger
+
+log = get_logger('stim')
 
 class Stimulus(BaseModule):
     def __init__(self, image_dir, root=None):
-        config = load_config()
-        self.duration = int(config.get('blend_duration', 10000))
-        self.alpha_reverse = config.get('alpha_reverse', False)
+        settings = get_config()
+        self.duration = settings.blend_duration
+        self.alpha_reverse = settings.alpha_reverse  # Ramp direction of trials the plan does not set
+        self.trial_reverse = self.alpha_reverse     # Ramp direction of the current trial
+        # Memory budget for pre-rendered alpha ramps (default 256 MB); shared across session phases
+        self.frame_cache = shared_frame_cache(settings.frame_cache_mb * 1024 * 1024)
+        self.frames_per_prerender_step = 10
+        # Blending backend: 'pil' (default) or 'numpy'
+        self.blend_engine = create_blend_engine(settings.blend_engine, self.RGB_CONSTANT)
         super().__init__(root=root if root else tk.Tk(), image_dir=image_dir, resize_dims=(200, 300))
         self.root.configure(bg='black')
         self.current_image_index = 0
         self.blending = False
         self.alpha = 0
         self.update_interval = 50
+        # Alpha is driven by elapsed time against absolute frame deadlines
+        self.blend_clock = FrameClock(self.root, self.update_interval, self.blend_image, source='stim')
+        self.alphas = alpha_ramp(self.duration, self.update_interval, self.alpha_reverse)
         self.y_position = 0
         self.root.after(100, self.place_fixation_point)
         # Bind all key press events
         for key in ('<space>', 'a', 'z'):
             self.root.bind(key, self.handle_space_press)
-        self.first_space_press_time = None
+        self.onset_ns = None  # When the first frame of the current trial was drawn
         self.image_y_position = None
         self.image_path = None
+        self.ramp = None
+        self.prerender_after_id = None
+        # Stimulus layer item (set once shown this trial) and PhotoImage buffer reused for every tick
+        self.stim_item = None
+        self.trial_photo = None
+        self.canvas.image = None
+        # Planned trials (TrialSchedule) and their stimuli as indices into image_files; without
+        # a schedule stimuli run in directory order at random heights
+        self.schedule = None
+        self.planned_images = None
+        self.next_trial = 0  # Schedule row the next start_blend() shows
+        # Render the first trial's ramp while the participant reads the ITI message
+        self.prerender_next_stimulus()
 
-    def blend_image(self):
+    def blend_image(self, frame_index=0, elapsed_ms=0.0):
+        """Show the blend frame for the latest deadline reached (called by the blend FrameClock)"""
         if not self.blending:
+            self.blend_clock.stop()
             return
-        
-        # Calculate alpha increment/decrement
-        alpha_step = self.update_interval / self.duration
-        
-        if self.alpha_reverse:
-            # Reverse: decrease from 0.99 to 0
-            self.alpha -= alpha_step
-            if self.alpha < 0:
-                self.alpha = 0
-        else:
-            # Normal: increase from 0 to 0.99
-            self.alpha += alpha_step
-            if self.alpha > 0.99:
-                self.alpha = 0.99
-        
-        transparent_img = Image.new("RGBA", self.pil_images[self.current_image_index].size, self.RGB_CONSTANT)
-        blended = Image.blend(transparent_img, self.pil_images[self.current_image_index], self.alpha)
-        tk_img = ImageTk.PhotoImage(blended)
-
-        # Determine the center position based on whether we have a border
-        if hasattr(self, 'content_area'):
-            border_width = 60
-            center_x = border_width + (self.canvas_width / 2)
-            # Adjust y_position for border
-            adjusted_y_position = border_width + self.y_position
+
+        # Alpha comes from elapsed time; frames whose deadlines were missed are skipped
+        ramp_index = min(frame_index, len(self.alphas) - 1)
+        self.alpha = self.alphas[ramp_index]
+
+        if self.ramp is not None:
+            # Hand the pre-rendered frame straight to the canvas
+            tk_img = self.ramp.frame(ramp_index)
         else:
-            center_x = self.canvas_width / 2
-            adjusted_y_position = self.y_position
+            # No cached ramp (e.g. it exceeds the cache budget), blend this tick directly
+            blended = self.blend_engine.blend(self.image_files[self.current_image_index],
+                                              self.pil_images[self.current_image_index], self.alpha)
+            # Update the trial's single PhotoImage buffer in place
+            if self.trial_photo is None:
+                self.trial_photo = self.backend.make_photo(blended)
+            else:
+                self.trial_photo.paste(blended)
+            tk_img = self.trial_photo
+
+        if self.stim_item is None:
+            # First frame of the trial: create the one canvas item reused for every tick
+            # Determine the center position based on whether we have a border
+            if hasattr(self, 'content_area'):
+                border_width = 60
+                center_x = border_width + (self.canvas_width / 2)
+                # Adjust y_position for border
+                adjusted_y_position = border_width + self.y_position
+            else:
+                center_x = self.canvas_width / 2
+                adjusted_y_position = self.y_position
 
-        self.canvas.create_image(center_x, adjusted_y_position, anchor=tk.N, image=tk_img, tags="stim_image")
+            self.stim_item = self.layers.create('stimulus', 'image', (center_x, adjusted_y_position),
+                                                anchor=tk.N, image=tk_img)
+            # Stimulus onset is when this first frame has actually been drawn
+            self.root.after_idle(self._stamp_onset)
+        elif tk_img is not self.canvas.image:
+            self.canvas.itemconfig(self.stim_item, image=tk_img)
         self.canvas.image = tk_img
-        self.image_y_position = self.y_position  # Store the original y_position (without border adjustment)
-        self.image_path = self.image_files[self.current_image_index]
-        
-        # Check stopping condition based on direction
-        if self.alpha_reverse:
-            should_continue = self.alpha > 0
-        else:
-            should_continue = self.alpha < 0.99
-        
-        if should_continue:
-            self.root.after(self.update_interval, self.blend_image)
+
+        # Hold the final alpha once blend_duration is reached; the trial runs until the response
+        if ramp_index == len(self.alphas) - 1:
+            self.blend_clock.stop()
+
+    def _stamp_onset(self):
+        if self.blending and self.onset_ns is None:
+            self.onset_ns = timing.now_ns()
+
+    def use_schedule(self, schedule):
+        """Take stimuli, heights and ramp directions from `schedule`, starting at its first trial"""
+        self.schedule = schedule
+        self.planned_images = schedule.resolve(self.image_files) if schedule is not None else None
+        self.next_trial = 0
+        self.prerender_next_stimulus()
+
+    def upcoming_images(self, count=1):
+        """Indices of the stimuli the next `count` trials show"""
+        if not self._scheduled():
+            return [(self.current_image_index + offset) % len(self.images) for offset in range(1, count + 1)]
+        return [int(index) for index in self.planned_images[self.next_trial:self.next_trial + count]]
+
+    def _scheduled(self):
+        """Whether the next trial has a row in the plan"""
+        return self.schedule is not None and self.next_trial < len(self.schedule)
+
+    def _next_reverse(self):
+        if not self._scheduled():
+            return self.alpha_reverse
+        return bool(self.schedule.trials['reverse'][self.next_trial])
+
+    def get_ramp(self, image_index, reverse=None):
+        """Return the (possibly partially rendered) alpha ramp for a stimulus, or None if it cannot be cached"""
+        if reverse is None:
+            reverse = self.alpha_reverse
+        alphas = alpha_ramp(self.duration, self.update_interval, reverse)
+        image_path = self.image_files[image_index]
+        pil_image = self.pil_images[image_index]
+        key = self.frame_cache.make_key(image_path, self.resize_dims, self.RGB_CONSTANT,
+                                        reverse, self.duration, self.update_interval, self.backend.name)
+        blend_frame = partial(self.blend_engine.blend, image_path, pil_image)
+        return self.frame_cache.prepare(key, pil_image.size, alphas, blend_frame, self.backend.make_photo)
+
+    def prerender_next_stimulus(self):
+        """Start rendering the alpha ramp of the stimulus the next trial will show"""
+        self.cancel_prerender()
+        upcoming = self.upcoming_images(self.prefetch_depth if self.prefetcher else 1)
+        if not upcoming:
+            return
+        if self.prefetcher:
+            # Decode the upcoming stimuli off the Tk thread; the ramp starts once the next one is cached
+            self.prefetch(upcoming[0], on_ready=self._on_prefetched, indices=upcoming)
+            return
+        self._start_prerender(upcoming[0])
+
+    def _on_prefetched(self, image_index):
+        if not self.blending and self.upcoming_images()[:1] == [image_index]:
+            self._start_prerender(image_index)
+
+    def _start_prerender(self, image_index):
+        self.cancel_prerender()
+        ramp = self.get_ramp(image_index, self._next_reverse())
+        if ramp is not None and not ramp.complete:
+            self.prerender_after_id = self.root.after_idle(self._prerender_step, ramp)
+
+    def _prerender_step(self, ramp):
+        # Render in small chunks so key presses are still handled promptly
+        if ramp.render_next(self.frames_per_prerender_step):
+            self.prerender_after_id = None
         else:
-            self.blending = False
+            self.prerender_after_id = self.root.after_idle(self._prerender_step, ramp)
+
+    def cancel_prerender(self):
+        if self.prerender_after_id:
+            try:
+                self.root.after_cancel(self.prerender_after_id)
+            except:
+                pass
+            self.prerender_after_id = None
+
+    def shutdown(self):
+        self.blending = False
+        self.blend_clock.stop()
+        self.cancel_prerender()
+        super().shutdown()
 
     def start_blend(self):
-        self.first_space_press_time = time.time()
+        self.onset_ns = None
         self.blending = True
         
+        if self._scheduled():
+            # Everything about the trial comes from its row of the plan
+            trial = self.schedule.trials[self.next_trial]
+            self.current_image_index = int(self.planned_images[self.next_trial])
+            self.y_position = int(trial['y_position'])
+            self.trial_reverse = bool(trial['reverse'])
+            self.next_trial += 1
+        else:
+            if self.schedule is not None:
+                log.warning("Trial %s is past the %s-trial schedule; choosing its stimulus unplanned",
+                            self.next_trial, len(self.schedule))
+            self.current_image_index = (self.current_image_index + 1) % len(self.images)
+            self.y_position = random.choice([50, 450])
+            self.trial_reverse = self.alpha_reverse
+
+        self.image_y_position = self.y_position  # Without the border adjustment
+        self.image_path = self.image_files[self.current_image_index]
+
         # Set initial alpha based on direction
-        if self.alpha_reverse:
+        if self.trial_reverse:
             self.alpha = 0.99  # Start at maximum visibility
         else:
             self.alpha = 0     # Start invisible
-        
-        self.current_image_index = (self.current_image_index + 1) % len(self.images)
-        self.y_position = random.choice([50, 450])
-        self.blend_image()
+
+        # Stop background rendering; any frames not built yet are rendered on demand
+        self.cancel_prerender()
+        self.blend_engine.prepare(self.image_files[self.current_image_index],
+                                  self.pil_images[self.current_image_index])
+        self.alphas = alpha_ramp(self.duration, self.update_interval, self.trial_reverse)
+        self.ramp = self.get_ramp(self.current_image_index, self.trial_reverse)
+        # Start the trial with a fresh PhotoImage buffer; the stimulus layer item is reused
+        self.stim_item = None
+        self.trial_photo = None
+        self.blend_clock.start()
 
     def handle_space_press(self, event):
+        if self.blending:
+            return self.end_trial(event)
+        return self.start_trial()
+
+    def start_trial(self):
+        # Clear any existing or pending ITI message before starting new trial
+        self.cancel_iti_message()
+        self.hide_iti_message()
+        self.place_fixation_point()
+
+        self.start_blend()
+        return None, None, None
+
+    def end_trial(self, event):
+        """End the trial on the response `event`: (Y position, image path, RT in seconds)"""
         if self.blending:
             self.blending = False
+            self.blend_clock.stop()
 
-            # AGGRESSIVE: Clear stimulus image, ITI messages, and any stray text
-            self.canvas.delete("stim_image")
-            self.canvas.delete("iti_message")
-            self.canvas.delete("text")  # Catch any untagged text
-            
-            # Also clear by searching for all text items
-            all_items = self.canvas.find_all()
-            for item in all_items:
-                if self.canvas.type(item) == 'text':
-                    # Only delete if it's not the fixation cross (which should be recreated anyway)
-                    self.canvas.delete(item)
-
-            # If we have a border, redraw the content area
-            if hasattr(self, 'content_area'):
-                border_width = 60
-                self.content_area = self.canvas.create_rectangle(
-                    border_width, border_width,
-                    border_width + self.canvas_width, border_width + self.canvas_height,
-                    fill=self.canvas_bg_color, outline='', tags='content_area'
-                )
-
-            self.place_fixation_point()
-            if self.first_space_press_time:
-                reaction_time = time.time() - self.first_space_press_time
+            # Hide the stimulus and any ITI message; content area and fixation persist
+            self.clear_trial_layers()
+            self.stim_item = None
+            self.trial_photo = None
+
+            # Reaction time from the first drawn frame to the key event's own timestamp
+            if self.onset_ns is not None:
+                reaction_time = (timing.event_time_ns(event) - self.onset_ns) / 1_000_000_000
             else:
                 reaction_time = None
-            self.first_space_press_time = None
+            self.onset_ns = None
             # Show ITI message after configured delay
             self.schedule_iti_message()
+            # Use the inter-trial interval to render the next stimulus
+            self.prerender_next_stimulus()
             return self.image_y_position, self.image_path, reaction_time
-        else:
-            # AGGRESSIVE: Clear any existing ITI message and text before starting new trial
-            self.canvas.delete("iti_message")
-            self.canvas.delete("text")
-            
-            # Also clear by searching for all text items except fixation
-            all_items = self.canvas.find_all()
-            for item in all_items:
-                if self.canvas.type(item) == 'text':
-                    self.canvas.delete(item)
-            
-            # Redraw fixation before starting
-            if hasattr(self, 'place_fixation_point'):
-                self.place_fixation_point()
-            
-            self.start_blend()
-            return None, None, None
+        return None, None, None
 
     def run(self):
         self.root.mainloop()
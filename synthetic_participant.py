@@ -0,0 +1,537 @@
+import argparse
+import contextlib
+import csv
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter
+import timing
+import session_log
+import trial_schedule
+import display_file
+from display_file import RESPONSE_DEBOUNCE_MS, run_task
+from config_service import get_config
+from render_backend import HeadlessRoot, get_backend
+from session_controller import SessionController
+
+
+class ResponseModel:
+    """
+    How the simulated participant responds.
+
+    Breakthrough RTs are log-normal around `rt_median_ms` (spread `rt_sigma`, never
+    below `rt_min_ms`). Trials with the suppressor on `slow_side` take `slow_side_cost_ms`
+    longer, which gives the practice dominance calculation an eye to find. The stimulus
+    is localised correctly ('a' top, 'z' bottom) with probability `accuracy`. Space is
+    pressed `iti_latency_ms` (normal, sd `iti_latency_sd_ms`) after the ITI message appears.
+
+    Participant errors the task has to cope with:
+    - `early_press_rate`: space is pressed during the ITI before the message is shown.
+    - `double_press_rate`: a response is followed `double_press_gap_ms` later by a
+      second press, which the debounce must drop.
+    - `quit_after`: q is pressed instead of starting trial number `quit_after` (None: never).
+    """
+
+    def __init__(self, rt_median_ms=1200, rt_sigma=0.35, rt_min_ms=250, slow_side='left',
+                 slow_side_cost_ms=300, accuracy=0.95, iti_latency_ms=400, iti_latency_sd_ms=150,
+                 early_press_rate=0.0, double_press_rate=0.0, double_press_gap_ms=60,
+                 quit_after=None, seed=0):
+        self.rt_median_ms = rt_median_ms
+        self.rt_sigma = rt_sigma
+        self.rt_min_ms = rt_min_ms
+        self.slow_side = slow_side
+        self.slow_side_cost_ms = slow_side_cost_ms
+        self.accuracy = accuracy
+        self.iti_latency_ms = iti_latency_ms
+        self.iti_latency_sd_ms = iti_latency_sd_ms
+        self.early_press_rate = early_press_rate
+        self.double_press_rate = double_press_rate
+        self.double_press_gap_ms = double_press_gap_ms
+        self.quit_after = quit_after
+        self.rng = random.Random(seed)
+
+    def reaction_time_ms(self, suppressor_side):
+        rt = self.rt_median_ms * math.exp(self.rng.gauss(0.0, self.rt_sigma))
+        if suppressor_side == self.slow_side:
+            rt += self.slow_side_cost_ms
+        return max(self.rt_min_ms, rt)
+
+    def response_key(self, stimulus_top):
+        correct = self.rng.random() < self.accuracy
+        return 'a' if stimulus_top == correct else 'z'
+
+    def iti_latency(self):
+        return max(0.0, self.rng.gauss(self.iti_latency_ms, self.iti_latency_sd_ms))
+
+    def early_press(self):
+        return self.rng.random() < self.early_press_rate
+
+    def double_press(self):
+        return self.rng.random() < self.double_press_rate
+
+    @property
+    def expected_suppressor(self):
+        """Main-task suppressor the dominance calculation should pick for this participant"""
+        return 'right' if self.slow_side == 'left' else 'left'
+
+
+class SyntheticParticipant:
+    """
+    Drives sessions through the real key handlers with presses timed by a ResponseModel.
+
+    The participant watches the running modules (whether a trial is on, when the
+    stimulus was first drawn, when the ITI message appeared) and schedules each press
+    with root.after(), so the same driver runs on a HeadlessRoot (virtual time, as fast
+    as the CPU allows) or on a Tk root (real time, events injected with event_generate).
+
+    For every press it works out independently how many rows the task should record:
+    one trial or ITI row, or none if the press falls inside the debounce window, during
+    the practice-to-main transition, or ends the phase. The rows actually written to the
+    trial log are compared against that, and once a session ends its trial_data.csv is
+    checked for recorded RTs that differ from the simulated ones, duplicate ITI rows,
+    gaps in trial numbering, practice trials shown on the wrong side and trials that
+    differ from the saved trial schedule.
+
+    Waits are bounded. If the modules disagree about whether a trial is on, or a trial
+    shows no stimulus (or does not end) in time, that is an anomaly and the participant
+    presses anyway; after MAX_FAILED_PRESSES failures in a row the session is quit, so
+    a broken task state ends the run instead of hanging it.
+    """
+
+    MAX_FAILED_PRESSES = 3
+    STUCK_MARGIN_MS = 1000  # How long past its due time a trial may still be running
+
+    def __init__(self, controller, model, config, sessions=1, poll_ms=5, rt_tolerance_ms=None):
+        self.controller = controller
+        self.root = controller.root
+        self.model = model
+        self.config = dict(config)
+        self.sessions = sessions
+        self.poll_ms = poll_ms
+        self.headless = get_backend(self.root).headless
+        # Virtual time is exact; real key events are stamped to within a frame or so
+        self.rt_tolerance_ms = rt_tolerance_ms if rt_tolerance_ms is not None else (0.01 if self.headless else 50.0)
+        self.iti_wait_ns = (int(self.config.get('iti_message_delay', 500)) + 100) * 1_000_000
+        # The stimulus is drawn on the trial's first frame; allow the whole ramp before calling it stuck
+        self.onset_wait_ns = (int(self.config.get('blend_duration', 10000)) + self.STUCK_MARGIN_MS) * 1_000_000
+
+        self.presses = []
+        self.anomalies = []
+        self.session_reports = []
+        self.done = False
+        self.sessions_started = 0
+        self.step_after_id = None
+        self.planned_after_id = None
+        self.state = None
+        self.phase_trials = 0
+        self.phase_total = 0
+        self.session_presses = []
+        self.last_accepted_ns = None
+        self.planned_onset = None  # Stimulus onset the planned response belongs to
+        self.iti_since_ns = None
+        self.early_checked = False
+        self.trial_deadline_ns = None  # When the running trial counts as stuck
+        self.failed_presses = 0
+        self.started_wall = None
+        self.started_ns = None
+
+    # Session control
+    def start(self):
+        self.started_wall = time.perf_counter()
+        self.started_ns = timing.now_ns()
+        self._start_session()
+
+    def _start_session(self):
+        self.sessions_started += 1
+        self.session_presses = []
+        self.last_accepted_ns = None
+        window = self.controller.config_window
+        if window is not None:
+            window.master.destroy()
+        # The key handlers read config.json, so the session's config goes there first
+        get_config().replace(self.config)
+        self.controller.start_task()
+        self._schedule_step()
+
+    def _session_finished(self):
+        self._check_session_log()
+        if self.sessions_started < self.sessions:
+            self._start_session()
+            return
+        self.done = True
+        self.root.quit()
+
+    def _schedule_step(self, delay_ms=None):
+        if self.step_after_id is None and not self.done:
+            self.step_after_id = self.root.after(self.poll_ms if delay_ms is None else delay_ms, self._step)
+
+    # Deciding what to press next
+    def _step(self):
+        self.step_after_id = None
+        controller = self.controller
+        if controller.state != self.state:
+            self._state_changed(self.state, controller.state)
+        if controller.state == controller.CONFIG:
+            self._session_finished()
+            return
+        if self.planned_after_id is not None:
+            return  # The press reschedules the next step
+        if controller.in_transition or not controller.modules:
+            self._schedule_step()
+            return
+
+        mask_module, stim_module = controller.modules
+        now_ns = timing.now_ns()
+        if stim_module.blending or mask_module.image_cycle_running:
+            self.iti_since_ns = None
+            if self.trial_deadline_ns is None:
+                self.trial_deadline_ns = now_ns + self.onset_wait_ns
+            if stim_module.blending != mask_module.image_cycle_running:
+                self._unstick('desync', mask_module, stim_module)
+                return
+            if stim_module.onset_ns is not None and stim_module.onset_ns != self.planned_onset:
+                self.planned_onset = stim_module.onset_ns
+                rt_ms = self.model.reaction_time_ms(self._suppressor_side(mask_module))
+                key = self.model.response_key(stim_module.y_position < 400)
+                due_ns = stim_module.onset_ns + int(rt_ms * 1_000_000)
+                self.trial_deadline_ns = due_ns + self.STUCK_MARGIN_MS * 1_000_000
+                self._plan(due_ns, key, 'trial', rt_ms)
+            elif now_ns >= self.trial_deadline_ns:
+                self._unstick('stuck_trial', mask_module, stim_module)
+                return
+        else:
+            self.trial_deadline_ns = None
+            if self.iti_since_ns is None:
+                self.iti_since_ns = now_ns
+                self.early_checked = False
+            onset_ns = timing.get_mark('iti_onset')
+            if onset_ns is None and not self.early_checked:
+                self.early_checked = True
+                # Somewhere between the end of the debounce window and the message
+                earliest_ms = RESPONSE_DEBOUNCE_MS + 10
+                latest_ms = self.iti_wait_ns / 1_000_000 - 110
+                if latest_ms > earliest_ms and self.model.early_press():
+                    delay_ms = self.model.rng.uniform(earliest_ms, latest_ms)
+                    self._plan(self.iti_since_ns + int(delay_ms * 1_000_000), 'space', 'early')
+                    return
+            elif onset_ns is not None or now_ns - self.iti_since_ns >= self.iti_wait_ns:
+                # No message coming (first trial of a session): respond as if it had just appeared
+                reference_ns = onset_ns if onset_ns is not None else now_ns
+                quit_now = self.model.quit_after is not None and self.phase_trials >= self.model.quit_after
+                self._plan(reference_ns + int(self.model.iti_latency() * 1_000_000),
+                           'q' if quit_now else 'space', 'iti')
+        self._schedule_step()
+
+    def _unstick(self, kind, mask_module, stim_module):
+        """Record a trial the task lost track of and press anyway, or quit if that keeps failing"""
+        self._anomaly(kind, {'trial': self.phase_trials, 'state': self.controller.state,
+                             'mask_running': mask_module.image_cycle_running,
+                             'stim_blending': stim_module.blending, 'onset_ns': stim_module.onset_ns})
+        self.failed_presses += 1
+        if self.failed_presses > self.MAX_FAILED_PRESSES:
+            self._abort(kind)
+            return
+        now_ns = timing.now_ns()
+        self.trial_deadline_ns = now_ns + self.onset_wait_ns
+        self._plan(now_ns, self.model.response_key(stim_module.y_position < 400), 'stuck')
+
+    def _abort(self, reason):
+        """Quit the session; if the task does not go back to the config window, stop the run"""
+        self._anomaly('aborted', {'reason': reason, 'trial': self.phase_trials, 'state': self.controller.state})
+        self.failed_presses = 0
+        self.last_accepted_ns = None
+        display_file.last_response_time[0] = 0  # Let the q through the debounce
+        self._deliver('q')
+        if self.controller.state != self.controller.CONFIG:
+            self.done = True
+            self.root.quit()
+            return
+        self._schedule_step(0)
+
+    def _state_changed(self, old, new):
+        self.state = new
+        if new in (self.controller.PRACTICE, self.controller.MAIN):
+            self.phase_trials = 0
+            self.phase_total = get_config().trials_total
+            self.iti_since_ns = None
+        if old == self.controller.TRANSITION:
+            # The transition resets the debounce timer
+            self.last_accepted_ns = None
+
+    @staticmethod
+    def _suppressor_side(mask_module):
+        return 'left' if mask_module.side == 'left' else 'right'
+
+    def _plan(self, due_ns, key, kind, rt_ms=None):
+        delay_ms = max(0.0, (due_ns - timing.now_ns()) / 1_000_000)
+        if not self.headless:
+            delay_ms = int(round(delay_ms))
+        self.planned_after_id = self.root.after(delay_ms, self._press, key, kind, rt_ms)
+
+    # Pressing and checking
+    def _expected_rows(self, key, now_ns):
+        if self.controller.in_transition or not self.controller.modules:
+            return 0
+        if (self.last_accepted_ns is not None
+                and now_ns - self.last_accepted_ns < RESPONSE_DEBOUNCE_MS * 1_000_000):
+            return 0
+        if key == 'q':
+            return 0
+        mask_module, stim_module = self.controller.modules
+        if stim_module.blending or mask_module.image_cycle_running:
+            return 1
+        return 0 if self.phase_trials >= self.phase_total else 1
+
+    def _press(self, key, kind, rt_ms=None):
+        self.planned_after_id = None
+        now_ns = timing.now_ns()
+        expected = self._expected_rows(key, now_ns)
+        accepted = not self.controller.in_transition and not (
+            self.last_accepted_ns is not None
+            and now_ns - self.last_accepted_ns < RESPONSE_DEBOUNCE_MS * 1_000_000)
+        state = self.controller.state
+        writer = display_file.trial_log[0]
+        before = writer.rows_written if writer else 0
+
+        self._deliver(key)
+
+        rows = (writer.rows_written - before) if writer else 0
+        record = {'time_ms': round((now_ns - self.started_ns) / 1_000_000, 3), 'session': self.sessions_started,
+                  'state': state, 'key': key, 'kind': kind, 'expected_rows': expected, 'rows': rows,
+                  'rt_ms': rt_ms}
+        self.presses.append(record)
+        self.session_presses.append(record)
+        if rows < expected:
+            self._anomaly('dropped_response', record)
+            self.failed_presses += 1
+        elif rows > expected:
+            self._anomaly('extra_row', record)
+        elif rows:
+            self.failed_presses = 0
+        if accepted:
+            self.last_accepted_ns = now_ns
+        if self.failed_presses > self.MAX_FAILED_PRESSES:
+            self._abort('dropped_response')
+            return
+        if kind in ('trial', 'stuck') and rows:
+            self.phase_trials += 1
+            self.iti_since_ns = now_ns
+            self.early_checked = False
+            if self.model.double_press():
+                self._plan(now_ns + int(self.model.double_press_gap_ms * 1_000_000), key, 'double')
+        elif kind in ('iti', 'early'):
+            self.iti_since_ns = None
+        self._schedule_step(0)
+
+    def _deliver(self, key):
+        if self.headless:
+            self.root.key_press(key)
+        else:
+            self.root.focus_force()
+            self.root.event_generate('<KeyPress>', keysym=key, when='now')
+
+    def _anomaly(self, kind, detail):
+        self.anomalies.append({'kind': kind, 'session': self.sessions_started, 'detail': detail})
+
+    def _check_session_log(self):
+        """Compare the finished session's trial_data.csv with what was pressed"""
+        try:
+            with open('trial_data.csv', newline='') as log_file:
+                rows = list(csv.DictReader(log_file))
+        except FileNotFoundError:
+            self._anomaly('missing_log', {'file': 'trial_data.csv'})
+            return
+
+        trial_rows = [row for row in rows if row['Trial Type'] in ('Practice', 'Main')]
+        responses = [press for press in self.session_presses if press['kind'] in ('trial', 'stuck') and press['rows']]
+        rt_errors = []
+        for row, press in zip(trial_rows, responses):
+            if press['rt_ms'] is None:
+                continue  # Pressed to unstick the trial; there is no simulated RT to compare
+            try:
+                recorded = float(row['Reaction Time'])
+            except ValueError:
+                self._anomaly('missing_rt', {'trial': row['Trial Number'], 'type': row['Trial Type']})
+                continue
+            error = abs(recorded - press['rt_ms'])
+            rt_errors.append(error)
+            if error > self.rt_tolerance_ms:
+                self._anomaly('rt_mismatch', {'trial': row['Trial Number'], 'type': row['Trial Type'],
+                                              'recorded_ms': recorded, 'simulated_ms': press['rt_ms']})
+        if len(trial_rows) != len(responses):
+            self._anomaly('trial_count_mismatch', {'logged': len(trial_rows), 'responses': len(responses)})
+
+        previous = None
+        for row in rows:
+            if row['Trial Type'] == 'ITI' and previous is not None and previous['Trial Type'] == 'ITI' \
+                    and previous['Trial Number'] == row['Trial Number']:
+                self._anomaly('duplicate_iti_row', {'trial': row['Trial Number']})
+            previous = row
+
+        for trial_type in ('Practice', 'Main'):
+            numbers = [int(row['Trial Number']) for row in trial_rows if row['Trial Type'] == trial_type]
+            if numbers != list(range(len(numbers))):
+                self._anomaly('trial_number_gap', {'type': trial_type, 'numbers': numbers[:50]})
+
+        sequence = self.config.get('practice_sequence') or []
+        for row in trial_rows:
+            number = int(row['Trial Number'])
+            if row['Trial Type'] == 'Practice' and number < len(sequence) \
+                    and row['Suppressor Position'] != sequence[number]:
+                self._anomaly('practice_side', {'trial': number, 'shown': row['Suppressor Position'],
+                                                'scheduled': sequence[number]})
+
+        self._check_schedules(trial_rows)
+
+        main_sides = Counter(row['Suppressor Position'] for row in trial_rows if row['Trial Type'] == 'Main')
+        self.session_reports.append({
+            'session': self.sessions_started,
+            'rows': dict(Counter(row['Trial Type'] for row in rows)),
+            'main_suppressor': dict(main_sides),
+            'max_rt_error_ms': round(max(rt_errors), 4) if rt_errors else None,
+        })
+
+    def _check_schedules(self, trial_rows):
+        """Each recorded trial should show the stimulus, height and side its schedule planned"""
+        for trial_type, phase in (('Practice', 'practice'), ('Main', 'main')):
+            rows = [row for row in trial_rows if row['Trial Type'] == trial_type]
+            if not rows:
+                continue
+            try:
+                schedule = trial_schedule.TrialSchedule.load(trial_schedule.schedule_path(phase))
+            except FileNotFoundError:
+                self._anomaly('missing_log', {'file': trial_schedule.schedule_path(phase)})
+                continue
+            for row in rows:
+                number = int(row['Trial Number'])
+                if number >= len(schedule):
+                    self._anomaly('schedule_mismatch', {'trial': number, 'type': trial_type, 'field': 'length'})
+                    continue
+                planned = {'Image Path': schedule.stimulus_file(number),
+                           'Y Position': str(schedule.trials['y_position'][number]),
+                           'Suppressor Position': schedule.suppressor(number)}
+                shown = {'Image Path': os.path.basename(row['Image Path']), 'Y Position': row['Y Position'],
+                         'Suppressor Position': row['Suppressor Position']}
+                for field, value in planned.items():
+                    if shown[field] != value:
+                        self._anomaly('schedule_mismatch', {'trial': number, 'type': trial_type, 'field': field,
+                                                            'shown': shown[field], 'planned': value})
+
+    def report(self):
+        wall_s = time.perf_counter() - self.started_wall
+        session_s = (timing.now_ns() - self.started_ns) / 1e9
+        kinds = Counter(anomaly['kind'] for anomaly in self.anomalies)
+        trials = sum(1 for press in self.presses if press['kind'] in ('trial', 'stuck') and press['rows'])
+        return {
+            'sessions': self.sessions_started,
+            'presses': len(self.presses),
+            'trials': trials,
+            'dropped_by_debounce': sum(1 for press in self.presses if press['kind'] == 'double' and not press['rows']),
+            'expected_main_suppressor': self.model.expected_suppressor if self.config.get('is_practice') else None,
+            'session_time_s': round(session_s, 3),
+            'wall_time_s': round(wall_s, 3),
+            'speedup': round(session_s / wall_s, 1) if wall_s > 0 else None,
+            'trials_per_wall_s': round(trials / wall_s, 1) if wall_s > 0 else None,
+            'anomaly_counts': dict(kinds),
+            'anomalies': self.anomalies[:50],
+            'session_reports': self.session_reports,
+        }
+
+
+def simulation_config(base, trials, practice=False, practice_first='left'):
+    """Task config for a simulated session: a main task, or practice that auto-progresses to one"""
+    config = dict(base)
+    config.update({'trials_total': trials, 'main_task_trials': trials, 'is_practice': False,
+                   'auto_progress_to_main': False})
+    config.pop('practice_sequence', None)
+    if practice:
+        other = 'right' if practice_first == 'left' else 'left'
+        config.update({'trials_total': 20, 'is_practice': True, 'auto_progress_to_main': True,
+                       'practice_sequence': ([practice_first] * 5 + [other] * 5) * 2,
+                       'mask_position': practice_first})
+    return config
+
+
+def run_simulation(config, model, sessions=1, headless=True, poll_ms=5):
+    """Run `sessions` sessions of `config` with a synthetic participant and return its report"""
+    if headless:
+        root = HeadlessRoot()
+    else:
+        import tkinter as tk
+        root = tk.Tk()
+        root.geometry("1280x800")
+    controller = SessionController(root, run_task)
+    participant = SyntheticParticipant(controller, model, config, sessions=sessions, poll_ms=poll_ms)
+    root.after(0, participant.start)
+    try:
+        root.mainloop()
+        # Read the clock before the root goes; a HeadlessRoot takes its virtual clock with it
+        return participant.report()
+    finally:
+        display_file.finalize_session_data()
+        controller.quit()
+        # Write out queued log records while the console they go to is still in place
+        session_log.shutdown()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Run b-CFS sessions with a synthetic participant.')
+    parser.add_argument('--trials', type=int, default=1000, help='main-task trials per session (default: 1000)')
+    parser.add_argument('--practice', action='store_true', help='start with 20 practice trials and auto-progress')
+    parser.add_argument('--sessions', type=int, default=1, help='sessions to run back to back (default: 1)')
+    parser.add_argument('--tk', action='store_true', help='drive a real Tk window in real time (needs a display)')
+    parser.add_argument('--config', default='config.json', help='base config; directories and timing come from here')
+    parser.add_argument('--workdir', help='directory for the session files (default: a new temporary directory)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--rt-median', type=float, default=1200, help='median breakthrough RT in ms')
+    parser.add_argument('--slow-side', choices=('left', 'right'), default='left',
+                        help='suppressor side that slows responses')
+    parser.add_argument('--accuracy', type=float, default=0.95)
+    parser.add_argument('--iti-latency', type=float, default=400, help='mean ITI response latency in ms')
+    parser.add_argument('--early-press-rate', type=float, default=0.0)
+    parser.add_argument('--double-press-rate', type=float, default=0.0)
+    parser.add_argument('--quit-after', type=int, help='press q instead of starting this trial')
+    parser.add_argument('--output', help='write the report as JSON here')
+    parser.add_argument('--verbose', action='store_true', help="show the task's console output")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(args.config, 'r') as config_file:
+        base = json.load(config_file)
+    # Image directories are resolved before moving to the work directory
+    for key in ('mask_dir', 'stim_dir', 'practice_dir'):
+        if base.get(key):
+            base[key] = os.path.abspath(base[key])
+    output = os.path.abspath(args.output) if args.output else None
+
+    config = simulation_config(base, args.trials, args.practice)
+    model = ResponseModel(rt_median_ms=args.rt_median, slow_side=args.slow_side, accuracy=args.accuracy,
+                          iti_latency_ms=args.iti_latency, early_press_rate=args.early_press_rate,
+                          double_press_rate=args.double_press_rate, quit_after=args.quit_after, seed=args.seed)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='synthetic_session_')
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+    print(f"Session files in {workdir}")
+
+    output_context = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+    with output_context:
+        report = run_simulation(config, model, sessions=args.sessions, headless=not args.tk)
+
+    print(json.dumps({key: value for key, value in report.items() if key != 'anomalies'}, indent=2))
+    for anomaly in report['anomalies'][:10]:
+        print(f"Anomaly: {anomaly}")
+    if output:
+        with open(output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+    sys.exit(1 if report['anomaly_counts'] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+# The application modules live in the project directory, next to this package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def image_dirs(tmp_path):
+    """Small mask and stimulus directories: (mask_dir, stim_dir)"""
+    mask_dir, stim_dir = tmp_path / 'mask', tmp_path / 'stim'
+    mask_dir.mkdir()
+    stim_dir.mkdir()
+    for index in range(6):
+        Image.new('RGB', (64, 80), (40 * index, 255 - 40 * index, 90)).save(mask_dir / f'm{index}.png')
+    for index in range(5):
+        Image.new('RGB', (20, 30), (255, 30 * index, 0)).save(stim_dir / f's{index}.png')
+    return str(mask_dir), str(stim_dir)
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run the test inside its own directory, where session files and config.json are written"""
+    path = tmp_path / 'session'
+    path.mkdir()
+    monkeypatch.chdir(path)
+    return path
+
+
+@pytest.fixture
+def make_modules(image_dirs, workdir):
+    """Factory for offscreen (root, mask module, stimulus module) built from a config.json with `settings`"""
+    from config_service import get_config
+    from display_file import create_module
+    from mask_file import ImageCycler
+    from render_backend import HeadlessRoot
+    from stim_file import Stimulus
+
+    roots = []
+
+    def make(**settings):
+        mask_dir, stim_dir = image_dirs
+        config = {'mask_dir': mask_dir, 'stim_dir': stim_dir, 'blend_duration': 500, 'mask_cycle_time': 100,
+                  'session_store': False, 'log_console': False}
+        config.update(settings)
+        get_config().replace(config)
+        root = HeadlessRoot()
+        roots.append(root)
+        mask = create_module(root, ImageCycler, mask_dir, 'left', config['mask_cycle_time'])
+        stim = create_module(root, Stimulus, stim_dir, 'right')
+        return root, mask, stim
+
+    yield make
+    for root in roots:
+        root.destroy()
@@ -0,0 +1,102 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import asset_loader
+import disk_cache
+from asset_loader import AssetLoader, LazyImageList, decode_image, decode_images
+
+
+@pytest.fixture
+def stim_files(image_dirs, monkeypatch):
+    monkeypatch.setattr(disk_cache, 'cache', None)  # Decode from the files themselves
+    stim_dir = image_dirs[1]
+    return sorted(os.path.join(stim_dir, name) for name in os.listdir(stim_dir))
+
+
+def make_loader(stim_files, images):
+    # Budget for `images` decoded 20x30 stimuli without photos
+    return AssetLoader(stim_files, max_bytes=images * 20 * 30 * 4, make_photo=lambda image: ('photo', image))
+
+
+def test_least_recently_used_images_are_evicted(stim_files):
+    loader = make_loader(stim_files, 3)
+    for index in (0, 1, 2):
+        loader.pil_image(index)
+    loader.pil_image(0)  # A hit moves image 0 to the most recently used end
+    loader.pil_image(3)
+    assert [loader.is_cached(index) for index in range(5)] == [True, False, True, True, False]
+    assert list(loader._entries) == [2, 0, 3]
+    assert loader.stats() == {'images': 5, 'cached': 3, 'bytes': 3 * 2400, 'hits': 1, 'misses': 4, 'evictions': 1}
+
+    loader.pil_image(1)  # Decoded again after its eviction
+    assert loader.stats()['misses'] == 5 and not loader.is_cached(2)
+
+
+def test_photos_count_against_the_budget(stim_files):
+    loader = make_loader(stim_files, 3)
+    loader.pil_image(0)
+    photo = loader.photo(1)
+    assert photo[0] == 'photo' and loader.photo(1) is photo
+    assert loader.current_bytes == 3 * 2400
+    loader.pil_image(2)  # Over budget: image 0, the least recently used, goes
+    assert list(loader._entries) == [1, 2] and loader.current_bytes == 3 * 2400
+
+    loader.store(4, loader.pil_image(2).copy())  # Prefetched elsewhere: no lookup counted
+    assert loader.is_cached(4) and loader.stats()['evictions'] == 2
+    loader.ensure_photo(4)
+    assert loader._entries[4][1] is not None
+
+    # The most recently used image stays even when it alone exceeds the budget
+    loader.max_bytes = 1
+    loader.photo(3)
+    assert list(loader._entries) == [3]
+
+
+def test_lazy_list_indexes_like_a_list(stim_files):
+    loader = make_loader(stim_files, 10)
+    photos, images = LazyImageList(loader, 'photo'), LazyImageList(loader, 'pil')
+    assert len(photos) == len(images) == 5
+    assert images[-1] is images[4] and images[4].size == (20, 30)
+    assert photos[1] == ('photo', images[1])
+    assert [image.size for image in images[1:3]] == [(20, 30)] * 2
+    assert len(list(images)) == 5
+    with pytest.raises(IndexError):
+        images[5]
+    with pytest.raises(IndexError):
+        images[-6]
+    assert loader.stats()['misses'] == 5
+
+
+@pytest.fixture
+def noise_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_cache, 'cache', None)
+    rng = np.random.default_rng(0)
+    paths = []
+    for index in range(8):
+        path = tmp_path / f'noise_{index}.png'
+        Image.fromarray(rng.integers(0, 256, size=(30 + index, 40, 3), dtype=np.uint8)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('workers, pool', [(4, 'thread'), (2, 'process')])
+def test_pools_decode_like_the_serial_path(noise_files, workers, pool):
+    serial = decode_images(noise_files, (32, 24))
+    pooled = decode_images(noise_files, (32, 24), workers=workers, pool=pool)
+    assert [image.tobytes() for image in pooled] == [image.tobytes() for image in serial]
+    assert all(image.mode == 'RGBA' and image.size == (32, 24) for image in pooled)
+    # In file order, and every file has distinct pixels, so a reordering could not go unnoticed
+    assert [image.tobytes() for image in serial] == [decode_image(path, (32, 24)).tobytes() for path in noise_files]
+    assert len({image.tobytes() for image in serial}) == len(noise_files)
+
+
+def test_frozen_app_decodes_serially(noise_files, monkeypatch):
+    monkeypatch.setattr(sys, 'frozen', True, raising=False)
+    for executor in ('ThreadPoolExecutor', 'ProcessPoolExecutor'):
+        monkeypatch.setattr(asset_loader, executor, None)  # Any pool use would fail
+    images = decode_images(noise_files, workers=4, pool='process')
+    assert [image.size for image in images] == [(40, 30 + index) for index in range(8)]
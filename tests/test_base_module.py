@@ -0,0 +1,37 @@
+import os
+
+from PIL import Image
+
+import base_module
+from render_backend import HeadlessRoot
+from session_controller import SessionController
+
+
+def first_pixel(stim, name):
+    index = stim.image_files.index(os.path.join(stim.image_dir, name))
+    return stim.pil_images[index].getpixel((0, 0))
+
+
+def test_decoded_images_are_reused_until_a_file_changes(make_modules):
+    _, _, stim = make_modules()
+    images = stim.pil_images
+    _, _, stim = make_modules()
+    assert stim.pil_images is images  # Same files: nothing decoded again
+
+    path = os.path.join(stim.image_dir, 's2.png')
+    stat = os.stat(path)
+    Image.new('RGB', (20, 30), (0, 0, 255)).save(path)  # Edited in place; same name, maybe same size
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    _, _, stim = make_modules()
+    assert stim.pil_images is not images
+    assert first_pixel(stim, 's2.png') == (0, 0, 255, 255)
+
+
+def test_image_sets_are_released_with_the_task(make_modules):
+    root, mask, stim = make_modules()
+    assert base_module._image_sets
+    controller = SessionController(HeadlessRoot(), lambda controller, config: (lambda: None))
+    controller.start_task({'is_practice': False})
+    controller.end_task()
+    assert base_module._image_sets == {}
+    controller.root.destroy()
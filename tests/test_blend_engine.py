@@ -0,0 +1,34 @@
+import numpy as np
+from PIL import Image
+
+from blend_engine import NumpyBlendEngine, PILBlendEngine, compare_blend_engines, create_blend_engine
+
+
+def random_image(seed, size=(37, 23)):
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 256, size=(size[1], size[0], 4), dtype=np.uint8)
+    return Image.fromarray(pixels, 'RGBA')
+
+
+def test_numpy_engine_matches_pil_at_every_alpha():
+    alphas = [step / 1000 for step in range(1001)] + [1 / 3, 2 / 3, 0.999999, 1e-6]
+    for seed, rgb_constant in enumerate([(0, 0, 0, 255), (128, 128, 128, 255), (255, 255, 255, 255),
+                                         (17, 200, 93, 0)]):
+        assert compare_blend_engines(random_image(seed), rgb_constant, alphas) == 0
+
+
+def test_prepared_stimuli_blend_like_pil():
+    rgb_constant = (128, 128, 128, 255)
+    pil_engine, numpy_engine = PILBlendEngine(rgb_constant), NumpyBlendEngine(rgb_constant, max_prepared=2)
+    images = {f'stim_{seed}': random_image(seed) for seed in range(4)}
+    for key, image in list(images.items()) * 2:  # Evicted keys are prepared again
+        numpy_engine.prepare(key, image)
+        for alpha in (0.0, 0.25, 0.5, 0.75, 1.0):
+            expected = np.asarray(pil_engine.blend(key, image, alpha))
+            assert np.array_equal(np.asarray(numpy_engine.blend(key, image, alpha)), expected)
+    assert len(numpy_engine._prepared) == 2
+
+
+def test_unknown_engine_falls_back_to_pil():
+    assert create_blend_engine('numpy', (0, 0, 0, 255)).name == 'numpy'
+    assert create_blend_engine('opencl', (0, 0, 0, 255)).name == 'pil'
@@ -0,0 +1,43 @@
+import json
+import os
+
+from config_file import ADVANCED_SETTINGS
+from config_service import ConfigService, Setting
+
+README = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'README.md')
+
+
+def test_settings_cast_values_and_fall_back_to_defaults(workdir):
+    service = ConfigService('config.json')
+    assert service.blend_duration == 10000 and service.session_store is True
+    service.replace({'blend_duration': '2500', 'mask_cycle_time': 'fast', 'schedule_seed': None})
+    assert service.blend_duration == 2500
+    assert service.mask_cycle_time == 100  # Unparsable: the default
+    assert service.schedule_seed is None
+
+
+def test_file_is_reparsed_only_when_it_changes(workdir):
+    service = ConfigService('config.json')
+    service.replace({'trials_total': 5})
+    reloads = service.reload_count
+    assert service.trials_total == 5 and service.trials_total == 5
+    assert service.reload_count == reloads + 1  # One parse, then only stat() calls
+
+    with open('config.json', 'w') as config_file:
+        json.dump({'trials_total': 120}, config_file)  # Written by something else, e.g. the config window
+    assert service.trials_total == 120
+
+
+def test_advanced_settings_come_from_the_service_declarations():
+    declared = [setting.key for setting in ConfigService.settings()]
+    assert len(declared) == len(set(declared))
+    assert ADVANCED_SETTINGS == tuple(setting.key for setting in ConfigService.settings() if setting.advanced)
+    # Settings the window has widgets for are never copied over from the old file
+    assert not {'trials_total', 'blend_duration', 'mask_dir', 'participant_id'} & set(ADVANCED_SETTINGS)
+    assert all(isinstance(vars(ConfigService)[key], Setting) for key in declared)
+
+
+def test_every_advanced_setting_is_documented():
+    with open(README) as readme:
+        text = readme.read()
+    assert [key for key in ADVANCED_SETTINGS if f'"{key}"' not in text] == []
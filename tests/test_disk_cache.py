@@ -0,0 +1,64 @@
+import os
+
+import pytest
+from PIL import Image
+
+from disk_cache import HEADER, DecodedImageCache
+
+
+def decode(path, resize_dims):
+    image = Image.open(path).convert('RGBA')
+    return image.resize(resize_dims) if resize_dims else image
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'source.png'
+    Image.new('RGB', (16, 12), (10, 200, 30)).save(path)
+    return str(path)
+
+
+def test_warm_load_matches_decode_and_index_persists(tmp_path, source):
+    cache = DecodedImageCache(str(tmp_path / 'cache'))
+    cold = cache.load(source, (8, 6), decode)
+    assert (cache.hits, cache.misses) == (0, 1)
+    cache.flush()
+
+    reopened = DecodedImageCache(str(tmp_path / 'cache'))
+    for zero_copy in (False, True):
+        warm = reopened.load(source, (8, 6), decode, zero_copy=zero_copy)
+        assert warm.size == (8, 6) and warm.tobytes() == cold.tobytes()
+    assert (reopened.hits, reopened.misses) == (2, 0)
+
+
+@pytest.mark.parametrize('contents', [b'', b'\x01\x00', HEADER.pack(8, 6) + b'\x00' * 10])
+def test_empty_truncated_and_short_entries_are_misses(tmp_path, source, contents):
+    cache = DecodedImageCache(str(tmp_path / 'cache'))
+    entry = cache.entry_path(cache.digest(source), (8, 6))
+    with open(entry, 'wb') as raw:
+        raw.write(contents)
+
+    assert cache.lookup(source, (8, 6)) is None
+    # A miss re-decodes and rewrites the entry, which then reads back
+    cache.load(source, (8, 6), decode)
+    assert cache.lookup(source, (8, 6)).size == (8, 6)
+
+
+def test_unreadable_entry_is_a_miss(tmp_path, source):
+    cache = DecodedImageCache(str(tmp_path / 'cache'))
+    os.makedirs(cache.entry_path(cache.digest(source), (8, 6)))  # open() raises IsADirectoryError
+    assert cache.lookup(source, (8, 6)) is None
+    assert cache.misses == 1
+
+
+@pytest.mark.skipif(not os.path.isdir('/proc/self/fd'), reason='needs /proc to count descriptors')
+def test_copied_reads_do_not_hold_descriptors(tmp_path, source):
+    cache = DecodedImageCache(str(tmp_path / 'cache'))
+    cache.load(source, (8, 6), decode)
+    before = len(os.listdir('/proc/self/fd'))
+    images = [cache.lookup(source, (8, 6)) for _ in range(200)]
+    assert len(os.listdir('/proc/self/fd')) - before < 5
+
+    mapped = [cache.lookup(source, (8, 6), zero_copy=True) for _ in range(20)]
+    assert len(os.listdir('/proc/self/fd')) - before >= 20
+    assert len(images) == 200 and len(mapped) == 20
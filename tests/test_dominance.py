@@ -0,0 +1,110 @@
+import csv
+import os
+import random
+import shutil
+
+import numpy as np
+import pytest
+
+import dominance
+from display_file import calculate_dominance_from_practice, calculate_dominance_from_practice_data
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'practice_trial_data.csv')
+
+
+def baseline_from_practice_file(path):
+    """The file-based dominance calculation as it was before dominance.py, without its prints"""
+    with open(path, newline='') as file:
+        rows = list(csv.DictReader(file))
+    left_trials = [row for row in rows if row['Suppressor Position'] == 'left']
+    right_trials = [row for row in rows if row['Suppressor Position'] == 'right']
+    if len(left_trials) < 2 or len(right_trials) < 2:
+        return None
+    left_rts = [float(row['Reaction Time']) for row in left_trials[1:]
+                if row.get('Reaction Time') and row.get('Accuracy') == '1']
+    right_rts = [float(row['Reaction Time']) for row in right_trials[1:]
+                 if row.get('Reaction Time') and row.get('Accuracy') == '1']
+    left_avg = sum(left_rts) / len(left_rts) if left_rts else 0
+    right_avg = sum(right_rts) / len(right_rts) if right_rts else 0
+    return 'right' if left_avg > right_avg else 'left'
+
+
+def write_rows(path, rows):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_practice_file_matches_the_baseline_calculation(workdir):
+    shutil.copy(FIXTURE, 'practice_trial_data.csv')
+    # The first left row is an ITI row, so the slow first left trial still counts: left is slower
+    assert baseline_from_practice_file('practice_trial_data.csv') == 'right'
+    assert calculate_dominance_from_practice() == 'right'
+
+
+def test_random_practice_files_match_the_baseline_calculation(workdir):
+    rng = random.Random(11)
+    for _ in range(200):
+        rows = []
+        for number in range(rng.randint(0, 12)):
+            side = rng.choice(['left', 'right'])
+            if rng.random() < 0.5:
+                rows.append({'Trial Number': number, 'Trial Type': 'ITI', 'Reaction Time': rng.choice(['N/A', '300.0']),
+                             'Suppressor Position': side, 'Accuracy': 'N/A'})
+            rows.append({'Trial Number': number, 'Trial Type': 'Practice',
+                         'Reaction Time': rng.choice(['', f'{rng.uniform(300, 3000):.1f}']),
+                         'Suppressor Position': side, 'Accuracy': rng.choice(['1', '1', '0'])})
+        if not rows:
+            continue
+        write_rows('practice_trial_data.csv', rows)
+        assert calculate_dominance_from_practice() == baseline_from_practice_file('practice_trial_data.csv')
+
+
+def test_in_memory_practice_data_skips_iti_rows(workdir):
+    with open(FIXTURE, newline='') as file:
+        rows = list(csv.DictReader(file))
+    for row in rows:
+        row['Accuracy'] = int(row['Accuracy']) if row['Accuracy'] in ('0', '1') else row['Accuracy']
+    # Practice rows only: the slow first left trial is the one skipped
+    assert calculate_dominance_from_practice_data(rows) == 'left'
+
+
+def reference_statistics(rts, trim):
+    rts = sorted(rts)
+    cut = int(np.floor(trim * len(rts)))
+    return np.mean(rts), np.median(rts), np.mean(rts[cut:len(rts) - cut])
+
+
+@pytest.mark.parametrize('exclude_first', [None, 'side', 'block'])
+def test_analyze_matches_a_per_participant_reference(exclude_first):
+    rng = random.Random(5)
+    records = []
+    for participant in range(6):
+        for session in range(2):
+            for _ in range(rng.randint(4, 30)):
+                records.append((f'p{participant}', (participant, session), 'Practice',
+                                rng.choice(['left', 'right']), rng.uniform(300, 3000), rng.choice([1, 1, 1, 0])))
+    table = dominance.TrialTable.from_records(records)
+    result = dominance.analyze(table, exclude_first=exclude_first, trim=0.2)
+
+    for index, participant in enumerate(table.participants):
+        mine = [record for record in records if record[0] == participant]
+        for side_index, side in enumerate(dominance.SIDES):
+            kept = []
+            for session in {record[1] for record in mine}:
+                rows = [record for record in mine if record[1] == session]
+                for position, record in enumerate(rows):
+                    if record[3] != side or record[5] != 1:
+                        continue
+                    if exclude_first == 'side' and record is next(r for r in rows if r[3] == side):
+                        continue
+                    if exclude_first == 'block' and (position == 0 or rows[position - 1][3] != side):
+                        continue
+                    kept.append(record[4])
+            assert result.used[index, side_index] == len(kept)
+            if kept:
+                expected = reference_statistics(kept, 0.2)
+                actual = (result.mean[index, side_index], result.median[index, side_index],
+                          result.trimmed_mean[index, side_index])
+                assert np.allclose(actual, expected)
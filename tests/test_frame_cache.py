@@ -0,0 +1,60 @@
+import pytest
+
+from frame_cache import AlphaRamp, FrameCache, alpha_at, alpha_ramp
+
+
+def test_ramp_ends_exactly_at_the_blend_duration():
+    ramp = alpha_ramp(1000, 16)
+    assert len(ramp) == 64  # ceil(1000 / 16) frame deadlines after the first
+    assert ramp[0] == 0.0 and ramp[-1] == pytest.approx(0.99)
+    assert ramp == sorted(ramp)
+    reverse = alpha_ramp(1000, 16, alpha_reverse=True)
+    assert reverse[0] == pytest.approx(0.99) and reverse[-1] == 0.0
+    assert alpha_at(-5, 1000) == 0.0 and alpha_at(5000, 1000) == pytest.approx(0.99)
+
+
+def test_frames_render_ahead_or_on_demand():
+    rendered = []
+    ramp = AlphaRamp((4, 4), [0.0, 0.5, 0.99], blend_frame=lambda alpha: rendered.append(alpha) or alpha,
+                     make_photo=lambda image: ('photo', image))
+    assert ramp.frame(2) == ('photo', 0.99)  # Needed before pre-rendering reached it
+    assert not ramp.render_next(2)
+    assert ramp.render_next(2) and ramp.complete
+    assert rendered == [0.99, 0.0, 0.5]  # Frame 2 was not rendered twice
+
+
+def test_cache_evicts_least_recently_used_ramps_within_budget():
+    size = (10, 10)
+    ramp_bytes = FrameCache.frame_bytes(size) * 3
+    cache = FrameCache(max_bytes=ramp_bytes * 2)
+    prepare = lambda key: cache.prepare(key, size, [0.0, 0.5, 0.99], blend_frame=lambda alpha: alpha,
+                                        make_photo=lambda image: image)
+    first, second = prepare('a'), prepare('b')
+    assert prepare('a') is first  # Cache hit, and 'a' becomes the most recently used
+    prepare('c')
+    assert cache.get('b') is None and cache.get('a') is first and cache.get('c') is not None
+    assert cache.current_bytes == ramp_bytes * 2
+    assert cache.prepare('huge', (1000, 1000), [0.0], lambda alpha: alpha, lambda image: image) is None
+    assert len(cache) == 2
+
+
+def test_keys_separate_every_rendering_parameter():
+    base = FrameCache.make_key('stim.png', [20, 30], (128, 128, 128, 255), False, 5000, 50)
+    assert base == FrameCache.make_key('stim.png', (20, 30), [128, 128, 128, 255], 0, 5000, 50)
+    assert base != FrameCache.make_key('stim.png', (20, 30), (128, 128, 128, 255), True, 5000, 50)
+    assert base != FrameCache.make_key('stim.png', (20, 30), (128, 128, 128, 255), False, 5000, 50,
+                                       backend='headless')
+    # Same number of frames, different alphas
+    assert len(alpha_ramp(4995, 50)) == len(alpha_ramp(5000, 50))
+    assert base != FrameCache.make_key('stim.png', (20, 30), (128, 128, 128, 255), False, 4995, 50)
+
+
+def test_a_new_blend_duration_misses_ramps_of_the_same_length(make_modules):
+    # The shared cache outlives a session; the next one may change the duration in the config window
+    _, _, stim = make_modules(blend_duration=5000)
+    before = stim.get_ramp(0)
+    _, _, stim = make_modules(blend_duration=4995)
+    after = stim.get_ramp(0)
+    assert after is not before and len(after) == len(before)
+    assert after.alphas == alpha_ramp(4995, stim.update_interval)
+    assert stim.get_ramp(0) is after
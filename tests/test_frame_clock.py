@@ -0,0 +1,56 @@
+import pytest
+
+from frame_clock import FrameClock
+from render_backend import HeadlessRoot
+
+
+@pytest.fixture
+def root():
+    root = HeadlessRoot()
+    yield root
+    root.destroy()
+
+
+def test_frames_run_on_their_deadlines(root):
+    ticks = []
+    clock = FrameClock(root, 10, lambda index, elapsed_ms: ticks.append((index, elapsed_ms)))
+    clock.start()
+    root.run_for(95)
+    assert ticks == [(index, index * 10.0) for index in range(10)]
+    assert clock.dropped_frames == 0
+
+
+def test_fractional_intervals_do_not_drift(root):
+    ticks = []
+    clock = FrameClock(root, 1000 / 60, lambda index, elapsed_ms: ticks.append((index, elapsed_ms)))
+    clock.start()
+    root.run_for(1000)
+    assert [index for index, _ in ticks] == list(range(len(ticks)))
+    # Ticks wake at whole milliseconds, never before their deadline and never a full ms after it
+    assert all(0 <= elapsed_ms - index * 1000 / 60 < 1 for index, elapsed_ms in ticks)
+    assert ticks[-1][0] >= 59
+
+
+def test_late_ticks_skip_missed_frames(root):
+    ticks = []
+
+    def on_frame(index, elapsed_ms):
+        ticks.append(index)
+        if index == 3:
+            root.time_ns += 35_000_000  # The frame took 35 ms, e.g. a stalled Tk loop
+
+    clock = FrameClock(root, 10, on_frame)
+    clock.start()
+    root.run_for(100)
+    assert ticks[:6] == [0, 1, 2, 3, 6, 7]  # Frames 4 and 5 were due during the stall
+    assert clock.dropped_frames == 2
+
+
+def test_stop_cancels_the_pending_tick(root):
+    ticks = []
+    clock = FrameClock(root, 10, lambda index, elapsed_ms: ticks.append(index))
+    clock.start()
+    root.run_for(25)
+    clock.stop()
+    root.run_for(100)
+    assert ticks == [0, 1, 2] and clock.after_id is None
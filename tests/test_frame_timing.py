@@ -0,0 +1,79 @@
+import csv
+
+import pytest
+
+import frame_timing
+from frame_clock import FrameClock
+from frame_timing import FrameTimingRecorder
+from render_backend import HeadlessRoot
+
+MS = 1_000_000
+
+
+def feed(recorder, source, frames, interval_ms, jitter_ms, render_ms=1.0):
+    """Record `frames` (frame indices) with the given lateness, each due at index * interval"""
+    for frame, late_ms in zip(frames, jitter_ms):
+        deadline = frame * interval_ms * MS
+        recorder.record(source, frame, deadline, deadline + int(late_ms * MS), int(render_ms * MS))
+
+
+def test_summary_rows(workdir):
+    recorder = FrameTimingRecorder()
+    feed(recorder, 'mask', range(5), 100, [0] * 5)  # Outside a trial: not recorded
+    recorder.begin_trial(1)
+    frames = [index for index in range(22) if index not in (4, 5)]  # Two mask flips skipped
+    feed(recorder, 'mask', frames, 100, range(20), render_ms=2.0)
+    feed(recorder, 'stim', range(3), 50, [1.5, 0.5, 1.0])
+    recorder.end_trial()
+    recorder.begin_trial(2)
+    feed(recorder, 'stim', [0], 50, [4.0], render_ms=3.0)
+    recorder.export_summary('frame_timing_summary.csv', 'p1')  # Ends trial 2
+
+    with open('frame_timing_summary.csv', newline='') as summary_file:
+        rows = list(csv.DictReader(summary_file))
+    assert rows == [
+        {'Participant ID': 'p1', 'Trial Number': '1', 'Source': 'mask', 'Frames': '20', 'Dropped Frames': '2',
+         'Mean Jitter (ms)': '9.5', 'P95 Jitter (ms)': '18.0', 'Max Jitter (ms)': '19.0',
+         # 21 flips over 2100 ms of deadlines, plus 19 ms of added lateness, over 19 intervals
+         'Mean Interval (ms)': str(round((2100 + 19) / 19, 3)), 'Mean Render (ms)': '2.0',
+         'Max Render (ms)': '2.0'},
+        {'Participant ID': 'p1', 'Trial Number': '1', 'Source': 'stim', 'Frames': '3', 'Dropped Frames': '0',
+         'Mean Jitter (ms)': '1.0', 'P95 Jitter (ms)': '1.5', 'Max Jitter (ms)': '1.5',
+         'Mean Interval (ms)': '49.75', 'Mean Render (ms)': '1.0', 'Max Render (ms)': '1.0'},
+        {'Participant ID': 'p1', 'Trial Number': '2', 'Source': 'stim', 'Frames': '1', 'Dropped Frames': '0',
+         'Mean Jitter (ms)': '4.0', 'P95 Jitter (ms)': '4.0', 'Max Jitter (ms)': '4.0',
+         'Mean Interval (ms)': 'N/A', 'Mean Render (ms)': '3.0', 'Max Render (ms)': '3.0'},
+    ]
+
+
+def test_ring_buffer_keeps_the_latest_samples():
+    recorder = FrameTimingRecorder(capacity=8)
+    recorder.begin_trial(1)
+    feed(recorder, 'mask', range(6), 10, [0] * 6)
+    recorder.begin_trial(2)  # Ends trial 1
+    feed(recorder, 'mask', range(12), 10, range(12))  # Wraps: only frames 4-11 are still held
+    recorder.end_trial()
+
+    first, second = recorder.summaries
+    assert first['Frames'] == 6 and first['Max Jitter (ms)'] == 0
+    assert second['Frames'] == 8 and second['Dropped Frames'] == 0
+    assert second['Mean Jitter (ms)'] == pytest.approx(7.5) and second['Max Jitter (ms)'] == 11
+    assert recorder.count == 18
+
+
+def test_frame_clock_feeds_the_session_recorder():
+    root = HeadlessRoot()
+    try:
+        recorder = frame_timing.configure({'record_frame_timing': True})
+        clock = FrameClock(root, 10, lambda index, elapsed_ms: None, source='mask')
+        frame_timing.begin_trial(0)
+        clock.start()
+        root.run_for(95)
+        clock.stop()
+        frame_timing.end_trial()
+        summary, = recorder.summaries
+        assert summary['Frames'] == 10 and summary['Dropped Frames'] == 0
+        assert summary['Max Jitter (ms)'] == 0 and summary['Mean Interval (ms)'] == 10
+    finally:
+        frame_timing.configure({})
+        root.destroy()
@@ -0,0 +1,33 @@
+import pytest
+
+from asset_loader import LazyImageList
+from mask_ring import MaskRing
+from render_backend import OFFSCREEN_BACKEND
+
+
+def test_flips_reuse_the_prebuilt_photos_and_item(make_modules, monkeypatch):
+    root, mask, stim = make_modules(lazy_image_loading=True, mask_cycle_time=10)
+    assert mask.asset_loader is None and mask.prefetcher is None  # Masks are never lazily loaded
+    assert stim.asset_loader is not None
+    item, items = mask.layers.get('mask'), list(mask.canvas.stack)
+    photos = [id(photo) for photo in mask.images]
+
+    created = []
+    monkeypatch.setattr(OFFSCREEN_BACKEND, 'make_photo', lambda image: created.append(image) or image)
+    shown = []
+    flip = mask.mask_ring.flip
+    monkeypatch.setattr(mask.mask_ring, 'flip', lambda index: flip(index) or shown.append(
+        id(mask.canvas.items[item]['options']['image'])))
+    mask.start_trial()
+    root.run_for(10 * 50)
+
+    assert len(shown) >= 50
+    assert created == []
+    assert set(shown) <= set(photos) and len(set(shown)) == len(photos)
+    assert mask.layers.get('mask') == item and mask.canvas.stack == items
+
+
+def test_ring_refuses_lazily_loaded_frames(make_modules):
+    root, mask, stim = make_modules(lazy_image_loading=True)
+    with pytest.raises(TypeError):
+        MaskRing(stim.canvas, stim.layers.get('fixation'), LazyImageList(stim.asset_loader))
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from mondrian import DEFAULT_PALETTE, MondrianGenerator, generate_sequence, params_from_config
+
+SMALL = dict(width=64, height=48, rect_count=40, min_size=4, max_size=24)
+
+
+def test_frames_depend_only_on_parameters_seed_and_index():
+    first, again = MondrianGenerator(seed=7, **SMALL), MondrianGenerator(seed=7, **SMALL)
+    assert np.array_equal(first.frame_array(3), again.frame_array(3))
+    assert np.array_equal(first.frame_array(3), first.frame_array(3))
+    assert not np.array_equal(first.frame_array(3), first.frame_array(4))
+    assert not np.array_equal(first.frame_array(3), MondrianGenerator(seed=8, **SMALL).frame_array(3))
+
+
+@pytest.mark.parametrize('distribution', ['uniform', 'powerlaw'])
+def test_frames_use_only_palette_colours(distribution):
+    palette = ('#ff0000', '#0000ff')
+    frame = MondrianGenerator(seed=1, size_distribution=distribution, palette=palette, **SMALL).frame_array(0)
+    assert frame.shape == (48, 64, 4) and frame.dtype == np.uint8
+    assert {tuple(pixel) for pixel in frame.reshape(-1, 4)} <= {(255, 0, 0, 255), (0, 0, 255, 255)}
+
+
+def test_sequences_are_reused_per_seed():
+    first = generate_sequence(3, seed=5, **SMALL)
+    assert generate_sequence(3, seed=5, **SMALL) is first
+    other = generate_sequence(3, seed=6, **SMALL)
+    assert other is not first and other[0].tobytes() != first[0].tobytes()
+
+
+def test_config_keys_map_to_generator_arguments():
+    params = params_from_config({'mondrian_seed': '12', 'mondrian_rect_count': 10, 'mondrian_palette': []})
+    assert params['seed'] == 12 and params['rect_count'] == 10 and params['palette'] == DEFAULT_PALETTE
+    assert MondrianGenerator(**params).key == MondrianGenerator(**params).key
+    with pytest.raises(ValueError):
+        MondrianGenerator(size_distribution='gaussian')
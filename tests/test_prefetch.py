@@ -0,0 +1,82 @@
+import threading
+import time
+
+import pytest
+
+import disk_cache
+import prefetch
+from asset_loader import AssetLoader
+from prefetch import Prefetcher
+from render_backend import HeadlessRoot
+
+
+def run_until_idle(root, prefetcher, timeout_s=5):
+    """Advance virtual time poll by poll until the worker's results have all been drained"""
+    deadline = time.monotonic() + timeout_s
+    while prefetcher.pending or prefetcher.poll_after_id:
+        assert time.monotonic() < deadline, "prefetch did not finish"
+        time.sleep(0.001)  # Let the worker thread run; virtual time does not move on its own
+        root.run_for(prefetcher.poll_ms)
+
+
+@pytest.fixture
+def root(monkeypatch):
+    monkeypatch.setattr(disk_cache, 'cache', None)
+    root = HeadlessRoot()
+    yield root
+    root.destroy()
+
+
+def test_photos_are_built_on_the_tk_thread(root, image_dirs):
+    main_thread = threading.get_ident()
+    photo_threads = []
+    loader = AssetLoader([f'{image_dirs[1]}/s{index}.png' for index in range(5)],
+                         make_photo=lambda image: photo_threads.append(threading.get_ident()) or image)
+    prefetcher = Prefetcher(root)
+    ready = []
+    prefetcher.request(loader, [1, 2], make_photo=True, on_ready=ready.append)
+    assert prefetcher.poll_after_id is not None  # Results are collected by an after() poll
+    run_until_idle(root, prefetcher)
+
+    assert sorted(ready) == [1, 2] and loader.is_cached(1) and loader.is_cached(2)
+    assert photo_threads == [main_thread, main_thread]
+    assert loader.stats()['misses'] == 0  # Stored, not looked up
+
+    prefetcher.request(loader, [2], on_ready=ready.append)  # Already cached: straight to on_ready
+    assert ready[-1] == 2 and prefetcher.poll_after_id is None
+    prefetcher.shutdown()
+
+
+def test_next_stimulus_is_resident_before_its_trial(make_modules, monkeypatch):
+    monkeypatch.setattr(disk_cache, 'cache', None)
+    root, mask, stim = make_modules(lazy_image_loading=True, prefetch_depth=2)
+    stim.asset_loader.clear()
+    stim.prerender_next_stimulus()
+    upcoming = stim.upcoming_images(2)
+    run_until_idle(root, stim.prefetcher)
+    root.run_for(50)  # Idle-time prerendering of the ramp
+    assert all(stim.asset_loader.is_cached(index) for index in upcoming)
+    assert stim.get_ramp(upcoming[0]).complete
+
+    misses = stim.asset_loader.misses
+    stim.start_trial()
+    assert stim.current_image_index == upcoming[0]
+    assert stim.asset_loader.misses == misses  # Nothing decoded on the Tk thread
+
+
+def test_shutdown_drops_pending_work(root, image_dirs, monkeypatch):
+    release = threading.Event()
+    decode = prefetch.decode_image
+    monkeypatch.setattr(prefetch, 'decode_image', lambda *args, **kwargs: release.wait(5) and decode(*args, **kwargs))
+    loader = AssetLoader([f'{image_dirs[1]}/s{index}.png' for index in range(5)], make_photo=lambda image: image)
+    prefetcher = Prefetcher(root)
+    ready = []
+    prefetcher.request(loader, [0, 1, 2], on_ready=ready.append)
+
+    prefetcher.shutdown()  # Returns without waiting for the decode in progress
+    assert prefetcher.poll_after_id is None and not prefetcher.pending
+    release.set()
+    prefetcher.executor.shutdown(wait=True)
+    root.run_for(100)
+    prefetcher.request(loader, [3], on_ready=ready.append)
+    assert ready == [] and len(loader._entries) == 0 and not root._timers
@@ -0,0 +1,80 @@
+import numpy as np
+from PIL import Image
+
+from render_backend import OffscreenCanvas
+
+BORDER = 60
+GREY = (128, 128, 128)  # canvas_bg_color '#808080'
+
+
+def pixels(image):
+    return np.asarray(image, dtype=np.int16)
+
+
+def assert_fixation_drawn(frame, module):
+    """The '+' is drawn, whiter than what it covers, around the content centre and above every other layer"""
+    module.layers.hide('fixation')
+    underneath = pixels(module.canvas.render())
+    module.layers.show('fixation')
+    changed = (pixels(frame) != underneath).any(axis=2)
+    rows, columns = np.nonzero(changed)
+    center_x, center_y = BORDER + module.canvas_width // 2, BORDER + module.canvas_height // 2
+    assert changed[center_y, center_x]
+    assert np.abs(rows - center_y).max() <= 10 and np.abs(columns - center_x).max() <= 10
+    assert changed[:, center_x].sum() >= 6 and changed[center_y, :].sum() >= 6  # Both strokes
+    assert (pixels(frame)[changed] >= underneath[changed]).all()
+
+
+def test_rectangles_are_outlined_like_tk():
+    canvas = OffscreenCanvas(30, 30, bg='white')
+    canvas.create_rectangle(5, 5, 15, 15, fill='red')
+    canvas.create_rectangle(18, 18, 25, 25, fill='blue', outline='')
+    frame = canvas.render()
+    assert frame.getpixel((5, 5)) == (0, 0, 0) and frame.getpixel((15, 15)) == (0, 0, 0)
+    assert frame.getpixel((10, 10)) == (255, 0, 0)
+    assert frame.getpixel((18, 18)) == (0, 0, 255) and frame.getpixel((24, 24)) == (0, 0, 255)
+    assert frame.getpixel((25, 25)) == (255, 255, 255)
+
+
+def test_stimulus_mid_blend(make_modules):
+    root, mask, stim = make_modules(blend_duration=500)
+    root.run_for(200)
+    stim.start_trial()
+    root.run_for(250)
+    assert 0 < stim.alpha < 0.99
+    frame = stim.canvas.render()
+
+    # Checkerboard border, content area, and the '+' above the stimulus and background
+    assert frame.getpixel((0, 0)) == (255, 255, 255) and frame.getpixel((20, 0)) == (0, 0, 0)
+    assert frame.getpixel((BORDER + 5, BORDER + 5)) == GREY
+    assert_fixation_drawn(frame, stim)
+
+    # The stimulus, blended against the background at the current alpha, over the grey content area
+    center_x, top = stim.canvas.coords(stim.layers.get('stimulus'))
+    width, height = stim.resize_dims
+    left, top = int(center_x - width / 2), int(top)
+    red, green, blue = Image.open(stim.image_path).convert('RGB').getpixel((0, 0))
+    blended = Image.blend(Image.new('RGBA', (1, 1), stim.RGB_CONSTANT),
+                          Image.new('RGBA', (1, 1), (red, green, blue, 255)), stim.alpha).getpixel((0, 0))
+    coverage = blended[3] / 255
+    expected = [channel * coverage + grey * (1 - coverage) for channel, grey in zip(blended[:3], GREY)]
+    for x, y in ((left + 2, top + 2), (left + width - 3, top + height - 3)):
+        assert np.abs(pixels(frame)[y, x] - expected).max() <= 1
+    assert frame.getpixel((left - 2, top + 2)) == GREY
+
+
+def test_mask_is_stacked_between_the_content_area_and_the_fixation(make_modules):
+    root, mask, stim = make_modules()
+    root.run_for(200)
+    assert mask.canvas.render().getpixel((BORDER + 5, BORDER + 5)) == GREY  # Hidden until the trial starts
+
+    mask.start_trial()
+    root.run_for(150)
+    frame = mask.canvas.render()
+    shown = mask.canvas.items[mask.layers.get('mask')]['options']['image']
+    assert frame.getpixel((BORDER + 5, BORDER + 5)) == shown.getpixel((5, 5))[:3]
+    assert frame.getpixel((BORDER - 1, BORDER - 1)) in ((0, 0, 0), (255, 255, 255))  # Border still outside
+    assert frame.getpixel((BORDER + 310, BORDER + 390)) == shown.getpixel((310, 390))[:3]  # Next to the '+'
+    assert_fixation_drawn(frame, mask)
+    order = [mask.canvas.stack.index(mask.layers.get(name)) for name in ('content_area', 'mask', 'fixation')]
+    assert order == sorted(order)
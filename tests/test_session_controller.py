@@ -0,0 +1,63 @@
+import pytest
+
+from render_backend import HeadlessRoot
+from session_controller import SessionController
+
+
+@pytest.fixture
+def controller():
+    events = []
+
+    def run_task(controller, config):
+        events.append(('build', controller.state))
+        controller.modules = ['mask', 'stim']
+        return lambda: events.append(('teardown', controller.state))
+
+    root = HeadlessRoot()
+    controller = SessionController(root, run_task)
+    controller.events = events
+    yield controller
+    root.destroy()
+
+
+def test_practice_transition_main_and_back_to_config(controller):
+    controller.start_task({'is_practice': True})
+    assert controller.state == controller.PRACTICE and controller.modules == ['mask', 'stim']
+    assert controller.root.session_controller is controller
+
+    controller.begin_transition()
+    assert controller.in_transition
+    controller.end_transition()
+    assert controller.state == controller.MAIN and not controller.in_transition
+
+    controller.show_config()  # Headless: the task is torn down and nothing else is built
+    assert controller.state == controller.CONFIG and controller.modules == []
+    controller.start_task({'is_practice': False})
+    assert controller.state == controller.MAIN
+    assert controller.events == [('build', 'practice'), ('teardown', 'main'), ('build', 'main')]
+
+
+@pytest.mark.parametrize('steps', [
+    ['begin_transition'],                           # Nothing is running yet
+    ['start_main', 'begin_transition'],             # The main task has no transition
+    ['start_practice', 'end_transition'],           # Main starts only after the transition
+])
+def test_invalid_transitions_are_refused(controller, steps):
+    actions = {'start_main': lambda: controller.start_task({'is_practice': False}),
+               'start_practice': lambda: controller.start_task({'is_practice': True}),
+               'begin_transition': controller.begin_transition,
+               'end_transition': controller.end_transition}
+    for step in steps[:-1]:
+        actions[step]()
+    state = controller.state
+    with pytest.raises(ValueError, match='Invalid session transition'):
+        actions[steps[-1]]()
+    assert controller.state == state
+
+
+def test_quit_tears_down_the_task_once(controller):
+    controller.start_task({'is_practice': False})
+    controller.quit()
+    controller.end_task()
+    assert controller.events == [('build', 'main'), ('teardown', 'main')]
+    assert not controller.root.open
@@ -0,0 +1,39 @@
+import glob
+
+import session_log
+from render_backend import HeadlessRoot
+
+
+def read_log(path='session.log'):
+    with open(path, encoding='utf-8') as log_file:
+        return log_file.read().splitlines()
+
+
+def test_records_reach_the_file_with_their_monotonic_stamp(workdir):
+    root = HeadlessRoot(start_ns=1_234_500_000)
+    try:
+        session_log.configure({'log_file': 'session.log', 'log_console': False, 'log_level': 'INFO'})
+        log = session_log.get_logger('test')
+        log.info("Trial %s started", 3)
+        log.debug("Not at INFO level")
+        root.run_for(500)  # The stamp is taken when the record is logged, not when it is written
+        log.warning("Late by %.1f ms", 2.5)
+        session_log.shutdown()
+    finally:
+        root.destroy()
+
+    lines = read_log()
+    assert len(lines) == 2
+    first, second = (line.split(maxsplit=4) for line in lines)
+    assert first[2:] == ['1234.500', 'INFO', 'flash_suppression.test: Trial 3 started']
+    assert second[2:] == ['1734.500', 'WARNING', 'flash_suppression.test: Late by 2.5 ms']
+
+
+def test_log_file_rotates(workdir):
+    session_log.configure({'log_file': 'session.log', 'log_console': False, 'log_max_kb': 1, 'log_backups': 2})
+    log = session_log.get_logger('test')
+    for index in range(100):
+        log.info("Line %s %s", index, 'x' * 40)
+    session_log.shutdown()
+    assert sorted(glob.glob('session.log*')) == ['session.log', 'session.log.1', 'session.log.2']
+    assert read_log()[-1].endswith('Line 99 ' + 'x' * 40)
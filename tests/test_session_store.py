@@ -0,0 +1,57 @@
+import csv
+
+from session_store import SessionStore
+from trial_log import TRIAL_FIELDNAMES
+
+
+def trial_row(number, trial_type, side, reaction_time=1234.5, accuracy=1):
+    return {'Trial Number': number, 'Trial Type': trial_type, 'Y Position': 50, 'Stimulus Position': 'top',
+            'Image Path': f'stim_dir/stim_{number}.png', 'Reaction Time': reaction_time, 'Response': 'a',
+            'Suppressor Position': side, 'Accuracy': accuracy}
+
+
+def iti_row(number, side):
+    return {'Trial Number': number, 'Trial Type': 'ITI', 'Y Position': 'N/A', 'Stimulus Position': 'N/A',
+            'Image Path': 'Press space to continue', 'Reaction Time': 'N/A', 'Response': 'space',
+            'Suppressor Position': side, 'Accuracy': 'N/A'}
+
+
+SESSION_ROWS = [trial_row(0, 'Practice', 'left'), iti_row(1, 'left'), trial_row(1, 'Practice', 'right', 987.25, 0),
+                trial_row(2, 'Main', 'right'), iti_row(3, 'right'), trial_row(3, 'Main', 'left', 'N/A', 0)]
+
+
+def test_export_matches_the_trial_data_csv_layout(workdir):
+    store = SessionStore('session_data.db', batch_size=4)
+    store.begin_session('P7', {'blend_duration': 10000})
+    for row in SESSION_ROWS:
+        store.add_row(row)
+    store.export_csv('exported.csv')
+    store.close()
+
+    with open('expected.csv', 'w', newline='') as file:  # As write_trial_data_to_csv writes them
+        writer = csv.DictWriter(file, fieldnames=TRIAL_FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(dict(row, **{'Participant ID': 'P7'}) for row in SESSION_ROWS)
+    with open('exported.csv') as exported, open('expected.csv') as expected:
+        assert exported.read() == expected.read()
+
+
+def test_queries_span_sessions_and_participants(workdir):
+    store = SessionStore('session_data.db', batch_size=50)
+    first = store.begin_session('P1')
+    for row in SESSION_ROWS:
+        store.add_row(row)
+    second = store.begin_session('P2')  # Ends the first session, flushing its rows
+    store.add_row(trial_row(0, 'Main', 'left'))
+
+    assert len(store.trials()) == 5  # Pending rows are flushed before querying; ITI rows are kept apart
+    assert [row['trial_number'] for row in store.trials(participant_id='P1', trial_type='Main')] == [2, 3]
+    assert [row['session_id'] for row in store.trials(suppressor_position='left')] == [first, first, second]
+    assert store.trials(participant_id='P1', trial_type='Main')[1]['reaction_time'] is None
+    ended = store.connection.execute('SELECT ended_at FROM sessions ORDER BY session_id').fetchall()
+    assert ended[0]['ended_at'] is not None and ended[1]['ended_at'] is None
+    store.close()
+
+    reopened = SessionStore('session_data.db')
+    assert len(reopened.trials(session_id=second)) == 1
+    reopened.close()
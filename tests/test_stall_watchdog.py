@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+import stall_watchdog
+from render_backend import HeadlessRoot
+from stall_watchdog import StallWatchdog
+
+
+@pytest.fixture
+def root():
+    root = HeadlessRoot()
+    yield root
+    root.destroy()
+
+
+def blocking_callback():
+    time.sleep(0.15)
+
+
+def test_a_blocked_loop_is_recorded_with_the_trial_and_the_blocking_code(root, workdir):
+    watchdog = StallWatchdog(root, threshold_ms=40, heartbeat_ms=5)
+    watchdog.start()
+    watchdog.begin_trial(3)
+    root.after(20, blocking_callback)
+    root.run_for(60)
+    watchdog.stop()
+
+    assert len(watchdog.stalls) == 1
+    stall = watchdog.stalls[0]
+    assert stall['Trial Number'] == 3 and stall['During'] == 'trial'
+    assert stall['Duration (ms)'] >= 100
+    assert 'blocking_callback' in stall['Stack']
+
+    watchdog.export('frame_timing_stalls.csv', 'p1')
+    with open('frame_timing_stalls.csv') as stalls_file:
+        assert stalls_file.readline().strip() == ','.join(stall_watchdog.STALL_FIELDNAMES)
+
+
+def test_stopping_leaves_no_heartbeat_behind(root):
+    watchdog = StallWatchdog(root, threshold_ms=40, heartbeat_ms=5)
+    watchdog.start()
+    root.run_for(50)
+    watchdog.stop()
+    root.mainloop()  # Returns only once no timers are left
+    assert watchdog.thread is None
+
+
+def test_not_started_offscreen(root):
+    assert stall_watchdog.configure(root, {'stall_watchdog': True}) is None
+    assert not root._timers
@@ -0,0 +1,51 @@
+import csv
+
+from synthetic_participant import ResponseModel, SyntheticParticipant, run_simulation, simulation_config
+
+
+def session_config(image_dirs, **overrides):
+    mask_dir, stim_dir = image_dirs
+    config = {'participant_id': 'p1', 'mask_dir': mask_dir, 'stim_dir': stim_dir, 'mask_position': 'right',
+              'blend_duration': 500, 'mask_cycle_time': 100, 'iti_message_delay': 300,
+              'session_store': False, 'log_console': False, 'schedule_seed': 1}
+    config.update(overrides)
+    return config
+
+
+def trial_rows():
+    with open('trial_data.csv', newline='') as data_file:
+        return [row for row in csv.DictReader(data_file) if row['Trial Type'] != 'ITI']
+
+
+def test_responses_after_the_ramp_end_their_trial(image_dirs, workdir):
+    # Every RT is longer than blend_duration, so each response comes while the final alpha is held
+    config = simulation_config(session_config(image_dirs), 8)
+    model = ResponseModel(rt_median_ms=1500, rt_sigma=0.1, rt_min_ms=800, slow_side_cost_ms=0, accuracy=1.0)
+    report = run_simulation(config, model)
+
+    assert report['anomaly_counts'] == {}
+    rows = trial_rows()
+    assert [int(row['Trial Number']) for row in rows] == list(range(8))
+    for row in rows:
+        assert row['Image Path']
+        assert float(row['Reaction Time']) > 500
+
+
+def test_practice_with_participant_errors_finishes(image_dirs, workdir):
+    config = simulation_config(session_config(image_dirs, blend_duration=300), 10, practice=True)
+    model = ResponseModel(rt_median_ms=600, double_press_rate=0.3, early_press_rate=0.3, seed=3)
+    report = run_simulation(config, model)
+
+    assert report['anomaly_counts'] == {}
+    assert report['trials'] == 30
+    assert report['session_reports'][0]['rows']['Practice'] == 20
+
+
+def test_desynchronised_modules_are_reported_and_the_session_ends(image_dirs, workdir, monkeypatch):
+    # A stimulus that never starts its trial leaves the mask running alone
+    monkeypatch.setattr('stim_file.Stimulus.start_trial', lambda self: (None, None, None))
+    config = simulation_config(session_config(image_dirs), 5)
+    report = run_simulation(config, ResponseModel())
+
+    assert report['anomaly_counts']['desync'] == SyntheticParticipant.MAX_FAILED_PRESSES + 1
+    assert report['anomaly_counts']['aborted'] == 1
@@ -0,0 +1,75 @@
+import pytest
+
+import timing
+from timing import EVENT_TIME_WRAP_MS, EventClock, event_time_ns
+
+MS = 1_000_000
+
+
+class Event:
+    def __init__(self, time):
+        self.time = time
+
+
+@pytest.fixture
+def clock():
+    """A settable now_ns(), starting 10 s in"""
+    now = [10_000 * MS]
+    timing.set_clock(lambda: now[0])
+    yield now
+    timing.set_clock(None)
+
+
+def stamp_at(event_clock, clock, handled_ms, event_ms):
+    clock[0] = handled_ms * MS
+    return event_clock.stamp(Event(event_ms))
+
+
+def test_offset_is_the_least_dispatch_latency_seen(clock):
+    event_clock = EventClock()
+    # The window-system clock reads 7000 ms when now_ns() reads 10000 ms; latencies 5, 2 and 8 ms
+    assert stamp_at(event_clock, clock, 10_005, 7_000) == 10_005 * MS  # First event: latency unknown
+    assert stamp_at(event_clock, clock, 10_102, 7_100) == 10_102 * MS
+    assert stamp_at(event_clock, clock, 10_208, 7_200) == 10_202 * MS  # Press time, not handling time
+    assert event_clock.offset_ns == 3_002 * MS
+
+
+def test_wraparound_recalibrates(clock):
+    event_clock = EventClock()
+    last_ms = EVENT_TIME_WRAP_MS - 10
+    stamp_at(event_clock, clock, 10_000, last_ms)
+    assert stamp_at(event_clock, clock, 10_051, last_ms + 50) == 10_050 * MS
+    # The 32-bit counter wraps: event times restart near zero, so the offset grows by 2^32 ms
+    assert stamp_at(event_clock, clock, 10_103, 90) == 10_103 * MS
+    assert stamp_at(event_clock, clock, 10_205, 190) == 10_203 * MS  # Measured from the new anchor
+
+
+@pytest.mark.parametrize('jump_ms', [-5_000, 5_000])
+def test_jumps_of_the_window_system_clock(clock, jump_ms):
+    event_clock = EventClock()
+    stamp_at(event_clock, clock, 10_000, 7_000)
+    stamp = stamp_at(event_clock, clock, 10_102, 7_100 + jump_ms)
+    assert stamp == 10_102 * MS  # Re-anchored on the late event; never later than it was handled
+    assert stamp_at(event_clock, clock, 10_204, 7_200 + jump_ms) == 10_202 * MS
+
+
+def test_events_without_a_timestamp_use_the_handling_time(clock):
+    event_clock = EventClock()
+    for event_ms in (None, 0, -1, 12.5):
+        assert stamp_at(event_clock, clock, 10_000, event_ms) == 10_000 * MS
+    assert event_clock.offset_ns is None
+
+
+def test_each_event_is_stamped_once(clock, monkeypatch):
+    monkeypatch.setattr(timing, 'event_clock', EventClock())
+    event = Event(7_000)
+    first = event_time_ns(event)
+    clock[0] += 40 * MS  # A second module handles the same event later
+    assert event_time_ns(event) == first == event.timestamp_ns
+
+    class Frozen:
+        __slots__ = ('time',)
+
+    frozen = Frozen()
+    frozen.time = 7_050
+    assert event_time_ns(frozen) == clock[0]  # No attribute to cache on; still stamped
@@ -0,0 +1,55 @@
+import csv
+
+import pytest
+
+from render_backend import HeadlessRoot
+from trial_log import TRIAL_FIELDNAMES, TrialLogWriter
+
+
+@pytest.fixture
+def root():
+    root = HeadlessRoot()
+    yield root
+    root.destroy()
+
+
+def row(number):
+    return {'Trial Number': number, 'Trial Type': 'Main', 'Reaction Time': 900.0, 'Suppressor Position': 'left'}
+
+
+def test_rows_are_synced_in_batches_and_on_finalize(workdir, root, monkeypatch):
+    syncs = []
+    monkeypatch.setattr('os.fsync', syncs.append)
+    writer = TrialLogWriter('trial_data.csv', 'p1', flush_interval_ms=60_000, flush_rows=3)
+    for number in range(7):
+        writer.write_row(row(number))
+    assert writer.pending_rows == 1 and len(syncs) == 3  # Header, then two batches of three
+    writer.finalize()
+    writer.finalize()
+    assert len(syncs) == 4
+
+    with open('trial_data.csv', newline='') as data_file:
+        rows = list(csv.DictReader(data_file))
+    assert list(rows[0]) == TRIAL_FIELDNAMES
+    assert [r['Trial Number'] for r in rows] == [str(n) for n in range(7)]
+    assert {r['Participant ID'] for r in rows} == {'p1'}
+    with pytest.raises(ValueError):
+        writer.write_row(row(8))
+
+
+def test_pending_rows_are_synced_when_the_interval_passes_without_writes(workdir, root):
+    writer = TrialLogWriter('trial_data.csv', 'p1', flush_interval_ms=1000, flush_rows=10, widget=root)
+    writer.write_row(row(0))
+    root.run_for(500)
+    assert writer.pending_rows == 1
+    root.run_for(600)
+    assert writer.pending_rows == 0
+    writer.finalize()
+
+
+def test_finalize_cancels_the_interval_flush(workdir, root):
+    writer = TrialLogWriter('trial_data.csv', 'p1', flush_interval_ms=1000, widget=root)
+    writer.write_row(row(0))
+    writer.finalize()
+    root.run_for(2000)  # The cancelled timer must not touch the closed file
+    assert writer.closed
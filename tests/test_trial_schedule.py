@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import trial_schedule
+from trial_schedule import TrialSchedule, build_schedule, suppressor_sides
+
+STIMULI = [f's{index}.png' for index in range(5)]
+
+
+def test_same_seed_gives_the_same_plan_and_phases_differ():
+    first = build_schedule(40, STIMULI, 6, ['left'] * 40, seed=7)
+    again = build_schedule(40, STIMULI, 6, ['left'] * 40, seed=7)
+    practice = build_schedule(40, STIMULI, 6, ['left'] * 40, seed=7, phase='practice')
+    assert np.array_equal(first.trials, again.trials)
+    assert not np.array_equal(first.trials, practice.trials)
+
+
+def test_shuffled_passes_cover_every_stimulus_without_repeats_at_the_seams():
+    schedule = build_schedule(50, STIMULI, 6, ['left'] * 50, seed=3, stimulus_order='shuffle')
+    stimuli = schedule.trials['stimulus']
+    for start in range(0, 50, len(STIMULI)):
+        assert sorted(stimuli[start:start + len(STIMULI)]) == list(range(len(STIMULI)))
+    assert not np.any(stimuli[1:] == stimuli[:-1])
+
+
+def test_position_runs_are_capped():
+    positions = build_schedule(500, STIMULI, 6, ['left'] * 500, seed=1, max_position_run=2).trials['y_position']
+    run = longest = 1
+    for previous, current in zip(positions, positions[1:]):
+        run = run + 1 if current == previous else 1
+        longest = max(longest, run)
+    assert longest == 2
+
+
+def test_save_load_round_trip_and_resolve(tmp_path):
+    schedule = build_schedule(10, STIMULI, 6, ['right'] * 10, seed=5, reverse=True)
+    path = str(tmp_path / 'plan.npz')
+    schedule.save(path)
+    loaded = TrialSchedule.load(path)
+    assert np.array_equal(loaded.trials, schedule.trials)
+    assert (loaded.seed, loaded.phase, loaded.stimulus_files) == (5, 'main', STIMULI)
+    assert loaded.suppressor(0) == 'right' and loaded.trials['reverse'].all()
+
+    listing = [f'/images/{name}' for name in reversed(STIMULI)]
+    resolved = loaded.resolve(listing)
+    assert [listing[index].split('/')[-1] for index in resolved] == [loaded.stimulus_file(i) for i in range(10)]
+    with pytest.raises(ValueError):
+        loaded.resolve(listing[1:])
+
+
+def test_suppressor_sides_follow_practice_sequence_and_switch_trial():
+    practice = {'is_practice': True, 'practice_sequence': ['right'] * 5 + ['left'] * 5}
+    assert suppressor_sides(practice, 10) == ['right'] * 5 + ['left'] * 5
+    main = {'mask_position': 'left', 'switch_suppressor': True, 'switch_trial': 3}
+    assert suppressor_sides(main, 5) == ['left'] * 3 + ['right'] * 2
+
+
+def test_modules_run_past_the_end_of_the_plan(make_modules):
+    # The configured direction stays the default once the plan, which reverses every ramp, runs out
+    root, mask, stim = make_modules(alpha_reverse=False)
+    schedule = build_schedule(2, stim.image_files, len(mask.images), ['left'] * 2, seed=2, reverse=True)
+    mask.use_schedule(schedule)
+    stim.use_schedule(schedule)
+
+    for trial in range(3):
+        mask.start_trial()
+        stim.start_trial()
+        root.run_for(200)
+        assert stim.trial_reverse == (trial < 2)
+        mask.end_trial(None)
+        stim.end_trial(None)
+    assert stim.alpha_reverse is False
+    assert stim._next_reverse() is False
+
+
+def test_unusable_replay_falls_back_to_a_new_plan(make_modules, tmp_path):
+    from display_file import start_schedule
+
+    root, mask, stim = make_modules()
+    empty_dir = tmp_path / 'no_plans'
+    empty_dir.mkdir()
+    config = {'mask_position': 'left', 'schedule_seed': 4, 'schedule_replay_dir': str(empty_dir)}
+    assert start_schedule(config, 6, mask, stim) == 6
+    assert len(stim.schedule) == 6 and stim.schedule.seed == 4
+
+    # A saved plan whose stimuli are not in the stimulus directory
+    foreign = build_schedule(6, ['other.png'], len(mask.images), ['left'] * 6, seed=9)
+    foreign.save(trial_schedule.schedule_path('main', str(empty_dir)))
+    assert start_schedule(config, 6, mask, stim) == 6
+    assert stim.schedule.seed == 4
@@ -0,0 +1,93 @@
+import time
+
+# Event timestamps from Tk are 32-bit millisecond counters that wrap around
+EVENT_TIME_WRAP_MS = 2 ** 32
+# Re-anchor the event clock if an event appears this much later than the best estimate
+EVENT_RECALIBRATE_MS = 1000
+
+
+_clock = time.perf_counter_ns
+
+
+def now_ns():
+    """Monotonic, high-resolution timestamp used for all stimulus and response timing"""
+    return _clock()
+
+
+def set_clock(clock=None):
+    """Replace the timestamp source (e.g. with a headless run's virtual clock); None restores perf_counter_ns"""
+    global _clock
+    _clock = clock if clock is not None else time.perf_counter_ns
+
+
+def ns_to_ms(duration_ns):
+    return duration_ns / 1_000_000
+
+
+class EventClock:
+    """
+    Convert Tk event timestamps (milliseconds on the window system's clock) to now_ns().
+
+    The offset between the two clocks is estimated as the smallest (now - event.time)
+    seen so far, i.e. the event with the least dispatch latency. Stamps therefore
+    reflect when the key was pressed rather than when the Tk loop got around to the
+    handler. Events without a usable timestamp fall back to the handling time.
+    """
+
+    def __init__(self):
+        self.offset_ns = None
+
+    def stamp(self, event):
+        handled_ns = now_ns()
+        event_ms = getattr(event, 'time', None)
+        if not isinstance(event_ms, int) or event_ms <= 0:
+            return handled_ns
+
+        event_ns = event_ms * 1_000_000
+        offset_ns = handled_ns - event_ns
+        if (self.offset_ns is None or offset_ns < self.offset_ns
+                or offset_ns - self.offset_ns > EVENT_RECALIBRATE_MS * 1_000_000):
+            # Lower latency than before, first event, or the window-system clock wrapped/jumped
+            self.offset_ns = offset_ns
+
+        return min(event_ns + self.offset_ns, handled_ns)
+
+
+event_clock = EventClock()
+
+
+def event_time_ns(event):
+    """Return the response timestamp of a key event, stamping it on first use"""
+    stamp = getattr(event, 'timestamp_ns', None)
+    if stamp is None:
+        stamp = event_clock.stamp(event)
+        try:
+            # Every module handling the same event sees the same stamp
+            event.timestamp_ns = stamp
+        except AttributeError:
+            pass
+    return stamp
+
+
+# Named onset timestamps shared by the display modules and the key handler
+_marks = {}
+
+
+def mark(name, timestamp_ns=None):
+    _marks[name] = now_ns() if timestamp_ns is None else timestamp_ns
+    return _marks[name]
+
+
+def get_mark(name):
+    return _marks.get(name)
+
+
+def clear_mark(name):
+    _marks.pop(name, None)
+
+
+def elapsed_ms(start_ns, end_ns):
+    """Milliseconds between two stamps, or None if the start was never recorded"""
+    if start_ns is None or end_ns is None:
+        return None
+    return ns_to_ms(end_ns - start_ns)
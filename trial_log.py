@@ -0,0 +1,95 @@
+import csv
+import os
+import timing
+
+TRIAL_FIELDNAMES = [
+    'Participant ID',
+    'Trial Number',
+    'Trial Type',  # 'Practice', 'Main', or 'ITI'
+    'Y Position',
+    'Stimulus Position',
+    'Image Path',
+    'Reaction Time',
+    'Response',
+    'Suppressor Position',
+    'Accuracy'
+]
+
+
+class TrialLogWriter:
+    """
+    Append-only trial log, opened once per session.
+
+    Rows are written as soon as they are recorded. Flushes (and fsyncs) are batched:
+    the file is synced once `flush_rows` rows are pending or `flush_interval_ms` has
+    passed since the last sync, so a killed process loses at most the last batch.
+    With a `widget`, an after() timer syncs pending rows once the interval is up even if
+    no further row is written (a participant who stops responding, a long ITI).
+    finalize() syncs whatever is pending and closes the file.
+    """
+
+    def __init__(self, filename='trial_data.csv', participant_id='1111',
+                 flush_interval_ms=1000, flush_rows=10, fsync=True, widget=None):
+        self.filename = filename
+        self.participant_id = participant_id
+        self.flush_interval_ns = int(flush_interval_ms * 1_000_000)
+        self.flush_rows = max(1, flush_rows)
+        self.use_fsync = fsync
+        self.widget = widget
+        self.flush_after_id = None
+        self.rows_written = 0
+        self.pending_rows = 0
+
+        self.file = open(filename, mode='w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=TRIAL_FIELDNAMES, extrasaction='ignore')
+        self.writer.writeheader()
+        self.flush()
+
+    @property
+    def closed(self):
+        return self.file is None
+
+    def write_row(self, row):
+        if self.file is None:
+            raise ValueError(f"Trial log {self.filename} has already been finalized")
+        row_with_id = dict(row)
+        row_with_id['Participant ID'] = self.participant_id
+        self.writer.writerow(row_with_id)
+        self.rows_written += 1
+        self.pending_rows += 1
+
+        if (self.pending_rows >= self.flush_rows or
+                timing.now_ns() - self.last_flush_ns >= self.flush_interval_ns):
+            self.flush()
+        elif self.widget is not None and self.flush_after_id is None:
+            remaining_ms = (self.last_flush_ns + self.flush_interval_ns - timing.now_ns()) / 1_000_000
+            self.flush_after_id = self.widget.after(max(1, int(remaining_ms + 0.5)), self._flush_due)
+
+    def _flush_due(self):
+        self.flush_after_id = None
+        if self.pending_rows:
+            self.flush()
+
+    def flush(self):
+        """Push buffered rows to the OS and, if enabled, to disk"""
+        if self.file is None:
+            return
+        self.file.flush()
+        if self.use_fsync:
+            os.fsync(self.file.fileno())
+        self.pending_rows = 0
+        self.last_flush_ns = timing.now_ns()
+
+    def finalize(self):
+        """Sync any pending rows and close the log; safe to call more than once"""
+        if self.file is None:
+            return
+        if self.flush_after_id is not None:
+            try:
+                self.widget.after_cancel(self.flush_after_id)
+            except:
+                pass
+            self.flush_after_id = None
+        self.flush()
+        self.file.close()
+        self.file = None
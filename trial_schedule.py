@@ -0,0 +1,170 @@
+import os
+import numpy as np
+from session_log import get_logger
+
+log = get_logger('schedule')
+
+SIDES = ('left', 'right')
+Y_POSITIONS = (50, 450)  # Stimulus top edge: upper or lower half of the content area
+STIMULUS_ORDERS = ('sequential', 'shuffle')
+SESSION_PHASES = ('practice', 'main')
+
+# One row per trial; 12 bytes, so even a 100,000-trial plan is about a megabyte
+TRIAL_DTYPE = np.dtype([
+    ('stimulus', np.int32),    # Index into TrialSchedule.stimulus_files
+    ('mask_start', np.int32),  # Mask frame the trial's mask cycle opens with
+    ('y_position', np.int16),
+    ('suppressor', np.int8),   # Index into SIDES
+    ('reverse', np.bool_),     # Alpha ramp runs 0.99 -> 0 instead of 0 -> 0.99
+])
+
+
+class TrialSchedule:
+    """
+    Every trial of a session phase, fixed before the first one is shown.
+
+    Row n of `trials` (a structured array of TRIAL_DTYPE) is the trial recorded as Trial
+    Number n. Stimuli are stored as file names, so a saved plan replays against the same
+    stimulus directory whatever order the directory is listed in.
+    """
+
+    def __init__(self, trials, stimulus_files, seed=None, phase='main'):
+        self.trials = np.asarray(trials, dtype=TRIAL_DTYPE)
+        self.stimulus_files = [os.path.basename(path) for path in stimulus_files]
+        self.seed = seed
+        self.phase = phase
+
+    def __len__(self):
+        return len(self.trials)
+
+    def stimulus_file(self, index):
+        return self.stimulus_files[self.trials['stimulus'][index]]
+
+    def suppressor(self, index):
+        return SIDES[self.trials['suppressor'][index]]
+
+    def resolve(self, image_files):
+        """Planned stimuli as indices into a module's `image_files`, trial by trial"""
+        positions = {os.path.basename(path): index for index, path in enumerate(image_files)}
+        missing = [name for name in self.stimulus_files if name not in positions]
+        if missing:
+            raise ValueError(f"Scheduled stimuli not in the stimulus directory: {missing[:5]}")
+        lookup = np.array([positions[name] for name in self.stimulus_files], dtype=np.int64)
+        return lookup[self.trials['stimulus']]
+
+    def save(self, path):
+        np.savez(path, trials=self.trials, stimulus_files=np.array(self.stimulus_files),
+                 seed=np.array(-1 if self.seed is None else self.seed, dtype=np.int64),
+                 phase=np.array(self.phase))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            seed = int(data['seed'])
+            return cls(data['trials'], data['stimulus_files'].tolist(),
+                       seed=None if seed < 0 else seed, phase=str(data['phase']))
+
+
+def _positions(rng, count, max_run):
+    """Random Y positions in which no position repeats more than `max_run` times in a row (0: no limit)"""
+    choices = rng.integers(0, len(Y_POSITIONS), count)
+    if max_run > 0:
+        run = 0
+        for index in range(1, count):
+            run = run + 1 if choices[index] == choices[index - 1] else 0
+            if run >= max_run:
+                choices[index] = 1 - choices[index]
+                run = 0
+    return np.asarray(Y_POSITIONS, dtype=np.int16)[choices]
+
+
+def _stimulus_order(rng, count, stimulus_count, order):
+    if order == 'sequential':
+        return np.arange(count) % stimulus_count
+    # Shuffled passes through the whole set; a pass never opens with the stimulus the last one ended on
+    passes = []
+    for _ in range(-(-count // stimulus_count)):
+        permutation = rng.permutation(stimulus_count)
+        if passes and stimulus_count > 1 and permutation[0] == passes[-1][-1]:
+            permutation[[0, -1]] = permutation[[-1, 0]]
+        passes.append(permutation)
+    return np.concatenate(passes)[:count]
+
+
+def build_schedule(count, stimulus_files, mask_frames, sides, seed=None, stimulus_order='sequential',
+                   max_position_run=0, reverse=False, phase='main'):
+    """
+    Plan `count` trials.
+
+    `sides` gives the suppressor side of every trial. Stimuli run through
+    `stimulus_files` in order or in shuffled passes (`stimulus_order`), Y positions are
+    random with at most `max_position_run` repeats in a row, and each trial's mask cycle
+    starts at a random one of `mask_frames` frames. The same seed, phase and arguments
+    always give the same plan; without a seed one is drawn and kept on the schedule.
+    """
+    if stimulus_order not in STIMULUS_ORDERS:
+        raise ValueError(f"Unknown stimulus order '{stimulus_order}'; choose from {STIMULUS_ORDERS}")
+    if not stimulus_files:
+        raise ValueError("Cannot schedule trials without stimuli")
+    if len(sides) != count:
+        raise ValueError(f"Got {len(sides)} suppressor sides for {count} trials")
+    if seed is None:
+        seed = int(np.random.SeedSequence().entropy % 2 ** 63)
+    # Practice and main plans from one seed are independent of each other
+    rng = np.random.default_rng([seed, SESSION_PHASES.index(phase)])
+
+    trials = np.zeros(count, dtype=TRIAL_DTYPE)
+    trials['stimulus'] = _stimulus_order(rng, count, len(stimulus_files), stimulus_order)
+    trials['y_position'] = _positions(rng, count, max_position_run)
+    trials['mask_start'] = rng.integers(0, max(1, mask_frames), count)
+    trials['suppressor'] = [SIDES.index(side) for side in sides]
+    trials['reverse'] = bool(reverse)
+    return TrialSchedule(trials, stimulus_files, seed=seed, phase=phase)
+
+
+def suppressor_sides(config, count):
+    """
+    Suppressor side of each trial for the phase `config` describes.
+
+    Practice follows practice_sequence (5L5R5L5R or 5R5L5R5L by default). The main task
+    keeps mask_position, swapping sides from trial switch_trial on if switch_suppressor
+    is set.
+    """
+    if config.get('is_practice', False):
+        sequence = list(config.get('practice_sequence') or [])
+        if len(sequence) != count:
+            log.warning("Invalid practice sequence. Using default configuration.")
+            sequence = ['left'] * 5 + ['right'] * 5 + ['left'] * 5 + ['right'] * 5
+        # Trials past the sequence stay in its last block
+        return [sequence[min(index, len(sequence) - 1)] for index in range(count)]
+
+    side = 'right' if config.get('mask_position', 'left') == 'right' else 'left'
+    other = 'right' if side == 'left' else 'left'
+    switch_trial = int(config.get('switch_trial', 0) or 0) if config.get('switch_suppressor', False) else 0
+    return [other if switch_trial and index >= switch_trial else side for index in range(count)]
+
+
+def schedule_path(phase, directory=''):
+    return os.path.join(directory, f'trial_schedule_{phase}.npz')
+
+
+def schedule_from_config(config, count, stimulus_files, mask_frames):
+    """
+    The plan for the phase `config` describes: replayed from schedule_replay_dir if that
+    is set, otherwise built from the schedule_* settings.
+    """
+    phase = 'practice' if config.get('is_practice', False) else 'main'
+    replay_dir = config.get('schedule_replay_dir')
+    if replay_dir:
+        schedule = TrialSchedule.load(schedule_path(phase, replay_dir))
+        log.info("Replaying %s-trial %s schedule from %s (seed %s)", len(schedule), phase, replay_dir, schedule.seed)
+        return schedule
+
+    seed = config.get('schedule_seed')
+    schedule = build_schedule(count, stimulus_files, mask_frames, suppressor_sides(config, count),
+                              seed=None if seed is None else int(seed),
+                              stimulus_order=config.get('schedule_stimulus_order', 'sequential'),
+                              max_position_run=int(config.get('schedule_max_position_run', 0)),
+                              reverse=config.get('alpha_reverse', False), phase=phase)
+    log.info("Scheduled %s %s trials (seed %s)", count, phase, schedule.seed)
+    return schedule